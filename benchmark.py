@@ -0,0 +1,127 @@
+import dataclasses
+import json
+
+import click
+from web3 import Web3
+
+from config import Config
+from services.benchmark.benchmark import Benchmark
+from services.benchmark.synthetic import SyntheticPoolGraph
+from services.logger.logger import Logger
+from services.profiler.profiler import Profiler
+from services.ttypes.strategy import StrategyEnum
+
+
+@click.command()
+@click.option("--debug", is_flag=True, help="Display logs")
+@click.option(
+    "--tokens",
+    default=200,
+    help="Set number of synthetic tokens, WETH included (Default: 200)",
+)
+@click.option(
+    "--pools",
+    default=1000,
+    help="Set number of synthetic pools (Default: 1,000)",
+)
+@click.option(
+    "--hub-skew",
+    default=1.0,
+    help="Set Zipf exponent of the token popularity, 0 for uniform (Default: 1.0)",
+)
+@click.option(
+    "--balancer-share",
+    default=0.2,
+    help="Set share of Balancer pools, the others are Uniswap/SushiSwap (Default: 0.2)",
+)
+@click.option(
+    "--mispricing",
+    default=0.01,
+    help="Set standard deviation of the pool prices around the token prices (Default: 0.01)",
+)
+@click.option(
+    "--blocks",
+    default=10,
+    help="Set number of blocks evaluated (Default: 10)",
+)
+@click.option(
+    "--churn",
+    default=0.1,
+    help="Set share of the pools whose reserves move every block (Default: 0.1)",
+)
+@click.option(
+    "--gas-price",
+    default=50.0,
+    help="Set gas price in Gwei (Default: 50.0)",
+)
+@click.option(
+    "--max-amount",
+    default=6.0,
+    help="Set max amount to trade with in WETH (Default: 6.0)",
+)
+@click.option(
+    "--min-amount",
+    default=3.0,
+    help="Set min Amount to trade with in WETH (Default: 3.0)",
+)
+@click.option("--seed", default=0, help="Set random seed of the graph (Default: 0)")
+@click.option(
+    "--trace-memory",
+    is_flag=True,
+    help="Also measure the peak Python heap (slows the benchmark down)",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+@click.option(
+    "--profile",
+    default=None,
+    type=int,
+    help="Profile the first N blocks, 0 to profile between two SIGUSR1 (Default: disabled)",
+)
+def benchmark(
+    debug: bool,
+    tokens: int,
+    pools: int,
+    hub_skew: float,
+    balancer_share: float,
+    mispricing: float,
+    blocks: int,
+    churn: float,
+    gas_price: float,
+    max_amount: float,
+    min_amount: float,
+    seed: int,
+    trace_memory: bool,
+    as_json: bool,
+    profile: int,
+) -> None:
+    config = Config(
+        strategy=StrategyEnum.BENCHMARK,
+        debug=debug,
+        max_amount=max_amount,
+        min_amount=min_amount,
+        profile_blocks=profile,
+    )
+    Profiler.instance(config)
+    graph = SyntheticPoolGraph(
+        config,
+        num_tokens=tokens,
+        num_pools=pools,
+        hub_skew=hub_skew,
+        balancer_share=balancer_share,
+        mispricing=mispricing,
+        seed=seed,
+    )
+    report = Benchmark(graph, config).run(
+        blocks,
+        Web3.toWei(gas_price, "gwei"),
+        churn=churn,
+        trace_memory=trace_memory,
+    )
+    Logger.instance(config).flush()
+    if as_json:
+        print(json.dumps(dataclasses.asdict(report)))
+    else:
+        print(report)
+
+
+benchmark()
@@ -1,37 +1,148 @@
 import os
 import os.path
+import threading
+from typing import Any, ClassVar, Dict, List, Optional
 
 from services.ttypes.strategy import StrategyEnum
 
 THIS_DIR = os.path.abspath(os.path.dirname(__file__))
 
 # Etherscan
-ETHERSCAN_API_KEY = os.environ["ETHERSCAN_API_KEY"]
+ETHERSCAN_API_KEY = os.environ.get("ETHERSCAN_API_KEY")
 ETHERSCAN_API = "https://api.etherscan.io/api"
 
 # Ethereum
-# ETHEREUM_WS_URI = os.environ["ETHEREUM_WS_URI"]
-ETHEREUM_HTTP_URI = os.environ["ETHEREUM_HTTP_URI"]
-EXECUTOR_ADDRESS = os.environ["EXECUTOR_ADDRESS"]
-MY_SOCKS = os.environ["MY_SOCKS"]
-WETH_ADDRESS = os.environ["WETH_ADDRESS"]
-PRINTER_ADDRESS = os.environ["PRINTER_ADDRESS"]
+# Optional, streams the pending transactions to the sniper
+ETHEREUM_WS_URI = os.environ.get("ETHEREUM_WS_URI")
+ETHEREUM_HTTP_URI = os.environ.get("ETHEREUM_HTTP_URI")
+EXECUTOR_ADDRESS = os.environ.get("EXECUTOR_ADDRESS")
+MY_SOCKS = os.environ.get("MY_SOCKS")
+WETH_ADDRESS = os.environ.get("WETH_ADDRESS")
+PRINTER_ADDRESS = os.environ.get("PRINTER_ADDRESS")
 MASK_ADDRESS = "0x49a55f1e8EC5025deb60a38724004E21E8dC4eBe"
 FIXED_TOKEN_PATH_SIZE = 3
 FIXED_ADDRESSES_PER_TOKEN_PATH = 7
 
+# Mempool
+# Seconds between two txpool_contentFrom polls when pending transactions are not streamed
+MEMPOOL_POLL_SECONDS = 0.05
+MEMPOOL_RECONNECT_SECONDS = 5
+# Hashes of the delivered pending transactions remembered to deliver each one once
+MEMPOOL_SEEN_TRANSACTIONS = 10000
+# Seconds the sniper waits for a pending transaction before checking blocks and files
+MEMPOOL_IDLE_SECONDS = 1
+
+# Gas oracle
+GAS_ORACLE_WINDOW = 20
+GAS_ORACLE_PERCENTILE = 98
+# Fall back to web3's gas price strategy if no block was ingested for that long (seconds)
+GAS_ORACLE_MAX_AGE = 60
+# Also sample the gas prices of the pending block (1 to enable)
+GAS_ORACLE_SAMPLE_PENDING = 0
+
 # Arbitrage
 MAX_STEP_SUPPORTED = 3
+# Gas used by a path before its estimateGas, or one of the same shape, was ever seen
 ESTIMATE_GAS_EXECUTION = 450000
+GAS_MODEL_SMOOTHING = 0.3
+GAS_MODEL_MARGIN = 1.1
 ESTIMATE_GAS_LIMIT = 1000000
+# Sent transactions not mined after that many seconds are reported as failed
+TX_RECEIPT_TIMEOUT = 120
+# Receipts are checked on every new block, or every N seconds without block notifications
+TX_TRACKER_POLL_INTERVAL = 15
+# Paths failing estimateGas are not evaluated for a backoff doubling on each failure in a row
+SAFETY_BACKOFF_BLOCKS = 2
+SAFETY_MAX_BACKOFF_BLOCKS = 1000
+# Tokens of paths failing that many times in a row are blamed, and auto-blacklisted once blamed
+# by that many paths (unless they are part of a path that went through)
+AUTO_BLACKLIST_PATH_FAILURES = 6
+AUTO_BLACKLIST_OFFENDING_PATHS = 2
 INCREMENTAL_STEP = 0.1
 
+# Reserves
+# Fall back to polling the node if the feeder didn't publish a new block for that long (seconds)
+SHARED_RESERVES_TIMEOUT = 30
+
+# Engine
+ENGINE_THREADS = 8
+ENGINE_FETCH_THREADS = 16
+# Number of paths evaluated between two deadline checks (per worker with --parallel)
+SCHEDULER_CHUNK_SIZE = 100
+# Every N blocks, paths move from the workers busier than the mean by more than the tolerance
+# to the idlest ones (at most N moves per rebalance)
+PARALLEL_REBALANCE_BLOCKS = 50
+PARALLEL_REBALANCE_TOLERANCE = 0.1
+PARALLEL_REBALANCE_MAX_MOVES = 1000
+# Shared secret of worker.py and the strategies using it with --remote-workers
+WORKER_AUTHKEY = os.environ.get("WORKER_AUTHKEY")
+# Pools and paths are reloaded in a background thread, a failed reload is retried that many
+# times (seconds apart) while the previous paths keep being evaluated
+RELOAD_MAX_ATTEMPTS = 3
+RELOAD_RETRY_SECONDS = 30
+
+# Path stats
+# Per block release of the best margin of a path towards its latest margin
+PATH_STATS_DECAY = 0.99
+# A path stays hot for that many blocks after being profitable, or while its best margin is above
+PATH_STATS_HOT_BLOCKS = 1000
+PATH_STATS_NEAR_PROFIT_MARGIN = -0.005
+# Cold paths are evaluated once every N blocks unless their spot rate turns profitable
+PATH_STATS_COLD_SAMPLING_INTERVAL = 5
+PATH_STATS_SAVE_EVERY_BLOCKS = 50
+# Forget paths that were not evaluated for that many blocks
+PATH_STATS_TTL_BLOCKS = 50000
+
+# Recorder
+# Every N records hold the reserves of every tracked pool, the others only the changed ones
+RECORDER_KEYFRAME_BLOCKS = 1000
+
+# Daemon
+DAEMON_YAML_PATH = os.path.join(THIS_DIR, "yamls/daemon.yaml")
+# Strategies loading the same liquidity range within that many seconds share the download
+DAEMON_POOLS_CACHE_SECONDS = 60
+
+# Fake node
+FAKENODE_HOST = "127.0.0.1"
+# First block number of a synthetic timeline (recordings keep their first block number)
+FAKENODE_START_BLOCK = 11000000
+# Blocks kept to answer calls and logs at older blocks, like a pruned node
+FAKENODE_HISTORY_BLOCKS = 128
+# Plain transfers added to every block on top of the swaps, for the gas price oracles
+FAKENODE_FILLER_TRANSACTIONS = 5
+# Gas used by the printer arbitrage
+FAKENODE_GAS_BASE = 60000
+FAKENODE_GAS_PER_SWAP = 90000
+# Liquidity of every pool for the subgraph queries of the PoolLoader
+FAKENODE_POOL_LIQUIDITY_USD = 75000
+
 # Path
 TOKEN_BLACKLIST_YAML_PATH = os.path.join(THIS_DIR, "yamls/blacklist.yaml")
 TOKEN_YAML_PATH = os.path.join(THIS_DIR, "yamls/tokens.yaml")
 POOL_YAML_PATH = os.path.join(THIS_DIR, "yamls/pools.yaml")
 ABI_PATH = os.path.join(THIS_DIR, "services/ethereum/abi")
 SNIPING_NOOBS_YAML_PATH = os.path.join(THIS_DIR, "yamls/snipers.yaml")
+UNISWAP_SUBGRAPH_URI = os.environ.get(
+    "UNISWAP_SUBGRAPH_URI",
+    "https://api.thegraph.com/subgraphs/name/uniswap/uniswap-v2",
+)
+SUSHISWAP_SUBGRAPH_URI = os.environ.get(
+    "SUSHISWAP_SUBGRAPH_URI", "https://api.thegraph.com/subgraphs/name/dmihal/sushiswap"
+)
+BALANCER_SUBGRAPH_URI = os.environ.get(
+    "BALANCER_SUBGRAPH_URI",
+    "https://api.thegraph.com/subgraphs/name/balancer-labs/balancer",
+)
+STATE_PATH = os.path.join(THIS_DIR, "state")
+AUTO_BLACKLIST_YAML_PATH = os.path.join(STATE_PATH, "auto_blacklist.yaml")
+
+# Profiler
+PROFILER_PATH = os.path.join(STATE_PATH, "profiles")
+# Seconds between two samples, 0.01 costs a few % of one CPU core
+PROFILER_INTERVAL = 0.01
+# Innermost frames kept per sample
+PROFILER_MAX_DEPTH = 64
+PROFILER_SUMMARY_FUNCTIONS = 50
 
 # Twilio
 AGENT_PHONE_NUMBERS = os.environ.get("AGENT_PHONE_NUMBERS")
@@ -39,32 +150,260 @@ TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_FROM_NUMBER = os.environ.get("TWILIO_FROM_NUMBER")
 
+# Logs
+# "text" (default) or "json"
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+# Repetitive errors are limited to that many per window (seconds)
+LOG_SAMPLE_BURST = 5
+LOG_SAMPLE_WINDOW = 10
+
+# Metrics
+METRICS_HOST = "127.0.0.1"
+# Upper bounds of the latency histogram buckets (seconds)
+METRICS_LATENCY_BUCKETS = [
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+]
+
+# Notifications
+NOTIFICATION_QUEUE_SIZE = 1000
+# Messages per second per webhook/phone number, the ones queued meanwhile are batched
+NOTIFICATION_RATE_LIMIT = 1
+NOTIFICATION_BATCH_SIZE = 10
+NOTIFICATION_RETRIES = 3
+
 # Slack
-SLACK_ERRORS_WEBHOOK = os.environ["SLACK_ERRORS_WEBHOOK"]
-SLACK_PRINTING_TX_WEBHOOK = os.environ["SLACK_PRINTING_TX_WEBHOOK"]
-SLACK_ARBITRAGE_OPPORTUNITIES_WEBHOOK = os.environ[
+SLACK_ERRORS_WEBHOOK = os.environ.get("SLACK_ERRORS_WEBHOOK")
+SLACK_PRINTING_TX_WEBHOOK = os.environ.get("SLACK_PRINTING_TX_WEBHOOK")
+SLACK_ARBITRAGE_OPPORTUNITIES_WEBHOOK = os.environ.get(
     "SLACK_ARBITRAGE_OPPORTUNITIES_WEBHOOK"
-]
-SLACK_SNIPE_WEBHOOK = os.environ["SLACK_SNIPE_WEBHOOK"]
-SLACK_HEARTBEAT_WEBHOOK = os.environ["SLACK_HEARTBEAT_WEBHOOK"]
+)
+SLACK_SNIPE_WEBHOOK = os.environ.get("SLACK_SNIPE_WEBHOOK")
+SLACK_HEARTBEAT_WEBHOOK = os.environ.get("SLACK_HEARTBEAT_WEBHOOK")
 
 # Kovan Env
-KOVAN_ETHEREUM_WS_URI = os.environ["KOVAN_ETHEREUM_WS_URI"]
-KOVAN_ETHEREUM_HTTP_URI = os.environ["KOVAN_ETHEREUM_HTTP_URI"]
-KOVAN_EXECUTOR_ADDRESS = os.environ["KOVAN_EXECUTOR_ADDRESS"]
-KOVAN_MY_SOCKS = os.environ["KOVAN_MY_SOCKS"]
+KOVAN_ETHEREUM_WS_URI = os.environ.get("KOVAN_ETHEREUM_WS_URI")
+KOVAN_ETHEREUM_HTTP_URI = os.environ.get("KOVAN_ETHEREUM_HTTP_URI")
+KOVAN_EXECUTOR_ADDRESS = os.environ.get("KOVAN_EXECUTOR_ADDRESS")
+KOVAN_MY_SOCKS = os.environ.get("KOVAN_MY_SOCKS")
 KOVAN_POOL_YAML_PATH = os.path.join(THIS_DIR, "yamls/kovan/pools.yaml")
-KOVAN_PRINTER_ADDRESS = os.environ["KOVAN_PRINTER_ADDRESS"]
+KOVAN_PRINTER_ADDRESS = os.environ.get("KOVAN_PRINTER_ADDRESS")
 KOVAN_SLACK_WEBHOOK_URI = os.environ.get("KOVAN_SLACK_WEBHOOK_URI")
 KOVAN_TOKEN_BLACKLIST_YAML_PATH = os.path.join(THIS_DIR, "yamls/blacklist.yaml")
 KOVAN_TOKEN_YAML_PATH = os.path.join(THIS_DIR, "yamls/kovan/tokens.yaml")
-KOVAN_WETH_ADDRESS = os.environ["KOVAN_WETH_ADDRESS"]
+KOVAN_WETH_ADDRESS = os.environ.get("KOVAN_WETH_ADDRESS")
 KOVAN_INCREMENTAL_STEP = 1.0
-KOVAN_SLACK_ERRORS_WEBHOOK = os.environ["KOVAN_SLACK_ERRORS_WEBHOOK"]
-KOVAN_SLACK_PRINTING_TX_WEBHOOK = os.environ["KOVAN_SLACK_PRINTING_TX_WEBHOOK"]
-KOVAN_SLACK_ARBITRAGE_OPPORTUNITIES_WEBHOOK = os.environ[
+KOVAN_SLACK_ERRORS_WEBHOOK = os.environ.get("KOVAN_SLACK_ERRORS_WEBHOOK")
+KOVAN_SLACK_PRINTING_TX_WEBHOOK = os.environ.get("KOVAN_SLACK_PRINTING_TX_WEBHOOK")
+KOVAN_SLACK_ARBITRAGE_OPPORTUNITIES_WEBHOOK = os.environ.get(
     "KOVAN_SLACK_ARBITRAGE_OPPORTUNITIES_WEBHOOK"
-]
+)
+
+# Environment variables that must be set, only checked once used
+REQUIRED_ENVIRONMENT = {
+    "ETHERSCAN_API_KEY",
+    "ETHEREUM_HTTP_URI",
+    "EXECUTOR_ADDRESS",
+    "MY_SOCKS",
+    "WETH_ADDRESS",
+    "PRINTER_ADDRESS",
+    "SLACK_ERRORS_WEBHOOK",
+    "SLACK_PRINTING_TX_WEBHOOK",
+    "SLACK_ARBITRAGE_OPPORTUNITIES_WEBHOOK",
+    "SLACK_SNIPE_WEBHOOK",
+    "SLACK_HEARTBEAT_WEBHOOK",
+    "WORKER_AUTHKEY",
+    "KOVAN_ETHEREUM_HTTP_URI",
+    "KOVAN_EXECUTOR_ADDRESS",
+    "KOVAN_MY_SOCKS",
+    "KOVAN_PRINTER_ADDRESS",
+    "KOVAN_WETH_ADDRESS",
+    "KOVAN_SLACK_ERRORS_WEBHOOK",
+    "KOVAN_SLACK_PRINTING_TX_WEBHOOK",
+    "KOVAN_SLACK_ARBITRAGE_OPPORTUNITIES_WEBHOOK",
+}
+
+
+class Settings:
+    """Constants of this module resolved once, as the typed attributes declared below.
+
+    With `kovan`, the `KOVAN_` constants replace the mainnet ones up front. A required
+    environment variable that is not set only raises when its setting is read, naming the
+    variable, instead of when this module is imported. There is a single instance per network,
+    see `resolve`.
+    """
+
+    _instance_by_kovan: ClassVar[Dict[bool, "Settings"]] = {}
+    _instance_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    THIS_DIR: str
+
+    # Etherscan
+    ETHERSCAN_API_KEY: str
+    ETHERSCAN_API: str
+
+    # Ethereum
+    ETHEREUM_WS_URI: Optional[str]
+    ETHEREUM_HTTP_URI: str
+    EXECUTOR_ADDRESS: str
+    MY_SOCKS: str
+    WETH_ADDRESS: str
+    PRINTER_ADDRESS: str
+    MASK_ADDRESS: str
+    FIXED_TOKEN_PATH_SIZE: int
+    FIXED_ADDRESSES_PER_TOKEN_PATH: int
+
+    # Mempool
+    MEMPOOL_POLL_SECONDS: float
+    MEMPOOL_RECONNECT_SECONDS: int
+    MEMPOOL_SEEN_TRANSACTIONS: int
+    MEMPOOL_IDLE_SECONDS: int
+
+    # Gas oracle
+    GAS_ORACLE_WINDOW: int
+    GAS_ORACLE_PERCENTILE: int
+    GAS_ORACLE_MAX_AGE: int
+    GAS_ORACLE_SAMPLE_PENDING: int
+
+    # Arbitrage
+    MAX_STEP_SUPPORTED: int
+    ESTIMATE_GAS_EXECUTION: int
+    GAS_MODEL_SMOOTHING: float
+    GAS_MODEL_MARGIN: float
+    ESTIMATE_GAS_LIMIT: int
+    TX_RECEIPT_TIMEOUT: int
+    TX_TRACKER_POLL_INTERVAL: int
+    SAFETY_BACKOFF_BLOCKS: int
+    SAFETY_MAX_BACKOFF_BLOCKS: int
+    AUTO_BLACKLIST_PATH_FAILURES: int
+    AUTO_BLACKLIST_OFFENDING_PATHS: int
+    INCREMENTAL_STEP: float
+
+    # Reserves
+    SHARED_RESERVES_TIMEOUT: int
+
+    # Engine
+    ENGINE_THREADS: int
+    ENGINE_FETCH_THREADS: int
+    SCHEDULER_CHUNK_SIZE: int
+    PARALLEL_REBALANCE_BLOCKS: int
+    PARALLEL_REBALANCE_TOLERANCE: float
+    PARALLEL_REBALANCE_MAX_MOVES: int
+    WORKER_AUTHKEY: str
+    RELOAD_MAX_ATTEMPTS: int
+    RELOAD_RETRY_SECONDS: int
+
+    # Path stats
+    PATH_STATS_DECAY: float
+    PATH_STATS_HOT_BLOCKS: int
+    PATH_STATS_NEAR_PROFIT_MARGIN: float
+    PATH_STATS_COLD_SAMPLING_INTERVAL: int
+    PATH_STATS_SAVE_EVERY_BLOCKS: int
+    PATH_STATS_TTL_BLOCKS: int
+
+    # Recorder
+    RECORDER_KEYFRAME_BLOCKS: int
+
+    # Daemon
+    DAEMON_YAML_PATH: str
+    DAEMON_POOLS_CACHE_SECONDS: int
+
+    # Fake node
+    FAKENODE_HOST: str
+    FAKENODE_START_BLOCK: int
+    FAKENODE_HISTORY_BLOCKS: int
+    FAKENODE_FILLER_TRANSACTIONS: int
+    FAKENODE_GAS_BASE: int
+    FAKENODE_GAS_PER_SWAP: int
+    FAKENODE_POOL_LIQUIDITY_USD: int
+
+    # Path
+    TOKEN_BLACKLIST_YAML_PATH: str
+    TOKEN_YAML_PATH: str
+    POOL_YAML_PATH: str
+    ABI_PATH: str
+    SNIPING_NOOBS_YAML_PATH: str
+    UNISWAP_SUBGRAPH_URI: str
+    SUSHISWAP_SUBGRAPH_URI: str
+    BALANCER_SUBGRAPH_URI: str
+    STATE_PATH: str
+    AUTO_BLACKLIST_YAML_PATH: str
+
+    # Profiler
+    PROFILER_PATH: str
+    PROFILER_INTERVAL: float
+    PROFILER_MAX_DEPTH: int
+    PROFILER_SUMMARY_FUNCTIONS: int
+
+    # Twilio
+    AGENT_PHONE_NUMBERS: Optional[str]
+    TWILIO_ACCOUNT_SID: Optional[str]
+    TWILIO_AUTH_TOKEN: Optional[str]
+    TWILIO_FROM_NUMBER: Optional[str]
+
+    # Logs
+    LOG_FORMAT: str
+    LOG_SAMPLE_BURST: int
+    LOG_SAMPLE_WINDOW: int
+
+    # Metrics
+    METRICS_HOST: str
+    METRICS_LATENCY_BUCKETS: List[float]
+
+    # Notifications
+    NOTIFICATION_QUEUE_SIZE: int
+    NOTIFICATION_RATE_LIMIT: int
+    NOTIFICATION_BATCH_SIZE: int
+    NOTIFICATION_RETRIES: int
+
+    # Slack
+    SLACK_ERRORS_WEBHOOK: str
+    SLACK_PRINTING_TX_WEBHOOK: str
+    SLACK_ARBITRAGE_OPPORTUNITIES_WEBHOOK: str
+    SLACK_SNIPE_WEBHOOK: str
+    SLACK_HEARTBEAT_WEBHOOK: str
+    SLACK_WEBHOOK_URI: Optional[str]
+
+    def __init__(self, kovan: bool) -> None:
+        constants = globals()
+        self.missing_environment: Dict[str, str] = {}
+        for name in self.__annotations__:
+            if not name.isupper():
+                continue
+            source = name
+            if kovan and f"KOVAN_{name}" in constants:
+                source = f"KOVAN_{name}"
+            value = constants.get(source)
+            if value is None and source in REQUIRED_ENVIRONMENT:
+                self.missing_environment[name] = source
+            else:
+                setattr(self, name, value)
+
+    @classmethod
+    def resolve(cls, kovan: bool) -> "Settings":
+        with cls._instance_lock:
+            if kovan not in cls._instance_by_kovan:
+                cls._instance_by_kovan[kovan] = cls(kovan)
+            return cls._instance_by_kovan[kovan]
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for the settings that were not set as attributes
+        source = self.__dict__.get("missing_environment", {}).get(name)
+        if source:
+            raise Exception(f"Environment variable {source} is not set")
+        raise AttributeError(f"Unknown setting {name}")
 
 
 class Config:
@@ -82,6 +421,15 @@ class Config:
         max_block: int = 3,
         since: str = "latest",
         only_tokens: str = "all",
+        parallel: bool = False,
+        workers: int = 4,
+        remote_workers: str = None,
+        shared_reserves: str = None,
+        block_deadline: float = 10.0,
+        nonce_file: str = None,
+        metrics_port: int = None,
+        record_path: str = None,
+        profile_blocks: int = None,
     ):
         self.strategy = strategy
         self.kovan = kovan
@@ -95,19 +443,24 @@ class Config:
         self.max_block = max_block
         self.since = since
         self.only_tokens = [] if only_tokens == "all" else only_tokens.split(",")
+        self.parallel = parallel
+        self.workers = workers
+        self.remote_workers = remote_workers.split(",") if remote_workers else []
+        self.shared_reserves = shared_reserves
+        self.block_deadline = block_deadline
+        self.nonce_file = nonce_file
+        self.metrics_port = metrics_port
+        self.record_path = record_path
+        self.profile_blocks = profile_blocks
+        self.settings = Settings.resolve(kovan)
 
         if max_block < 2:
             raise Exception("Max block has to be minimum 2")
+        if parallel and workers < 1:
+            raise Exception("Workers has to be minimum 1")
 
     def get(self, name: str):
-        if self.kovan:
-            try:
-                result = eval(f"KOVAN_{name}")
-            except NameError:
-                result = eval(name)
-        else:
-            result = eval(name)
-        return result
+        return getattr(self.settings, name)
 
     def get_int(self, name: str):
         result = self.get(name)
@@ -118,13 +471,4 @@ class Config:
         return float(result)
 
     def get_max_block_allowed(self) -> int:
-        if self.kovan:
-            return 1000
-        if self.strategy == StrategyEnum.SNIPE:
-            return self.max_block
-        if self.strategy == StrategyEnum.SCAN:
-            return self.max_block
-        if self.strategy == StrategyEnum.FRESH:
-            return self.max_block
-        if self.strategy == StrategyEnum.WATCHER:
-            return self.max_block
+        return 1000 if self.kovan else self.max_block
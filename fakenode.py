@@ -0,0 +1,152 @@
+import itertools
+from typing import Dict, Tuple
+
+import click
+from web3 import Web3
+
+from config import Config
+from services.benchmark.synthetic import SyntheticPoolGraph
+from services.fakenode.node import FakeNode
+from services.fakenode.timeline import synthetic_timeline
+from services.logger.logger import Logger
+from services.profiler.profiler import Profiler
+from services.replay.recorder import read_blocks
+from services.ttypes.strategy import StrategyEnum
+
+
+def parse_latencies(latencies: Tuple[str, ...]) -> Dict[str, float]:
+    latency_ms_by_method: Dict[str, float] = {}
+    for latency in latencies:
+        method, _, latency_ms = latency.partition("=")
+        if not latency_ms:
+            raise click.BadParameter(f"{latency} is not METHOD=MS")
+        latency_ms_by_method[method] = float(latency_ms)
+    return latency_ms_by_method
+
+
+@click.command()
+@click.option("--debug", is_flag=True, help="Display logs")
+@click.option("--port", default=8545, help="Set JSON-RPC port (Default: 8545)")
+@click.option(
+    "--file",
+    "file_path",
+    default=None,
+    help="Serve a recording written with --record instead of a synthetic graph",
+)
+@click.option(
+    "--blocks",
+    default=None,
+    type=int,
+    help="Stop mining after this number of blocks (Default: whole timeline)",
+)
+@click.option(
+    "--block-time",
+    default=13.0,
+    help="Set seconds between two blocks (Default: 13.0)",
+)
+@click.option(
+    "--latency",
+    multiple=True,
+    help="Set latency of a JSON-RPC method in ms, can be repeated (i.e: --latency eth_call=20)",
+)
+@click.option(
+    "--default-latency",
+    default=0.0,
+    help="Set latency in ms of the methods without --latency (Default: 0.0)",
+)
+@click.option(
+    "--jitter",
+    default=0.0,
+    help="Set relative spread of the latencies, 0.2 for +/- 20% (Default: 0.0)",
+)
+@click.option(
+    "--tokens",
+    default=50,
+    help="Set number of synthetic tokens, WETH included (Default: 50)",
+)
+@click.option(
+    "--pools",
+    default=200,
+    help="Set number of synthetic pools (Default: 200)",
+)
+@click.option(
+    "--hub-skew",
+    default=1.0,
+    help="Set Zipf exponent of the token popularity, 0 for uniform (Default: 1.0)",
+)
+@click.option(
+    "--balancer-share",
+    default=0.2,
+    help="Set share of Balancer pools, the others are Uniswap/SushiSwap (Default: 0.2)",
+)
+@click.option(
+    "--mispricing",
+    default=0.01,
+    help="Set standard deviation of the pool prices around the token prices (Default: 0.01)",
+)
+@click.option(
+    "--churn",
+    default=0.1,
+    help="Set share of the pools whose reserves move every block (Default: 0.1)",
+)
+@click.option(
+    "--gas-price",
+    default=50.0,
+    help="Set gas price in Gwei of the synthetic blocks (Default: 50.0)",
+)
+@click.option("--seed", default=0, help="Set random seed of the graph (Default: 0)")
+@click.option(
+    "--profile",
+    default=None,
+    type=int,
+    help="Profile the first N blocks, 0 to profile between two SIGUSR1 (Default: disabled)",
+)
+def fakenode(
+    debug: bool,
+    port: int,
+    file_path: str,
+    blocks: int,
+    block_time: float,
+    latency: Tuple[str, ...],
+    default_latency: float,
+    jitter: float,
+    tokens: int,
+    pools: int,
+    hub_skew: float,
+    balancer_share: float,
+    mispricing: float,
+    churn: float,
+    gas_price: float,
+    seed: int,
+    profile: int,
+) -> None:
+    config = Config(strategy=StrategyEnum.FAKENODE, debug=debug, profile_blocks=profile)
+    Profiler.instance(config)
+    if file_path:
+        timeline = read_blocks(file_path)
+    else:
+        graph = SyntheticPoolGraph(
+            config,
+            num_tokens=tokens,
+            num_pools=pools,
+            hub_skew=hub_skew,
+            balancer_share=balancer_share,
+            mispricing=mispricing,
+            seed=seed,
+        )
+        timeline = synthetic_timeline(graph, Web3.toWei(gas_price, "gwei"), churn)
+    if blocks is not None:
+        timeline = itertools.islice(timeline, blocks)
+    report = FakeNode(
+        timeline,
+        config,
+        block_time,
+        latency_ms_by_method=parse_latencies(latency),
+        default_latency_ms=default_latency,
+        jitter=jitter,
+    ).run(port)
+    Logger.instance(config).flush()
+    print(report)
+
+
+fakenode()
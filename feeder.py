@@ -0,0 +1,100 @@
+import click
+import sys
+
+from config import Config
+from services.ethereum.ethereum import Ethereum
+from services.profiler.profiler import Profiler
+from services.reserves.feeder import ReserveFeeder
+from services.reserves.shared import SharedReserveTable
+from services.ttypes.strategy import StrategyEnum
+
+
+@click.command()
+@click.option("--kovan", is_flag=True, help="Point to Kovan test network")
+@click.option("--debug", is_flag=True, help="Display logs")
+@click.option(
+    "--min-liquidity",
+    default=None,
+    type=int,
+    help="Set minimum liquidity (Default: all liquidity ranges)",
+)
+@click.option(
+    "--max-liquidity",
+    default=None,
+    type=int,
+    help="Set max liquidity (Default: all liquidity ranges)",
+)
+@click.option(
+    "--since",
+    default="latest",
+    help="Since Block (latest|pending) (Default: latest)",
+)
+@click.option(
+    "--only-tokens",
+    default="all",
+    help="Only filter tokens by name (i.e: --only XIOT,XAMP,UNI) (Default: all)",
+)
+@click.option(
+    "--name",
+    default="fvc_reserves",
+    help="Set name of the shared memory table (Default: fvc_reserves)",
+)
+@click.option(
+    "--capacity",
+    default=20000,
+    help="Set max number of pools in the shared memory table (Default: 20,000)",
+)
+@click.option(
+    "--threads",
+    default=16,
+    help="Set number of concurrent reserve fetches (Default: 16)",
+)
+@click.option(
+    "--profile",
+    default=None,
+    type=int,
+    help="Profile the first N blocks, 0 to profile between two SIGUSR1 (Default: disabled)",
+)
+def feeder(
+    kovan: bool,
+    debug: bool,
+    min_liquidity: int,
+    max_liquidity: int,
+    since: str,
+    only_tokens: str,
+    name: str,
+    capacity: int,
+    threads: int,
+    profile: int,
+) -> None:
+    print(
+        f"-----------------------------------------------------------\n"
+        f"------------------ FEEDING RESERVES -----------------------\n"
+        f"-----------------------------------------------------------\n"
+        f"Shared Memory Table: {name} (Capacity: {capacity} pools)\n"
+        f"Profile: {f'{profile} blocks' if profile else 'SIGUSR1' if profile == 0 else 'disabled'}\n"
+        f"Since Block: {since}\n"
+        f"Only Tokens: {only_tokens}\n"
+        f"-----------------------------------------------------------"
+    )
+    sys.stdout.flush()
+    config = Config(
+        strategy=StrategyEnum.FEEDER,
+        kovan=kovan,
+        debug=debug,
+        min_liquidity=min_liquidity,
+        max_liquidity=max_liquidity,
+        since=since,
+        only_tokens=only_tokens,
+        profile_blocks=profile,
+    )
+    Profiler.instance(config)
+    ethereum = Ethereum(config)
+    table = SharedReserveTable.create(name, capacity)
+    try:
+        ReserveFeeder(ethereum, config, table, threads=threads).feed()
+    finally:
+        table.close()
+
+
+feeder()
@@ -0,0 +1,98 @@
+import click
+
+from config import Config
+from services.ethereum.ethereum import Ethereum
+from services.logger.logger import Logger
+from services.profiler.profiler import Profiler
+from services.replay.replay import Replay
+from services.ttypes.strategy import StrategyEnum
+
+
+@click.command()
+@click.option("--debug", is_flag=True, help="Display logs")
+@click.option(
+    "--file",
+    "file_path",
+    required=True,
+    help="Recording written with --record (i.e: --file state/blocks.rec)",
+)
+@click.option(
+    "--from-block",
+    default=None,
+    type=int,
+    help="Only replay from this block (Default: first recorded block)",
+)
+@click.option(
+    "--to-block",
+    default=None,
+    type=int,
+    help="Only replay up to this block (Default: last recorded block)",
+)
+@click.option(
+    "--max-amount",
+    default=6.0,
+    help="Set max amount to trade with in WETH (Default: 6.0)",
+)
+@click.option(
+    "--min-amount",
+    default=3.0,
+    help="Set min Amount to trade with in WETH (Default: 3.0)",
+)
+@click.option(
+    "--max-block",
+    default=3,
+    help="Set max number of block we allow the transaction to go through (Default: 3)",
+)
+@click.option(
+    "--parallel",
+    is_flag=True,
+    help="Evaluate paths across a pool of worker processes",
+)
+@click.option(
+    "--workers",
+    default=4,
+    help="Set number of worker processes used with --parallel (Default: 4)",
+)
+@click.option(
+    "--remote-workers",
+    default=None,
+    help="Also evaluate paths on worker.py servers, comma separated (i.e: --remote-workers 10.0.0.2:7000,/tmp/fvc_worker.sock)",
+)
+@click.option(
+    "--profile",
+    default=None,
+    type=int,
+    help="Profile the first N blocks, 0 to profile between two SIGUSR1 (Default: disabled)",
+)
+def replay(
+    debug: bool,
+    file_path: str,
+    from_block: int,
+    to_block: int,
+    max_amount: float,
+    min_amount: float,
+    max_block: int,
+    parallel: bool,
+    workers: int,
+    remote_workers: str,
+    profile: int,
+) -> None:
+    config = Config(
+        strategy=StrategyEnum.REPLAY,
+        debug=debug,
+        max_amount=max_amount,
+        min_amount=min_amount,
+        max_block=max_block,
+        parallel=parallel,
+        workers=workers,
+        remote_workers=remote_workers,
+        profile_blocks=profile,
+    )
+    Profiler.instance(config)
+    ethereum = Ethereum(config)
+    report = Replay(file_path, ethereum, config).run(from_block, to_block)
+    Logger.instance(config).flush()
+    print(report)
+
+
+replay()
@@ -4,6 +4,7 @@ import sys
 from config import Config
 from services.ethereum.ethereum import Ethereum
 from services.pools.loader import PoolLoader
+from services.profiler.profiler import Profiler
 from services.strategy.scan import StrategyScan
 from services.ttypes.strategy import StrategyEnum
 
@@ -52,6 +53,53 @@ from services.ttypes.strategy import StrategyEnum
     default="all",
     help="Only filter tokens by name (i.e: --only XIOT,XAMP,UNI) (Default: all)",
 )
+@click.option(
+    "--parallel",
+    is_flag=True,
+    help="Evaluate paths across a pool of worker processes",
+)
+@click.option(
+    "--workers",
+    default=4,
+    help="Set number of worker processes used with --parallel (Default: 4)",
+)
+@click.option(
+    "--remote-workers",
+    default=None,
+    help="Also evaluate paths on worker.py servers, comma separated (i.e: --remote-workers 10.0.0.2:7000,/tmp/fvc_worker.sock)",
+)
+@click.option(
+    "--shared-reserves",
+    default=None,
+    help="Read reserves from the shared memory table published by feeder.py (i.e: --shared-reserves fvc_reserves)",
+)
+@click.option(
+    "--block-deadline",
+    default=10.0,
+    help="Set max seconds spent evaluating paths after a block arrives (Default: 10.0)",
+)
+@click.option(
+    "--nonce-file",
+    default=None,
+    help="Share the executor nonce with other processes through this locked file (i.e: --nonce-file /tmp/fvc_nonce)",
+)
+@click.option(
+    "--metrics-port",
+    default=None,
+    type=int,
+    help="Serve per-stage latencies and RPC counters on http://127.0.0.1:<port>/metrics",
+)
+@click.option(
+    "--record",
+    default=None,
+    help="Append the reserves of every block to this file, to run replay.py on it (i.e: --record state/blocks.rec)",
+)
+@click.option(
+    "--profile",
+    default=None,
+    type=int,
+    help="Profile the first N blocks, 0 to profile between two SIGUSR1 (Default: disabled)",
+)
 def scan(
     kovan: bool,
     debug: bool,
@@ -64,6 +112,15 @@ def scan(
     max_block: int,
     since: str,
     only_tokens: str,
+    parallel: bool,
+    workers: int,
+    remote_workers: str,
+    shared_reserves: str,
+    block_deadline: float,
+    nonce_file: str,
+    metrics_port: int,
+    record: str,
+    profile: int,
 ) -> None:
     print(
         f"-----------------------------------------------------------\n"
@@ -72,6 +129,14 @@ def scan(
         f"Gas Multiplier: {gas_multiplier}\n"
         f"Max Block Allowed: {max_block}\n"
         f"Sending Transactions on-chain: {send_tx}\n"
+        f"Parallel Workers: {workers if parallel else 'disabled'}\n"
+        f"Remote Workers: {remote_workers or 'disabled'}\n"
+        f"Shared Reserves: {shared_reserves or 'disabled'}\n"
+        f"Block Deadline: {block_deadline} seconds\n"
+        f"Nonce File: {nonce_file or 'disabled'}\n"
+        f"Metrics Port: {metrics_port or 'disabled'}\n"
+        f"Record: {record or 'disabled'}\n"
+        f"Profile: {f'{profile} blocks' if profile else 'SIGUSR1' if profile == 0 else 'disabled'}\n"
         f"Since Block: {since}\n"
         f"Only Tokens: {only_tokens}\n"
         f"-----------------------------------------------------------"
@@ -90,7 +155,17 @@ def scan(
         max_block=max_block,
         since=since,
         only_tokens=only_tokens,
+        parallel=parallel,
+        workers=workers,
+        remote_workers=remote_workers,
+        shared_reserves=shared_reserves,
+        block_deadline=block_deadline,
+        nonce_file=nonce_file,
+        metrics_port=metrics_port,
+        record_path=record,
+        profile_blocks=profile,
     )
+    Profiler.instance(config)
     pool_loader = PoolLoader(config=config)
     pools = pool_loader.load_all_pools()
     ethereum = Ethereum(config)
@@ -1,16 +1,33 @@
-from typing import Dict, List, Tuple
-import sys
-
-import numpy
-from colored import fg, stylize
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple, Union
 
 from config import Config
+from services.arbitrage.evaluator import PathEvaluator
+from services.arbitrage.gas_model import GasModel
+from services.arbitrage.parallel import ParallelEvaluator
+from services.arbitrage.path_stats import PathStatsStore
+from services.arbitrage.safety_cache import SafetyCheckCache
+from services.arbitrage.scheduler import BlockScheduler
 from services.ethereum.ethereum import Ethereum
 from services.exchange.factory import ExchangeFactory
 from services.exchange.iexchange import ExchangeInterface
+from services.logger.logger import ERROR, Logger
+from services.metrics.metrics import (
+    EVALUATION,
+    PREFILTER,
+    SAFETY_CHECK,
+    STATE_FETCH,
+    Metrics,
+)
 from services.pools.pool import Pool
-from services.pools.token import Token
-from services.ttypes.arbitrage import ArbitragePath
+from services.profiler.profiler import Profiler
+from services.reserves.snapshot import ReserveSnapshot
+from services.ttypes.arbitrage import (
+    ArbitragePath,
+    EvaluationReport,
+    PathCandidate,
+)
 from services.notifications.notifications import Notification
 from services.printer.printer import PrinterContract
 
@@ -22,20 +39,51 @@ class Arbitrage:
         ethereum: Ethereum,
         config: Config,
         consecutive: int = 2,
+        path_stats: PathStatsStore = None,
+        safety_cache: SafetyCheckCache = None,
+        gas_model: GasModel = None,
+        exchange_by_pool_address: Dict[str, ExchangeInterface] = None,
     ) -> None:
         self.pools = pools
         self.ethereum = ethereum
         self.config = config
-        self.weth_address = self.config.get("WETH_ADDRESS").lower()
-        self.weth_token = Token(name="WETH", address=self.weth_address, decimal=18)
-        self.weth_amount_in_wei = self.weth_token.to_wei(self.config.min_amount)
+        self.logger = Logger.instance(self.config)
+        self.metrics = Metrics.instance(self.config)
+        self.profiler = Profiler.instance(self.config)
 
-        self.exchange_by_pool_address = self._init_all_exchange_contracts()
+        # Exchanges can be given to run without a node (replay)
+        self.exchange_by_pool_address = (
+            exchange_by_pool_address or self._init_all_exchange_contracts()
+        )
+        self.evaluator = PathEvaluator(self.config)
+        self.parallel_evaluator: ParallelEvaluator = None
+        self.scheduler = BlockScheduler(self.config, path_stats)
+        self.safety_cache = safety_cache or SafetyCheckCache(self.config)
+        self.gas_model = gas_model or GasModel(self.config)
+        self.report: EvaluationReport = None
+        self.snapshot: ReserveSnapshot = None
         self.notification = Notification(self.config)
         self.printer = PrinterContract(
             self.ethereum, self.notification, self.config, consecutive=consecutive
         )
 
+    def load_paths(self, arbitrage_paths: List[ArbitragePath]) -> None:
+        """Shard the paths across worker processes with `--parallel` and `--remote-workers`"""
+        if (
+            not (self.config.parallel or self.config.remote_workers)
+            or not arbitrage_paths
+        ):
+            return
+        self.close()
+        self.parallel_evaluator = ParallelEvaluator(
+            arbitrage_paths, self.config, self.scheduler.path_stats
+        )
+
+    def close(self) -> None:
+        if self.parallel_evaluator:
+            self.parallel_evaluator.close()
+            self.parallel_evaluator = None
+
     def calc_arbitrage_and_print(
         self,
         arbitrage_paths: List[ArbitragePath],
@@ -46,120 +94,223 @@ class Arbitrage:
         """Calculate Arbitrage opportunities for all paths
         If we find a positive arbitrage, possibly call Printer smart contract
         """
+        positive_paths = self.find_positive_paths(
+            arbitrage_paths, latest_block, gas_price, tx_hash
+        )
+        if not positive_paths:
+            return None
+        with ThreadPoolExecutor(
+            max_workers=self.config.get_int("ENGINE_FETCH_THREADS")
+        ) as executor, self.metrics.time(SAFETY_CHECK):
+            gas_estimates = self.printer.estimate_gas_all(positive_paths, executor)
+        self.record_gas_estimates(positive_paths, gas_estimates, latest_block)
+        return self.printer.print_best(
+            positive_paths, gas_estimates, latest_block, tx_hash
+        )
+
+    def load_snapshot(
+        self,
+        arbitrage_paths: List[ArbitragePath],
+        latest_block: int,
+        tx_hash: str = "",
+        executor: Executor = None,
+    ) -> None:
+        """Fetch the reserves of every pool used by `arbitrage_paths` ahead of the evaluation"""
+        # Pending transactions being sniped can move reserves within the same block
+        self._refresh_snapshot(latest_block, tx_hash)
+        pools_by_address = {
+            connecting_path.pool.address: connecting_path.pool
+            for arbitrage_path in arbitrage_paths
+            for connecting_path in arbitrage_path.connecting_paths
+        }
+        map_function = executor.map if executor else map
+        with self.metrics.time(STATE_FETCH):
+            for _ in map_function(self._try_load_pool, pools_by_address.values()):
+                pass
+
+    def share_snapshot(self, snapshot: ReserveSnapshot) -> None:
+        """Evaluate on the reserves loaded by another `Arbitrage` with the same exchanges"""
+        self.snapshot = snapshot
+
+    def find_positive_paths(
+        self,
+        arbitrage_paths: List[ArbitragePath],
+        latest_block: int,
+        gas_price: int,
+        tx_hash: str = "",
+        should_stop: Callable[[], str] = None,
+        sample_cold_paths: bool = False,
+    ) -> List[ArbitragePath]:
+        """Evaluate paths, most promising first, and return the positive ones
+        Nothing is sent on-chain. `should_stop` is checked between chunks and returns the reason
+        to stop (new block, deadline) if the remaining paths have to be skipped.
+        """
         max_block_allowed = self.config.get_max_block_allowed()
+        self._refresh_snapshot(latest_block, tx_hash)
+        prefilter_start_time = time.perf_counter()
+        with self.profiler.stage(PREFILTER):
+            # Paths that recently reverted in estimateGas wait for their backoff to expire
+            retry_paths = [
+                arbitrage_path
+                for arbitrage_path in arbitrage_paths
+                if not self.safety_cache.is_backing_off(
+                    arbitrage_path.path_id, latest_block
+                )
+            ]
+            ranked_paths, cold = self.scheduler.rank(
+                retry_paths, self.snapshot, latest_block, sample_cold_paths
+            )
+        evaluation_start_time = time.perf_counter()
+        self.metrics.observe(PREFILTER, evaluation_start_time - prefilter_start_time)
+        self.report = EvaluationReport(
+            block_number=latest_block,
+            total=len(arbitrage_paths),
+            cold=cold,
+            backing_off=len(arbitrage_paths) - len(retry_paths),
+        )
+        evaluated_paths: List[ArbitragePath] = []
+        positive_paths: List[ArbitragePath] = []
+        with self.profiler.stage(EVALUATION):
+            for chunk in self.scheduler.chunks(ranked_paths):
+                stopped_by = should_stop() if should_stop else None
+                if stopped_by:
+                    self.report.stopped_by = stopped_by
+                    break
+                positive_paths += self._evaluate_chunk(
+                    chunk, gas_price, latest_block + max_block_allowed
+                )
+                evaluated_paths += chunk
+        self.metrics.observe(EVALUATION, time.perf_counter() - evaluation_start_time)
+        self._observe_stage_seconds()
+        positive_paths = [
+            arbitrage_path
+            for arbitrage_path in positive_paths
+            if not self.safety_cache.is_known_failure(arbitrage_path, self.snapshot)
+        ]
+        self.report.evaluated = len(evaluated_paths)
+        self.report.positive = len(positive_paths)
+        # Pending transactions being sniped don't tell anything about the path in general
+        if not tx_hash:
+            self.scheduler.record(latest_block, evaluated_paths, positive_paths)
+        return positive_paths
+
+    def record_gas_estimates(
+        self,
+        arbitrage_paths: List[ArbitragePath],
+        gas_estimates: Dict[str, Union[int, str]],
+        latest_block: int,
+    ) -> None:
+        """Feed the outcome of the safety checks to the negative cache and the gas model"""
+        for arbitrage_path in arbitrage_paths:
+            gas_estimate = gas_estimates.get(arbitrage_path.path_id)
+            passed = isinstance(gas_estimate, int)
+            self.safety_cache.record(
+                arbitrage_path, self.snapshot, latest_block, passed
+            )
+            if passed:
+                self.gas_model.record(arbitrage_path, gas_estimate)
+
+    def _evaluate_chunk(
+        self,
+        arbitrage_paths: List[ArbitragePath],
+        gas_price: int,
+        max_block_height: int,
+    ) -> List[ArbitragePath]:
         for arbitrage_path in arbitrage_paths:
             arbitrage_path.gas_price = gas_price
-            arbitrage_path.max_block_height = latest_block + max_block_allowed
+            arbitrage_path.max_block_height = max_block_height
+            arbitrage_path.estimated_gas = self.gas_model.estimate(arbitrage_path)
+        candidate_by_path_id = self._evaluate_in_parallel(
+            arbitrage_paths, gas_price, max_block_height
+        )
+        positive_paths: List[ArbitragePath] = []
+        for arbitrage_path in arbitrage_paths:
             try:
-                _, all_amount_outs_wei = self._calculate_single_path_arbitrage(
-                    arbitrage_path, self.weth_amount_in_wei
-                )
-                is_positive_arb = self._analyze_arbitrage(
-                    all_amount_outs_wei,
-                    arbitrage_path,
-                )
+                if self.parallel_evaluator and self.parallel_evaluator.contains(
+                    arbitrage_path
+                ):
+                    candidate = candidate_by_path_id.get(arbitrage_path.path_id)
+                    is_positive_arb = candidate is not None
+                    if is_positive_arb:
+                        arbitrage_path.apply_candidate(candidate)
+                else:
+                    is_positive_arb = self.evaluator.evaluate(
+                        arbitrage_path, self.snapshot
+                    )
 
                 if is_positive_arb:
-                    res = self.printer.arbitrage_on_chain(arbitrage_path, latest_block)
-                    if res and self.config.strategy.WATCHER:
-                        return arbitrage_path
+                    positive_paths.append(arbitrage_path)
                 else:
                     arbitrage_path.consecutive_arbs = 0
             except Exception as e:
-                print(
-                    stylize(
-                        f"Error calculating arbitrage path: {str(e)}",
-                        fg("light_red"),
-                    )
-                )
-                sys.stdout.flush()
+                self._print_path_error(str(e))
                 continue
-        return None
+        return positive_paths
 
-    def _analyze_arbitrage(
+    def _evaluate_in_parallel(
         self,
-        all_amount_outs_wei: List[int],
-        arbitrage_path: ArbitragePath,
-    ) -> bool:
-        arbitrage_amount = (
-            all_amount_outs_wei[-1]
-            - self.weth_amount_in_wei
-            - arbitrage_path.gas_price_execution
+        arbitrage_paths: List[ArbitragePath],
+        gas_price: int,
+        max_block_height: int,
+    ) -> Dict[str, PathCandidate]:
+        if not self.parallel_evaluator:
+            return {}
+        sharded_paths = [
+            arbitrage_path
+            for arbitrage_path in arbitrage_paths
+            if self.parallel_evaluator.contains(arbitrage_path)
+        ]
+        candidate_by_path_id, errors = self.parallel_evaluator.evaluate(
+            sharded_paths, self.snapshot, gas_price, max_block_height
         )
+        for error in errors:
+            self._print_path_error(error)
+        return candidate_by_path_id
 
-        if arbitrage_amount > 0:
-            self._optimize_arbitrage_amount(
-                arbitrage_path,
-                arbitrage_amount,
-            )
+    def _observe_stage_seconds(self) -> None:
+        stage_seconds = self.evaluator.pop_stage_seconds()
+        if self.parallel_evaluator:
+            for stage, seconds in self.parallel_evaluator.pop_stage_seconds().items():
+                stage_seconds[stage] += seconds
+        for stage, seconds in stage_seconds.items():
+            self.metrics.observe(stage, seconds)
 
-            if arbitrage_path.max_arbitrage_amount_wei > (
-                arbitrage_path.gas_price_execution + self.weth_token.to_wei(0.10)
-            ):
-                return True
-            else:
-                return False
-        else:
-            return False
+    def _print_path_error(self, error: str) -> None:
+        self.logger.log(
+            ERROR,
+            f"Error calculating arbitrage path: {error}",
+            color="light_red",
+            sample_key=f"path_error:{error}",
+        )
 
-    def _optimize_arbitrage_amount(
-        self,
-        arbitrage_path: ArbitragePath,
-        arbitrage_amount_wei: int,
-    ) -> None:
-        """After finding an arbitrage opportunity, maximize the gain by changing the amount in"""
-        max_arbitrage_amount_wei = arbitrage_amount_wei
-        optimal_amount_in_wei = self.weth_amount_in_wei
-        all_optimal_amount_out_wei = []
-        for amount in numpy.arange(
-            self.config.min_amount + self.config.get_float("INCREMENTAL_STEP"),
-            self.config.max_amount,
-            self.config.get_float("INCREMENTAL_STEP"),
-        ):
-            test_amount_in = self.weth_token.to_wei(amount)
-            _, all_amount_outs_wei = self._calculate_single_path_arbitrage(
-                arbitrage_path, test_amount_in
-            )
-            new_arbitrage_amount_wei = int(all_amount_outs_wei[-1] - test_amount_in)
-
-            if new_arbitrage_amount_wei >= max_arbitrage_amount_wei:
-                max_arbitrage_amount_wei = new_arbitrage_amount_wei
-                optimal_amount_in_wei = test_amount_in
-                all_optimal_amount_out_wei = all_amount_outs_wei
-            else:
-                break
-
-        percentage_to_max = (
-            optimal_amount_in_wei + arbitrage_path.gas_price_execution
-        ) / all_optimal_amount_out_wei[-1]
-        arbitrage_path.all_min_amount_out_wei = [
-            int(amount_out * percentage_to_max)
-            for amount_out in all_optimal_amount_out_wei
-        ]
-        arbitrage_path.max_arbitrage_amount_wei = max_arbitrage_amount_wei
-        arbitrage_path.optimal_amount_in_wei = optimal_amount_in_wei
-        arbitrage_path.all_optimal_amount_out_wei = all_optimal_amount_out_wei
-
-    def _calculate_single_path_arbitrage(
-        self, arbitrage_path: ArbitragePath, amount_in_wei: int
-    ) -> Tuple[Token, List[int]]:
-        all_amount_outs_wei: List[int] = []
-        for connecting_path in arbitrage_path.connecting_paths:
-            token_out, amount_out_wei = self._simulate_one_exchange(
-                connecting_path.pool, connecting_path.token_in, amount_in_wei
-            )
-            all_amount_outs_wei.append(amount_out_wei)
-            amount_in_wei = amount_out_wei
-        return token_out, all_amount_outs_wei
-
-    def _simulate_one_exchange(
-        self, pool: Pool, token_in: Token, amount_in_wei: int
-    ) -> Tuple[Token, int]:
-        _, token_out = pool.get_token_pair_from_token_in(token_in.address)
-        amount_out_wei = self.exchange_by_pool_address[pool.address].calc_amount_out(
-            token_in, token_out, amount_in_wei
+    def _refresh_snapshot(self, latest_block: int, tx_hash: str) -> None:
+        block_key = (latest_block, tx_hash)
+        if self.snapshot is not None and self.snapshot.block_key == block_key:
+            return
+        reserves_by_pool_address = {}
+        if self.ethereum.reserve_table and not tx_hash:
+            block_number, reserves = self.ethereum.reserve_table.read()
+            # Pools missing from the feeder (or a lagging feeder) are fetched from the node
+            if block_number == latest_block:
+                reserves_by_pool_address = reserves
+        self.snapshot = ReserveSnapshot(
+            block_key,
+            reserves_by_pool_address=reserves_by_pool_address,
+            fetch_reserves=self._fetch_reserves,
         )
-        return token_out, amount_out_wei
+
+    def _try_load_pool(self, pool: Pool) -> None:
+        try:
+            self.snapshot.get(pool)
+        except Exception as e:
+            # The paths using this pool will report the error during evaluation
+            self.logger.debug(
+                f"Could not fetch reserves of {pool.address}: {str(e)}",
+                pool=pool.address,
+            )
+
+    def _fetch_reserves(self, pool: Pool) -> Tuple[int, ...]:
+        return self.exchange_by_pool_address[pool.address].fetch_reserves(pool.tokens)
 
     def _init_all_exchange_contracts(self) -> Dict[str, ExchangeInterface]:
         exchange_by_pool_address = {}
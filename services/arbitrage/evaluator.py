@@ -0,0 +1,164 @@
+import time
+from typing import Dict, List, Tuple
+
+import numpy
+
+from config import Config
+from services.arbitrage.hop_cache import HopCache
+from services.exchange.factory import ExchangeFactory
+from services.logger.logger import Logger
+from services.metrics.metrics import OPTIMIZATION, SIMULATION
+from services.pools.pool import Pool
+from services.pools.token import Token
+from services.reserves.snapshot import ReserveSnapshot
+from services.ttypes.arbitrage import ArbitragePath
+
+
+class PathEvaluator:
+    """Simulate arbitrage paths locally from a `ReserveSnapshot`.
+
+    It doesn't hold any contract so it can run in worker processes as well.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.weth_address = self.config.get("WETH_ADDRESS").lower()
+        self.weth_token = Token(name="WETH", address=self.weth_address, decimal=18)
+        self.weth_amount_in_wei = self.weth_token.to_wei(self.config.min_amount)
+        self.incremental_step = self.config.get_float("INCREMENTAL_STEP")
+        self.hop_cache = HopCache()
+        self.logger = Logger.instance(self.config)
+        self.snapshot: ReserveSnapshot = None
+        # Seconds spent by stage since the last `pop_stage_seconds`
+        self.stage_seconds: Dict[str, float] = {SIMULATION: 0.0, OPTIMIZATION: 0.0}
+        # Whole paths simulated, by the evaluation and the optimizer, since the last `pop_simulations`
+        self.simulations = 0
+
+    def evaluate(
+        self, arbitrage_path: ArbitragePath, snapshot: ReserveSnapshot
+    ) -> bool:
+        """Return True if `arbitrage_path` is a positive arbitrage, its optimal amounts are then set"""
+        self.snapshot = snapshot
+        self.hop_cache.reset_if_new_block(snapshot.block_key)
+        start_time = time.perf_counter()
+        _, all_amount_outs_wei = self._calculate_single_path_arbitrage(
+            arbitrage_path, self.weth_amount_in_wei
+        )
+        self.stage_seconds[SIMULATION] += time.perf_counter() - start_time
+        return self._analyze_arbitrage(all_amount_outs_wei, arbitrage_path)
+
+    def pop_stage_seconds(self) -> Dict[str, float]:
+        stage_seconds = self.stage_seconds
+        self.stage_seconds = {SIMULATION: 0.0, OPTIMIZATION: 0.0}
+        return stage_seconds
+
+    def pop_simulations(self) -> int:
+        simulations = self.simulations
+        self.simulations = 0
+        return simulations
+
+    def _analyze_arbitrage(
+        self,
+        all_amount_outs_wei: List[int],
+        arbitrage_path: ArbitragePath,
+    ) -> bool:
+        arbitrage_amount = (
+            all_amount_outs_wei[-1]
+            - self.weth_amount_in_wei
+            - arbitrage_path.gas_price_execution
+        )
+
+        if arbitrage_amount > 0:
+            start_time = time.perf_counter()
+            self._optimize_arbitrage_amount(
+                arbitrage_path,
+                arbitrage_amount,
+            )
+            self.stage_seconds[OPTIMIZATION] += time.perf_counter() - start_time
+
+            if arbitrage_path.max_arbitrage_amount_wei > (
+                arbitrage_path.gas_price_execution + self.weth_token.to_wei(0.10)
+            ):
+                return True
+            else:
+                return False
+        else:
+            return False
+
+    def _optimize_arbitrage_amount(
+        self,
+        arbitrage_path: ArbitragePath,
+        arbitrage_amount_wei: int,
+    ) -> None:
+        """After finding an arbitrage opportunity, maximize the gain by changing the amount in"""
+        max_arbitrage_amount_wei = arbitrage_amount_wei
+        optimal_amount_in_wei = self.weth_amount_in_wei
+        all_optimal_amount_out_wei = []
+        for amount in numpy.arange(
+            self.config.min_amount + self.incremental_step,
+            self.config.max_amount,
+            self.incremental_step,
+        ):
+            test_amount_in = self.weth_token.to_wei(amount)
+            _, all_amount_outs_wei = self._calculate_single_path_arbitrage(
+                arbitrage_path, test_amount_in
+            )
+            new_arbitrage_amount_wei = int(all_amount_outs_wei[-1] - test_amount_in)
+
+            if new_arbitrage_amount_wei >= max_arbitrage_amount_wei:
+                max_arbitrage_amount_wei = new_arbitrage_amount_wei
+                optimal_amount_in_wei = test_amount_in
+                all_optimal_amount_out_wei = all_amount_outs_wei
+            else:
+                break
+
+        percentage_to_max = (
+            optimal_amount_in_wei + arbitrage_path.gas_price_execution
+        ) / all_optimal_amount_out_wei[-1]
+        arbitrage_path.all_min_amount_out_wei = [
+            int(amount_out * percentage_to_max)
+            for amount_out in all_optimal_amount_out_wei
+        ]
+        arbitrage_path.max_arbitrage_amount_wei = max_arbitrage_amount_wei
+        arbitrage_path.optimal_amount_in_wei = optimal_amount_in_wei
+        arbitrage_path.all_optimal_amount_out_wei = all_optimal_amount_out_wei
+
+    def _calculate_single_path_arbitrage(
+        self, arbitrage_path: ArbitragePath, amount_in_wei: int
+    ) -> Tuple[Token, List[int]]:
+        self.simulations += 1
+        all_amount_outs_wei: List[int] = []
+        for connecting_path in arbitrage_path.connecting_paths:
+            token_out, amount_out_wei = self._simulate_one_exchange(
+                connecting_path.pool, connecting_path.token_in, amount_in_wei
+            )
+            all_amount_outs_wei.append(amount_out_wei)
+            amount_in_wei = amount_out_wei
+        return token_out, all_amount_outs_wei
+
+    def _simulate_one_exchange(
+        self, pool: Pool, token_in: Token, amount_in_wei: int
+    ) -> Tuple[Token, int]:
+        _, token_out = pool.get_token_pair_from_token_in(token_in.address)
+        amount_out_wei = self.hop_cache.get(
+            pool.address, token_in.address, amount_in_wei
+        )
+        if amount_out_wei is None:
+            token_in_index = 0 if pool.tokens[0].address == token_in.address else 1
+            amount_out_wei = ExchangeFactory.get_class(
+                pool.type
+            ).calc_amount_out_from_reserves(
+                self.snapshot.get(pool),
+                token_in_index,
+                token_in,
+                token_out,
+                amount_in_wei,
+            )
+            self.hop_cache.set(
+                pool.address, token_in.address, amount_in_wei, amount_out_wei
+            )
+            if self.config.debug:
+                self.logger.debug(
+                    f"[{pool.type.name}] Exchange {token_in.from_wei(amount_in_wei)} {token_in.name} -> {token_out.from_wei(amount_out_wei)} {token_out.name}"
+                )
+        return token_out, amount_out_wei
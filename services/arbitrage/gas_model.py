@@ -0,0 +1,38 @@
+from typing import Dict, Tuple
+
+from config import Config
+from services.ttypes.arbitrage import ArbitragePath
+
+
+class GasModel:
+    """Gas used by the arbitrage transaction, learned from the `estimateGas` results.
+
+    Estimates are smoothed per path and per path shape (hops and router segments). A path
+    never estimated falls back on its shape, then on `ESTIMATE_GAS_EXECUTION`.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.default_gas = self.config.get_int("ESTIMATE_GAS_EXECUTION")
+        self.smoothing = self.config.get_float("GAS_MODEL_SMOOTHING")
+        self.margin = self.config.get_float("GAS_MODEL_MARGIN")
+        self.gas_by_path_id: Dict[str, float] = {}
+        self.gas_by_shape: Dict[Tuple[int, Tuple[int, ...]], float] = {}
+
+    def estimate(self, arbitrage_path: ArbitragePath) -> int:
+        gas = self.gas_by_path_id.get(arbitrage_path.path_id)
+        if gas is None:
+            gas = self.gas_by_shape.get(arbitrage_path.shape)
+        if gas is None:
+            return self.default_gas
+        return int(gas * self.margin)
+
+    def record(self, arbitrage_path: ArbitragePath, gas_used: int) -> None:
+        self._smooth(self.gas_by_path_id, arbitrage_path.path_id, gas_used)
+        self._smooth(self.gas_by_shape, arbitrage_path.shape, gas_used)
+
+    def _smooth(self, gas_by_key: Dict, key, gas_used: int) -> None:
+        gas = gas_by_key.get(key)
+        gas_by_key[key] = (
+            gas_used if gas is None else gas + self.smoothing * (gas_used - gas)
+        )
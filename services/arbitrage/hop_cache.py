@@ -0,0 +1,47 @@
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class HopCache:
+    """Memoize single exchange simulations for the duration of one block.
+
+    Many paths share their first hop (WETH -> X through the same pool with the same amount in)
+    and often their last one, so each `(pool, token_in, amount_in)` is only simulated once per
+    block. The cache is cleared as soon as a different block key is seen.
+    """
+
+    def __init__(self) -> None:
+        self.block_key: Hashable = None
+        self.amount_out_by_hop: Dict[Tuple[str, str, int], int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def reset_if_new_block(self, block_key: Hashable) -> None:
+        if block_key == self.block_key:
+            return
+        self.block_key = block_key
+        self.amount_out_by_hop = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, pool_address: str, token_in_address: str, amount_in_wei: int
+    ) -> Optional[int]:
+        amount_out_wei = self.amount_out_by_hop.get(
+            (pool_address, token_in_address, amount_in_wei)
+        )
+        if amount_out_wei is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return amount_out_wei
+
+    def set(
+        self,
+        pool_address: str,
+        token_in_address: str,
+        amount_in_wei: int,
+        amount_out_wei: int,
+    ) -> None:
+        self.amount_out_by_hop[(pool_address, token_in_address, amount_in_wei)] = (
+            amount_out_wei
+        )
@@ -0,0 +1,496 @@
+import heapq
+import multiprocessing
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from config import Config
+from services.arbitrage.evaluator import PathEvaluator
+from services.arbitrage.path_stats import PathStatsStore
+from services.logger.logger import ERROR, Logger
+from services.metrics.metrics import OPTIMIZATION, SIMULATION
+from services.pools.pool import Pool
+from services.profiler.profiler import Profiler
+from services.reserves.snapshot import ReserveSnapshot
+from services.ttypes.arbitrage import ArbitragePath, PathCandidate
+from services.ttypes.strategy import StrategyEnum
+
+
+def parse_address(address: str) -> Union[Tuple[str, int], str]:
+    """`host:port` for TCP, anything else is a unix socket path"""
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return (host, int(port))
+    return address
+
+
+class ParallelEvaluator:
+    """Evaluate paths across persistent workers, each one owning a shard of paths.
+
+    Workers are local processes (`--parallel`) and/or `worker.py` servers reached over a socket
+    (`--remote-workers`), with the same protocol. Shards are shipped when the workers start.
+    Every block, a worker only receives the reserves of the pools its shard uses and sends back
+    the positive candidates, so the transactions are still sent from the main process.
+    Workers also send back the seconds spent on each path: shards are balanced by measured
+    cost, and every `PARALLEL_REBALANCE_BLOCKS` paths move from the busiest workers to the
+    idlest ones. The paths of a worker that went away are moved to the others.
+    """
+
+    def __init__(
+        self,
+        arbitrage_paths: List[ArbitragePath],
+        config: Config,
+        path_stats: PathStatsStore = None,
+    ) -> None:
+        self.config = config
+        self.logger = Logger.instance(self.config)
+        self.rebalance_blocks = self.config.get_int("PARALLEL_REBALANCE_BLOCKS")
+        self.rebalance_tolerance = self.config.get_float("PARALLEL_REBALANCE_TOLERANCE")
+        # Kept by the path stats across reloads when given
+        self.seconds_by_path_id: Dict[str, float] = (
+            path_stats.seconds_by_path_id if path_stats else {}
+        )
+        self.path_by_id: Dict[str, ArbitragePath] = {
+            arbitrage_path.path_id: arbitrage_path for arbitrage_path in arbitrage_paths
+        }
+        self.block_key: Any = None
+        self.blocks = 0
+
+        self.connections: List[Connection] = []
+        self.processes: List[multiprocessing.Process] = []
+        remote_connections: List[Connection] = []
+        for address in self.config.remote_workers:
+            try:
+                remote_connections.append(
+                    Client(
+                        parse_address(address),
+                        authkey=self.config.get("WORKER_AUTHKEY").encode(),
+                    )
+                )
+            except Exception as e:
+                self.logger.log(
+                    ERROR,
+                    f"Could not connect to worker {address}: {str(e)}",
+                    color="red",
+                )
+        num_local_workers = (
+            min(self.config.workers, len(arbitrage_paths))
+            if self.config.parallel
+            else 0
+        )
+        shards = self._balance(
+            arbitrage_paths, num_local_workers + len(remote_connections)
+        )
+        self.path_ids_by_worker: List[Set[str]] = [
+            {arbitrage_path.path_id for arbitrage_path in shard} for shard in shards
+        ]
+        self.worker_by_path_id: Dict[str, int] = {
+            path_id: worker_index
+            for worker_index, path_ids in enumerate(self.path_ids_by_worker)
+            for path_id in path_ids
+        }
+        for shard in shards[:num_local_workers]:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_evaluate_shard,
+                args=(worker_connection, self.config, shard),
+                daemon=True,
+            )
+            process.start()
+            worker_connection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+        for connection, shard in zip(remote_connections, shards[num_local_workers:]):
+            connection.send(
+                (
+                    "config",
+                    self.config.kovan,
+                    self.config.debug,
+                    self.config.min_amount,
+                    self.config.max_amount,
+                )
+            )
+            connection.send(("add", shard))
+            self.connections.append(connection)
+
+        # Seconds spent by stage in the workers since the last `pop_stage_seconds`
+        self.stage_seconds: Dict[str, float] = {SIMULATION: 0.0, OPTIMIZATION: 0.0}
+
+    def contains(self, arbitrage_path: ArbitragePath) -> bool:
+        return arbitrage_path.path_id in self.worker_by_path_id
+
+    def evaluate(
+        self,
+        arbitrage_paths: List[ArbitragePath],
+        snapshot: ReserveSnapshot,
+        gas_price: int,
+        max_block_height: int,
+    ) -> Tuple[Dict[str, PathCandidate], List[str]]:
+        """Return positive candidates by path id and the errors raised by the workers"""
+        errors: List[str] = []
+        if snapshot.block_key != self.block_key:
+            self.block_key = snapshot.block_key
+            self.blocks += 1
+            if self.blocks % self.rebalance_blocks == 0:
+                errors += self._rebalance()
+
+        path_ids_by_worker: List[List[str]] = [[] for _ in self.connections]
+        estimated_gases_by_worker: List[List[int]] = [[] for _ in self.connections]
+        pools_by_worker: List[Dict[str, Pool]] = [{} for _ in self.connections]
+        for arbitrage_path in arbitrage_paths:
+            worker_index = self.worker_by_path_id[arbitrage_path.path_id]
+            path_ids_by_worker[worker_index].append(arbitrage_path.path_id)
+            estimated_gases_by_worker[worker_index].append(arbitrage_path.estimated_gas)
+            for connecting_path in arbitrage_path.connecting_paths:
+                pool = connecting_path.pool
+                pools_by_worker[worker_index][pool.address] = pool
+
+        busy_workers: List[int] = []
+        for worker_index, path_ids in enumerate(path_ids_by_worker):
+            if not path_ids:
+                continue
+            reserves_by_pool_address = {}
+            for pool in pools_by_worker[worker_index].values():
+                try:
+                    reserves_by_pool_address[pool.address] = snapshot.get(pool)
+                except Exception as e:
+                    errors.append(
+                        f"Could not fetch reserves of {pool.address}: {str(e)}"
+                    )
+            try:
+                self.connections[worker_index].send(
+                    (
+                        "evaluate",
+                        snapshot.block_key,
+                        gas_price,
+                        max_block_height,
+                        reserves_by_pool_address,
+                        path_ids,
+                        estimated_gases_by_worker[worker_index],
+                    )
+                )
+                busy_workers.append(worker_index)
+            except (EOFError, OSError) as e:
+                errors += self._drop_worker(worker_index, e)
+
+        candidate_by_path_id: Dict[str, PathCandidate] = {}
+        for worker_index in busy_workers:
+            try:
+                (
+                    worker_candidates,
+                    worker_errors,
+                    worker_stage_seconds,
+                    worker_seconds,
+                ) = self.connections[worker_index].recv()
+            except (EOFError, OSError) as e:
+                errors += self._drop_worker(worker_index, e)
+                continue
+            for candidate in worker_candidates:
+                candidate_by_path_id[candidate.path_id] = candidate
+            errors += worker_errors
+            for stage, seconds in worker_stage_seconds.items():
+                self.stage_seconds[stage] += seconds
+            for path_id, seconds in zip(
+                path_ids_by_worker[worker_index], worker_seconds
+            ):
+                self.seconds_by_path_id[path_id] = (
+                    self.seconds_by_path_id.get(path_id, 0.0) + seconds
+                )
+        return candidate_by_path_id, errors
+
+    def pop_stage_seconds(self) -> Dict[str, float]:
+        stage_seconds = self.stage_seconds
+        self.stage_seconds = {SIMULATION: 0.0, OPTIMIZATION: 0.0}
+        return stage_seconds
+
+    def close(self) -> None:
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for connection in self.connections:
+            connection.close()
+
+    def _cost(self, path_id: str) -> float:
+        return self.seconds_by_path_id.get(path_id, self.default_seconds)
+
+    def _balance(
+        self, arbitrage_paths: List[ArbitragePath], num_workers: int
+    ) -> List[List[ArbitragePath]]:
+        """Split paths in `num_workers` shards of even cost, most expensive paths first"""
+        known_seconds = [
+            self.seconds_by_path_id[arbitrage_path.path_id]
+            for arbitrage_path in arbitrage_paths
+            if arbitrage_path.path_id in self.seconds_by_path_id
+        ]
+        # Never measured paths cost the average, or all the same at the first start
+        self.default_seconds = (
+            sum(known_seconds) / len(known_seconds) if known_seconds else 1.0
+        )
+        shards: List[List[ArbitragePath]] = [[] for _ in range(num_workers)]
+        if not num_workers:
+            return shards
+        loads = [(0.0, worker_index) for worker_index in range(num_workers)]
+        for arbitrage_path in sorted(
+            arbitrage_paths, key=lambda path: -self._cost(path.path_id)
+        ):
+            load, worker_index = heapq.heappop(loads)
+            shards[worker_index].append(arbitrage_path)
+            heapq.heappush(
+                loads, (load + self._cost(arbitrage_path.path_id), worker_index)
+            )
+        return shards
+
+    def _rebalance(self) -> List[str]:
+        """Move paths from the busiest workers to the idlest ones, by seconds spent since the
+        previous rebalance (most recent blocks weighing more)"""
+        live_workers = [
+            worker_index
+            for worker_index, path_ids in enumerate(self.path_ids_by_worker)
+            if path_ids
+        ]
+        loads = {
+            worker_index: sum(
+                self._cost(path_id) for path_id in self.path_ids_by_worker[worker_index]
+            )
+            for worker_index in live_workers
+        }
+        mean_load = sum(loads.values()) / len(loads) if loads else 0.0
+        moved_path_ids: List[Tuple[str, int, int]] = []
+        max_moves = self.config.get_int("PARALLEL_REBALANCE_MAX_MOVES")
+        while mean_load and len(moved_path_ids) < max_moves:
+            busiest = max(live_workers, key=lambda worker_index: loads[worker_index])
+            idlest = min(live_workers, key=lambda worker_index: loads[worker_index])
+            if loads[busiest] <= mean_load * (1 + self.rebalance_tolerance):
+                break
+            # The most expensive path that narrows the gap between the two
+            gap = loads[busiest] - loads[idlest]
+            path_id = max(
+                (
+                    path_id
+                    for path_id in self.path_ids_by_worker[busiest]
+                    if 0.0 < self._cost(path_id) < gap
+                ),
+                key=self._cost,
+                default=None,
+            )
+            if path_id is None:
+                break
+            loads[busiest] -= self._cost(path_id)
+            loads[idlest] += self._cost(path_id)
+            self.path_ids_by_worker[busiest].remove(path_id)
+            self.path_ids_by_worker[idlest].add(path_id)
+            moved_path_ids.append((path_id, busiest, idlest))
+
+        errors = self._ship_moves(moved_path_ids)
+        if moved_path_ids:
+            self.logger.info(
+                f"Moved {len(moved_path_ids)} paths between workers "
+                f"(Busiest worker: {max(loads.values()) / mean_load:.2f}x the mean load)"
+            )
+        for path_id in list(self.seconds_by_path_id):
+            self.seconds_by_path_id[path_id] /= 2
+            # Not evaluated for a long while, or not part of the paths anymore
+            if self.seconds_by_path_id[path_id] < 1e-9:
+                del self.seconds_by_path_id[path_id]
+        self.default_seconds /= 2
+        return errors
+
+    def _drop_worker(self, worker_index: int, error: Exception) -> List[str]:
+        """Move the paths of a worker that went away to the other ones, evaluated by the
+        main process if none is left"""
+        path_ids = self.path_ids_by_worker[worker_index]
+        self.path_ids_by_worker[worker_index] = set()
+        live_workers = [
+            index for index, shard in enumerate(self.path_ids_by_worker) if shard
+        ]
+        errors = [
+            f"Worker {worker_index} went away: {str(error) or type(error).__name__}"
+        ]
+        if not live_workers:
+            for path_id in path_ids:
+                del self.worker_by_path_id[path_id]
+            return errors
+        loads = [
+            (sum(self._cost(path_id) for path_id in shard), index)
+            for index, shard in enumerate(self.path_ids_by_worker)
+            if shard
+        ]
+        heapq.heapify(loads)
+        moved_path_ids: List[Tuple[str, int, int]] = []
+        for path_id in sorted(path_ids, key=lambda path_id: -self._cost(path_id)):
+            load, index = heapq.heappop(loads)
+            self.path_ids_by_worker[index].add(path_id)
+            moved_path_ids.append((path_id, worker_index, index))
+            heapq.heappush(loads, (load + self._cost(path_id), index))
+        return errors + self._ship_moves(moved_path_ids, notify_source=False)
+
+    def _ship_moves(
+        self, moved_path_ids: List[Tuple[str, int, int]], notify_source: bool = True
+    ) -> List[str]:
+        """Send moved paths to their new worker, given (path id, from worker, to worker)"""
+        removed_path_ids_by_worker: Dict[int, List[str]] = {}
+        added_paths_by_worker: Dict[int, List[ArbitragePath]] = {}
+        for path_id, from_worker, to_worker in moved_path_ids:
+            self.worker_by_path_id[path_id] = to_worker
+            removed_path_ids_by_worker.setdefault(from_worker, []).append(path_id)
+            added_paths_by_worker.setdefault(to_worker, []).append(
+                self.path_by_id[path_id]
+            )
+        # ("add", paths) or ("remove", path ids) by worker
+        messages: List[
+            Tuple[int, Tuple[str, Union[List[ArbitragePath], List[str]]]]
+        ] = [
+            (worker_index, ("add", paths))
+            for worker_index, paths in added_paths_by_worker.items()
+        ]
+        if notify_source:
+            messages += [
+                (worker_index, ("remove", path_ids))
+                for worker_index, path_ids in removed_path_ids_by_worker.items()
+            ]
+        errors: List[str] = []
+        for worker_index, message in messages:
+            if not self.path_ids_by_worker[worker_index]:
+                continue
+            try:
+                self.connections[worker_index].send(message)
+            except (EOFError, OSError) as e:
+                errors += self._drop_worker(worker_index, e)
+        return errors
+
+
+class WorkerServer:
+    """Serve `ParallelEvaluator` coordinators connecting to `address`, see worker.py.
+
+    Every connection (a strategy, or a reload of its paths) is served by its own process.
+    With `--profile N`, each of them profiles the first N blocks it evaluates.
+    """
+
+    def __init__(self, address: str, config: Config) -> None:
+        self.address = address
+        self.config = config
+        self.logger = Logger.instance(self.config)
+
+    def run(self) -> None:
+        with Listener(
+            parse_address(self.address),
+            authkey=self.config.get("WORKER_AUTHKEY").encode(),
+        ) as listener:
+            self.logger.info(f"Listening on {self.address}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    self.logger.log(
+                        ERROR, f"Could not accept connection {str(e)}", color="red"
+                    )
+                    continue
+                # Reap the processes of the coordinators that are gone
+                multiprocessing.active_children()
+                process = multiprocessing.Process(
+                    target=_evaluate_shard,
+                    args=(connection,),
+                    kwargs={"profiler": Profiler.instance(self.config)},
+                    daemon=True,
+                )
+                process.start()
+                connection.close()
+                self.logger.info(
+                    f"Serving coordinator {listener.last_accepted or self.address} (pid {process.pid})"
+                )
+
+
+def _evaluate_shard(
+    connection: Connection,
+    config: Optional[Config] = None,
+    arbitrage_paths: Sequence[ArbitragePath] = (),
+    profiler: Optional[Profiler] = None,
+) -> None:
+    """Evaluate the paths sent by a `ParallelEvaluator` until it closes the connection.
+    Remote workers receive their config first, and profile their blocks with `profiler`.
+    """
+    if profiler and profiler.session_blocks:
+        profiler.start()
+    try:
+        _serve_shard(connection, config, arbitrage_paths, profiler)
+    finally:
+        if profiler:
+            # This process exits without running the atexit handlers
+            profiler.stop()
+
+
+def _serve_shard(
+    connection: Connection,
+    config: Optional[Config],
+    arbitrage_paths: Sequence[ArbitragePath],
+    profiler: Optional[Profiler],
+) -> None:
+    evaluator: Optional[PathEvaluator] = PathEvaluator(config) if config else None
+    path_by_id: Dict[str, ArbitragePath] = {
+        arbitrage_path.path_id: arbitrage_path for arbitrage_path in arbitrage_paths
+    }
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        kind = message[0]
+        if kind == "config":
+            _, kovan, debug, min_amount, max_amount = message
+            evaluator = PathEvaluator(
+                Config(
+                    strategy=StrategyEnum.WORKER,
+                    kovan=kovan,
+                    debug=debug,
+                    min_amount=min_amount,
+                    max_amount=max_amount,
+                )
+            )
+            continue
+        if kind == "add":
+            for arbitrage_path in message[1]:
+                path_by_id[arbitrage_path.path_id] = arbitrage_path
+            continue
+        if kind == "remove":
+            for path_id in message[1]:
+                path_by_id.pop(path_id, None)
+            continue
+        (
+            _,
+            block_key,
+            gas_price,
+            max_block_height,
+            reserves,
+            path_ids,
+            estimated_gases,
+        ) = message
+        if evaluator is None:
+            raise Exception("Received a block before the config of the worker")
+        snapshot = ReserveSnapshot(block_key, reserves_by_pool_address=reserves)
+
+        candidates: List[PathCandidate] = []
+        errors: List[str] = []
+        seconds: List[float] = []
+        for path_id, estimated_gas in zip(path_ids, estimated_gases):
+            start_time = time.perf_counter()
+            arbitrage_path = path_by_id[path_id]
+            arbitrage_path.gas_price = gas_price
+            arbitrage_path.max_block_height = max_block_height
+            arbitrage_path.estimated_gas = estimated_gas
+            try:
+                if evaluator.evaluate(arbitrage_path, snapshot):
+                    candidates.append(PathCandidate.from_path(arbitrage_path))
+            except Exception as e:
+                errors.append(str(e))
+            seconds.append(time.perf_counter() - start_time)
+        connection.send((candidates, errors, evaluator.pop_stage_seconds(), seconds))
+        if profiler:
+            profiler.on_block()
@@ -0,0 +1,124 @@
+import json
+import os
+from typing import Dict, List
+
+from config import Config
+from services.logger.logger import Logger
+from services.ttypes.arbitrage import ArbitragePath, PathStats
+
+
+class PathStatsStore:
+    """Per-path profitability history used to evaluate hot paths first and cold paths less often.
+
+    For each `path_id` it keeps the best margin seen, released exponentially towards the latest
+    margin every block, how many times the path was positive and the last block it was.
+    It is saved to disk so the history survives pool reloads and restarts.
+    """
+
+    def __init__(self, file_path: str, config: Config) -> None:
+        self.file_path = file_path
+        self.decay = config.get_float("PATH_STATS_DECAY")
+        self.hot_blocks = config.get_int("PATH_STATS_HOT_BLOCKS")
+        self.near_profit_margin = config.get_float("PATH_STATS_NEAR_PROFIT_MARGIN")
+        self.cold_sampling_interval = config.get_int(
+            "PATH_STATS_COLD_SAMPLING_INTERVAL"
+        )
+        self.ttl_blocks = config.get_int("PATH_STATS_TTL_BLOCKS")
+        self.stats_by_path_id: Dict[str, PathStats] = {}
+        # Recent evaluation seconds of each path, to balance the shards of `ParallelEvaluator`.
+        # Not saved, measured again after a restart
+        self.seconds_by_path_id: Dict[str, float] = {}
+
+    @classmethod
+    def load(cls, config: Config) -> "PathStatsStore":
+        liquidity = f"{config.min_liquidity}_{config.max_liquidity}"
+        file_name = f"path_stats_{config.strategy.name.lower()}_{liquidity}.json"
+        store = cls(os.path.join(config.get("STATE_PATH"), file_name), config)
+        if os.path.exists(store.file_path):
+            try:
+                with open(store.file_path, "r") as f:
+                    for path_id, values in json.load(f).items():
+                        store.stats_by_path_id[path_id] = PathStats(*values)
+            except Exception as e:
+                Logger.instance(config).error(
+                    f"Could not load path stats {store.file_path}: {str(e)}"
+                )
+        return store
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        latest_block = max(
+            (stats.updated_block for stats in self.stats_by_path_id.values()),
+            default=0,
+        )
+        data = {
+            path_id: [
+                stats.best_margin,
+                stats.hits,
+                stats.last_profitable_block,
+                stats.updated_block,
+            ]
+            for path_id, stats in self.stats_by_path_id.items()
+            if latest_block - stats.updated_block <= self.ttl_blocks
+        }
+        tmp_file_path = f"{self.file_path}.tmp"
+        with open(tmp_file_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_file_path, self.file_path)
+
+    def is_hot(self, stats: PathStats, block_number: int) -> bool:
+        if stats.hits and block_number - stats.last_profitable_block <= self.hot_blocks:
+            return True
+        return stats.best_margin >= self.near_profit_margin
+
+    def is_due(self, path_id: str, block_number: int, spot_margin: float) -> bool:
+        """Cold paths are only evaluated every `PATH_STATS_COLD_SAMPLING_INTERVAL` blocks"""
+        stats = self.stats_by_path_id.get(path_id)
+        if stats is None or spot_margin > 0 or self.is_hot(stats, block_number):
+            return True
+        return block_number - stats.updated_block >= self.cold_sampling_interval
+
+    def priority(self, path_id: str, block_number: int, spot_margin: float):
+        stats = self.stats_by_path_id.get(path_id)
+        if stats is None:
+            return (False, spot_margin)
+        return (
+            self.is_hot(stats, block_number),
+            spot_margin + max(stats.best_margin, 0.0),
+        )
+
+    def record(
+        self,
+        block_number: int,
+        evaluated_paths: List[ArbitragePath],
+        positive_paths: List[ArbitragePath],
+        spot_margin_by_path_id: Dict[str, float],
+    ) -> None:
+        positive_path_ids = {
+            arbitrage_path.path_id for arbitrage_path in positive_paths
+        }
+        for arbitrage_path in evaluated_paths:
+            path_id = arbitrage_path.path_id
+            if path_id in positive_path_ids:
+                margin = (
+                    arbitrage_path.max_arbitrage_amount_wei
+                    / arbitrage_path.optimal_amount_in_wei
+                )
+            else:
+                margin = spot_margin_by_path_id.get(path_id, -1.0)
+
+            stats = self.stats_by_path_id.get(path_id)
+            if stats is None:
+                stats = PathStats(best_margin=margin, updated_block=block_number)
+                self.stats_by_path_id[path_id] = stats
+            else:
+                elapsed_blocks = max(block_number - stats.updated_block, 0)
+                released_margin = margin + (stats.best_margin - margin) * (
+                    self.decay**elapsed_blocks
+                )
+                stats.best_margin = max(margin, released_margin)
+                stats.updated_block = block_number
+
+            if path_id in positive_path_ids:
+                stats.hits += 1
+                stats.last_profitable_block = block_number
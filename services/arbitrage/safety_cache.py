@@ -0,0 +1,118 @@
+import os
+from typing import Dict, Set
+
+import yaml
+
+from config import Config
+from services.logger.logger import WARNING, Logger
+from services.pools.token import Token
+from services.reserves.snapshot import ReserveSnapshot
+from services.ttypes.arbitrage import ArbitragePath, SafetyFailure
+
+
+class SafetyCheckCache:
+    """Negative cache of the paths whose safety check (`estimateGas`) reverted.
+
+    A path that reverted isn't checked again while the reserves of its pools are unchanged, and
+    isn't evaluated at all for a backoff that doubles on every consecutive failure.
+    After `AUTO_BLACKLIST_PATH_FAILURES` failures in a row, the tokens of the path are blamed:
+    a token blamed by `AUTO_BLACKLIST_OFFENDING_PATHS` paths, and never part of a path that went
+    through, is saved to the auto-blacklist read by `PoolLoader`.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.logger = Logger.instance(self.config)
+        self.weth_address = self.config.get("WETH_ADDRESS").lower()
+        self.backoff_blocks = self.config.get_int("SAFETY_BACKOFF_BLOCKS")
+        self.max_backoff_blocks = self.config.get_int("SAFETY_MAX_BACKOFF_BLOCKS")
+        self.path_failures = self.config.get_int("AUTO_BLACKLIST_PATH_FAILURES")
+        self.offending_paths = self.config.get_int("AUTO_BLACKLIST_OFFENDING_PATHS")
+        self.blacklist_path = self.config.get("AUTO_BLACKLIST_YAML_PATH")
+        self.failure_by_path_id: Dict[str, SafetyFailure] = {}
+        self.offending_path_ids_by_token: Dict[str, Set[str]] = {}
+        self.safe_token_addresses: Set[str] = set()
+
+    def is_backing_off(self, path_id: str, block_number: int) -> bool:
+        failure = self.failure_by_path_id.get(path_id)
+        return failure is not None and block_number < failure.retry_block
+
+    def is_known_failure(
+        self, arbitrage_path: ArbitragePath, snapshot: ReserveSnapshot
+    ) -> bool:
+        """Return True if the path already reverted with the current reserves of its pools"""
+        failure = self.failure_by_path_id.get(arbitrage_path.path_id)
+        return failure is not None and failure.state_hash == self.state_hash(
+            arbitrage_path, snapshot
+        )
+
+    def record(
+        self,
+        arbitrage_path: ArbitragePath,
+        snapshot: ReserveSnapshot,
+        block_number: int,
+        passed: bool,
+    ) -> None:
+        path_id = arbitrage_path.path_id
+        if passed:
+            self.failure_by_path_id.pop(path_id, None)
+            for connecting_path in arbitrage_path.connecting_paths:
+                self.safe_token_addresses.add(connecting_path.token_out.address)
+            return
+
+        failure = self.failure_by_path_id.get(path_id)
+        failures = failure.failures + 1 if failure else 1
+        backoff_blocks = min(
+            self.backoff_blocks * 2 ** (failures - 1), self.max_backoff_blocks
+        )
+        self.failure_by_path_id[path_id] = SafetyFailure(
+            state_hash=self.state_hash(arbitrage_path, snapshot),
+            failures=failures,
+            retry_block=block_number + backoff_blocks,
+        )
+        if failures == self.path_failures:
+            self._blame_tokens(arbitrage_path)
+
+    @staticmethod
+    def state_hash(arbitrage_path: ArbitragePath, snapshot: ReserveSnapshot) -> int:
+        return hash(
+            tuple(
+                snapshot.reserves_by_pool_address.get(connecting_path.pool.address)
+                for connecting_path in arbitrage_path.connecting_paths
+            )
+        )
+
+    def _blame_tokens(self, arbitrage_path: ArbitragePath) -> None:
+        for connecting_path in arbitrage_path.connecting_paths:
+            token = connecting_path.token_out
+            if token.address == self.weth_address:
+                continue
+            offending_path_ids = self.offending_path_ids_by_token.setdefault(
+                token.address, set()
+            )
+            offending_path_ids.add(arbitrage_path.path_id)
+            if (
+                len(offending_path_ids) == self.offending_paths
+                and token.address not in self.safe_token_addresses
+            ):
+                self._blacklist_token(token)
+
+    def _blacklist_token(self, token: Token) -> None:
+        tokens = []
+        if os.path.exists(self.blacklist_path):
+            with open(self.blacklist_path, "r") as stream:
+                tokens = (yaml.safe_load(stream) or {}).get("tokens") or []
+        if any(token_yaml["address"] == token.address for token_yaml in tokens):
+            return
+        tokens.append(
+            {"name": token.name, "address": token.address, "decimal": token.decimal}
+        )
+        os.makedirs(os.path.dirname(self.blacklist_path), exist_ok=True)
+        with open(self.blacklist_path, "w") as stream:
+            yaml.safe_dump({"tokens": tokens}, stream)
+        self.logger.log(
+            WARNING,
+            f"Auto-blacklisting {token.name} ({token.address}), its paths keep reverting",
+            color="light_red",
+            token=token.address,
+        )
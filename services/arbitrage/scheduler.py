@@ -0,0 +1,116 @@
+from typing import Dict, List, Tuple
+
+from config import Config
+from services.arbitrage.path_stats import PathStatsStore
+from services.exchange.factory import ExchangeFactory
+from services.reserves.snapshot import ReserveSnapshot
+from services.ttypes.arbitrage import ArbitragePath
+
+
+class BlockScheduler:
+    """Decide in which order, and in which chunks, paths are evaluated for a block.
+
+    Paths are ranked by the product of the spot rates of their hops (> 1 means the path is
+    profitable for an infinitesimal amount in), computed once per pool and direction from the
+    reserves already in the snapshot. Evaluation then goes chunk by chunk so the caller can
+    stop as soon as the block deadline passes or a new block arrives.
+    With a `PathStatsStore`, paths that were recently (nearly) profitable go first and the
+    cold ones can be sampled every few blocks only.
+    """
+
+    def __init__(self, config: Config, path_stats: PathStatsStore = None) -> None:
+        self.config = config
+        self.path_stats = path_stats
+        self.spot_margin_by_path_id: Dict[str, float] = {}
+        self.chunk_size = self.config.get_int("SCHEDULER_CHUNK_SIZE")
+        if self.config.parallel:
+            self.chunk_size *= self.config.workers
+
+    def rank(
+        self,
+        arbitrage_paths: List[ArbitragePath],
+        snapshot: ReserveSnapshot,
+        block_number: int,
+        sample_cold_paths: bool = False,
+    ) -> Tuple[List[ArbitragePath], int]:
+        """Return the paths to evaluate, most promising first, and the number of cold paths left out"""
+        rate_by_hop: Dict[Tuple[str, str], float] = {}
+        self.spot_margin_by_path_id = {
+            arbitrage_path.path_id: self.score(arbitrage_path, snapshot, rate_by_hop)
+            - 1
+            for arbitrage_path in arbitrage_paths
+        }
+        if not self.path_stats:
+            return (
+                sorted(
+                    arbitrage_paths,
+                    key=lambda path: self.spot_margin_by_path_id[path.path_id],
+                    reverse=True,
+                ),
+                0,
+            )
+
+        due_paths = arbitrage_paths
+        if sample_cold_paths:
+            due_paths = [
+                arbitrage_path
+                for arbitrage_path in arbitrage_paths
+                if self.path_stats.is_due(
+                    arbitrage_path.path_id,
+                    block_number,
+                    self.spot_margin_by_path_id[arbitrage_path.path_id],
+                )
+            ]
+        ranked_paths = sorted(
+            due_paths,
+            key=lambda path: self.path_stats.priority(
+                path.path_id, block_number, self.spot_margin_by_path_id[path.path_id]
+            ),
+            reverse=True,
+        )
+        return ranked_paths, len(arbitrage_paths) - len(due_paths)
+
+    def record(
+        self,
+        block_number: int,
+        evaluated_paths: List[ArbitragePath],
+        positive_paths: List[ArbitragePath],
+    ) -> None:
+        if self.path_stats:
+            self.path_stats.record(
+                block_number,
+                evaluated_paths,
+                positive_paths,
+                self.spot_margin_by_path_id,
+            )
+
+    def chunks(self, arbitrage_paths: List[ArbitragePath]) -> List[List[ArbitragePath]]:
+        return [
+            arbitrage_paths[start : start + self.chunk_size]
+            for start in range(0, len(arbitrage_paths), self.chunk_size)
+        ]
+
+    @staticmethod
+    def score(
+        arbitrage_path: ArbitragePath,
+        snapshot: ReserveSnapshot,
+        rate_by_hop: Dict[Tuple[str, str], float],
+    ) -> float:
+        """Return the spot rate of the whole path, 0 when a pool isn't in the snapshot yet"""
+        path_rate = 1.0
+        for connecting_path in arbitrage_path.connecting_paths:
+            pool = connecting_path.pool
+            hop = (pool.address, connecting_path.token_in.address)
+            rate = rate_by_hop.get(hop)
+            if rate is None:
+                reserves = snapshot.reserves_by_pool_address.get(pool.address)
+                try:
+                    token_in_index = 0 if pool.tokens[0].address == hop[1] else 1
+                    rate = ExchangeFactory.get_class(pool.type).spot_rate(
+                        reserves, token_in_index
+                    )
+                except (TypeError, ZeroDivisionError):
+                    rate = 0.0
+                rate_by_hop[hop] = rate
+            path_rate *= rate
+        return path_rate
@@ -0,0 +1,112 @@
+import resource
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from config import Config
+from services.arbitrage.evaluator import PathEvaluator
+from services.arbitrage.scheduler import BlockScheduler
+from services.benchmark.exchanges import create_in_memory_exchange
+from services.benchmark.synthetic import SyntheticPoolGraph
+from services.exchange.iexchange import ExchangeInterface
+from services.metrics.metrics import EVALUATION, PREFILTER
+from services.path.path import PathFinder
+from services.pools.pool import Pool
+from services.profiler.profiler import Profiler
+from services.reserves.snapshot import ReserveSnapshot
+from services.ttypes.arbitrage import ArbitragePath
+from services.ttypes.benchmark import BenchmarkReport
+
+
+class Benchmark:
+    """Measure `PathFinder`, the ranking, the simulation and the amount optimizer offline.
+
+    The pools of a `SyntheticPoolGraph` are read through in-memory exchanges, and every block
+    churns part of their reserves so that the hop cache is as cold as on a live block.
+    """
+
+    def __init__(self, graph: SyntheticPoolGraph, config: Config) -> None:
+        self.graph = graph
+        self.config = config
+        self.exchange_by_pool_address: Dict[str, ExchangeInterface] = {
+            pool.address: create_in_memory_exchange(
+                pool, self.graph.reserves_by_pool_address, self.config
+            )
+            for pool in self.graph.pools
+        }
+        self.scheduler = BlockScheduler(self.config)
+        self.evaluator = PathEvaluator(self.config)
+        self.profiler = Profiler.instance(self.config)
+
+    def run(
+        self,
+        blocks: int,
+        gas_price: int,
+        churn: float = 0.1,
+        trace_memory: bool = False,
+    ) -> BenchmarkReport:
+        report = BenchmarkReport(
+            tokens=len(self.graph.tokens), pools=len(self.graph.pools), blocks=blocks
+        )
+        if trace_memory:
+            tracemalloc.start()
+
+        start_time = time.perf_counter()
+        arbitrage_paths = PathFinder(self.graph.pools, self.config).find_all_paths()
+        report.path_finding_seconds = time.perf_counter() - start_time
+        report.paths = len(arbitrage_paths)
+
+        max_block_allowed = self.config.get_max_block_allowed()
+        for block_number in range(blocks):
+            if block_number:
+                self.graph.churn(churn)
+            snapshot = ReserveSnapshot(
+                (block_number, ""), fetch_reserves=self._fetch_reserves
+            )
+            start_time = time.perf_counter()
+            with self.profiler.stage(PREFILTER):
+                ranked_paths, _ = self.scheduler.rank(
+                    arbitrage_paths, snapshot, block_number
+                )
+            report.ranking_seconds += time.perf_counter() - start_time
+            with self.profiler.stage(EVALUATION):
+                self._evaluate(
+                    ranked_paths,
+                    snapshot,
+                    gas_price,
+                    block_number + max_block_allowed,
+                    report,
+                )
+            self.profiler.on_block()
+
+        report.optimizer_iterations = report.simulations - report.evaluations
+        report.peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        if trace_memory:
+            report.peak_python_heap_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+            tracemalloc.stop()
+        return report
+
+    def _evaluate(
+        self,
+        arbitrage_paths: List[ArbitragePath],
+        snapshot: ReserveSnapshot,
+        gas_price: int,
+        max_block_height: int,
+        report: BenchmarkReport,
+    ) -> None:
+        self.evaluator.pop_simulations()
+        start_time = time.perf_counter()
+        for arbitrage_path in arbitrage_paths:
+            arbitrage_path.gas_price = gas_price
+            arbitrage_path.max_block_height = max_block_height
+            try:
+                if self.evaluator.evaluate(arbitrage_path, snapshot):
+                    report.positive += 1
+            except Exception:
+                report.errors += 1
+        report.evaluation_seconds += time.perf_counter() - start_time
+        report.evaluations += len(arbitrage_paths)
+        report.simulations += self.evaluator.pop_simulations()
+
+    def _fetch_reserves(self, pool: Pool) -> Tuple[int, ...]:
+        return self.exchange_by_pool_address[pool.address].fetch_reserves(pool.tokens)
@@ -0,0 +1,77 @@
+import abc
+from typing import Dict, List, Tuple
+
+from config import Config
+from services.exchange.balancer import BalancerExchange
+from services.exchange.iexchange import ExchangeInterface
+from services.exchange.uniswap import UniswapExchange
+from services.pools.pool import Pool
+from services.pools.token import Token
+from services.ttypes.contract import ContractTypeEnum
+
+
+class InMemoryExchange(abc.ABC):
+    """Exchange reading the reserves of its pool from a dict instead of its contract.
+
+    Reserves are ordered as `pool.tokens`. The swap math is the one of the on-chain exchange
+    it is mixed with.
+    """
+
+    def __init__(
+        self,
+        pool: Pool,
+        reserves_by_pool_address: Dict[str, Tuple[int, ...]],
+        config: Config,
+    ) -> None:
+        self.contract = None
+        self.config = config
+        self.pool = pool
+        self.reserves_by_pool_address = reserves_by_pool_address
+
+    def calc_amount_out(
+        self, token_in: Token, token_out: Token, amount_in_wei: int
+    ) -> int:
+        token_in_index = 0 if self.pool.tokens[0].address == token_in.address else 1
+        return self.calc_amount_out_from_reserves(
+            self.fetch_reserves(self.pool.tokens),
+            token_in_index,
+            token_in,
+            token_out,
+            amount_in_wei,
+        )
+
+    def fetch_reserves(self, tokens: List[Token]) -> Tuple[int, ...]:
+        reserves = self.reserves_by_pool_address[self.pool.address]
+        if tokens[0].address == self.pool.tokens[0].address:
+            return reserves
+        return self.swap_reserves(reserves)
+
+    @staticmethod
+    @abc.abstractmethod
+    def swap_reserves(reserves: Tuple[int, ...]) -> Tuple[int, ...]:
+        """`reserves` ordered as the reversed `pool.tokens`"""
+        pass
+
+
+class InMemoryUniswapExchange(InMemoryExchange, UniswapExchange):
+    @staticmethod
+    def swap_reserves(reserves: Tuple[int, ...]) -> Tuple[int, ...]:
+        reserve_0, reserve_1 = reserves
+        return reserve_1, reserve_0
+
+
+class InMemoryBalancerExchange(InMemoryExchange, BalancerExchange):
+    @staticmethod
+    def swap_reserves(reserves: Tuple[int, ...]) -> Tuple[int, ...]:
+        balance_0, balance_1, weight_0, weight_1, swap_fee = reserves
+        return balance_1, balance_0, weight_1, weight_0, swap_fee
+
+
+def create_in_memory_exchange(
+    pool: Pool, reserves_by_pool_address: Dict[str, Tuple[int, ...]], config: Config
+) -> ExchangeInterface:
+    if pool.type == ContractTypeEnum.BPOOL:
+        return InMemoryBalancerExchange(pool, reserves_by_pool_address, config)
+    if pool.type in (ContractTypeEnum.UNISWAP, ContractTypeEnum.SUSHISWAP):
+        return InMemoryUniswapExchange(pool, reserves_by_pool_address, config)
+    raise Exception("Exchange not supported.")
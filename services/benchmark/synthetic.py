@@ -0,0 +1,135 @@
+import math
+import random
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+from config import Config
+from services.exchange.bmath import BONE
+from services.pools.pool import Pool
+from services.pools.token import Token
+
+DECIMALS = [18] * 8 + [6, 8]
+BALANCER_WEIGHTS = [10, 25, 40]
+BALANCER_TOTAL_WEIGHT = 50
+BALANCER_SWAP_FEES = [0.001, 0.0025, 0.003]
+# Draws of a token pair not taken yet by the exchange before the pool is skipped
+MAX_POOL_DRAWS = 100
+
+
+class SyntheticPoolGraph:
+    """Random token/pool universe with on-chain like reserves, to benchmark without a node.
+
+    Tokens are picked with a Zipf distribution of exponent `hub_skew` (WETH being the first hub),
+    so that a few tokens are part of most pools like on mainnet, 0 picks them uniformly.
+    Token prices and pool liquidities (in WETH) are log-normal, and every pool is mispriced by a
+    normal noise of `mispricing` so that some paths are profitable.
+    Like on-chain, Uniswap and Sushiswap have at most one pool per token pair, a pool that
+    can't get a free pair is skipped so the graph may have less than `num_pools` pools.
+    Reserves are ordered as `pool.tokens`, with the layout returned by the exchanges
+    `fetch_reserves`.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        num_tokens: int,
+        num_pools: int,
+        hub_skew: float = 1.0,
+        balancer_share: float = 0.2,
+        mispricing: float = 0.01,
+        seed: int = 0,
+    ) -> None:
+        if num_tokens < 2:
+            raise Exception("Tokens has to be minimum 2")
+        self.random = random.Random(seed)
+        self.balancer_share = balancer_share
+        self.mispricing = mispricing
+        self.weth = Token(name="WETH", address=config.get("WETH_ADDRESS"), decimal=18)
+        self.tokens: List[Token] = [self.weth] + [
+            Token(
+                name=f"TOKEN{index}",
+                address=self._address(1, index),
+                decimal=self.random.choice(DECIMALS),
+            )
+            for index in range(1, num_tokens)
+        ]
+        self.price_by_token_address: Dict[str, float] = {self.weth.address: 1.0}
+        for token in self.tokens[1:]:
+            self.price_by_token_address[token.address] = self.random.lognormvariate(
+                math.log(0.001), 2.5
+            )
+        self.token_weights = [1 / (rank + 1) ** hub_skew for rank in range(num_tokens)]
+        self.pools: List[Pool] = []
+        self.reserves_by_pool_address: Dict[str, Tuple[int, ...]] = {}
+        # (type, token addresses) of the Uniswap and Sushiswap pools
+        self.pair_keys: Set[Tuple[str, FrozenSet[str]]] = set()
+        for index in range(num_pools):
+            self._add_pool(index)
+
+    def churn(self, fraction: float, volatility: float = 0.005) -> None:
+        """Move the reserves of `fraction` of the pools as swaps would do in a block"""
+        num_pools = int(len(self.pools) * fraction)
+        for pool in self.random.sample(self.pools, num_pools):
+            reserves = self.reserves_by_pool_address[pool.address]
+            factor = max(1 + self.random.gauss(0, volatility), 0.5)
+            self.reserves_by_pool_address[pool.address] = (
+                int(reserves[0] * factor),
+                int(reserves[1] / factor),
+            ) + reserves[2:]
+
+    def _add_pool(self, index: int) -> None:
+        if self.random.random() < self.balancer_share:
+            pool_type = "BPOOL"
+        else:
+            pool_type = self.random.choice(["UNISWAP", "SUSHISWAP"])
+        for _ in range(MAX_POOL_DRAWS):
+            token_0, token_1 = self.random.choices(
+                self.tokens, weights=self.token_weights, k=2
+            )
+            if token_0.address == token_1.address:
+                continue
+            if pool_type == "BPOOL":
+                break
+            pair_key = (pool_type, frozenset((token_0.address, token_1.address)))
+            if pair_key not in self.pair_keys:
+                self.pair_keys.add(pair_key)
+                break
+        else:
+            return
+        pool = Pool(
+            name=f"{token_0.name}-{token_1.name}",
+            pool_type=pool_type,
+            address=self._address(2, index),
+            tokens=[token_0, token_1],
+        )
+        liquidity = self.random.lognormvariate(math.log(100), 1.5)
+        if pool_type == "BPOOL":
+            weight_0 = self.random.choice(BALANCER_WEIGHTS)
+            weights = (weight_0, BALANCER_TOTAL_WEIGHT - weight_0)
+        else:
+            weights = (1, 1)
+        balances = [
+            token.to_wei(
+                liquidity
+                * weight
+                / sum(weights)
+                / self.price_by_token_address[token.address]
+            )
+            for token, weight in zip(pool.tokens, weights)
+        ]
+        balances[1] = int(balances[1] * (1 + self.random.gauss(0, self.mispricing)))
+        if pool_type == "BPOOL":
+            reserves = (
+                balances[0],
+                balances[1],
+                weights[0] * BONE,
+                weights[1] * BONE,
+                int(self.random.choice(BALANCER_SWAP_FEES) * BONE),
+            )
+        else:
+            reserves = (balances[0], balances[1])
+        self.pools.append(pool)
+        self.reserves_by_pool_address[pool.address] = reserves
+
+    @staticmethod
+    def _address(kind: int, index: int) -> str:
+        return "0x%040x" % ((kind << 152) + index)
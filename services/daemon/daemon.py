@@ -0,0 +1,107 @@
+from typing import Any, Dict, List
+
+import yaml
+
+from config import Config
+from services.daemon.pipeline import SharedPipeline
+from services.engine.engine import Engine
+from services.ethereum.ethereum import Ethereum
+from services.logger.logger import Logger
+from services.strategy.fresh import StrategyFresh
+from services.strategy.istrategy import StrategyInterface
+from services.strategy.scan import StrategyScan
+from services.strategy.watcher import StrategyWatcher
+from services.ttypes.strategy import StrategyEnum
+
+# Options of a strategy in the daemon YAML, the others come from the daemon command line
+STRATEGY_OPTIONS = {
+    "max_amount",
+    "min_amount",
+    "min_liquidity",
+    "max_liquidity",
+    "gas_multiplier",
+    "max_block",
+    "since",
+    "only_tokens",
+}
+
+
+class Daemon:
+    """Run the strategies listed in a YAML file on a single engine.
+
+    Every strategy keeps its own parameters (liquidity range, consecutive count, gas
+    multiplier...) but they all share one node connection, one block stream, one
+    transaction manager, and the pools, exchanges and reserves of `SharedPipeline`.
+    """
+
+    def __init__(self, file_path: str, ethereum: Ethereum, config: Config) -> None:
+        self.ethereum = ethereum
+        self.config = config
+        self.logger = Logger.instance(self.config)
+        self.shared = SharedPipeline(self.ethereum, self.config)
+        with open(file_path, "r") as stream:
+            strategies_yaml = yaml.safe_load(stream)["strategies"]
+        if not strategies_yaml:
+            raise Exception(f"No strategy in {file_path}")
+        self.strategies: List[StrategyInterface] = [
+            self._create_strategy(index, strategy_yaml)
+            for index, strategy_yaml in enumerate(strategies_yaml)
+        ]
+        names = [strategy.name for strategy in self.strategies]
+        if len(set(names)) != len(names):
+            raise Exception(f"Strategy names have to be unique: {', '.join(names)}")
+
+    def run(self) -> None:
+        Engine(self.strategies, self.ethereum, self.config).run()
+
+    def _create_strategy(
+        self, index: int, strategy_yaml: Dict[str, Any]
+    ) -> StrategyInterface:
+        options = dict(strategy_yaml)
+        strategy_type = str(options.pop("strategy", "")).upper()
+        if strategy_type not in ("SCAN", "FRESH", "WATCHER"):
+            raise Exception(
+                f"Strategy {index} has to be one of scan, fresh and watcher, not {strategy_type or 'none'}"
+            )
+        name = str(options.pop("name", f"{strategy_type.lower()}-{index}"))
+        consecutive = int(options.pop("consecutive", 2))
+        unknown_options = set(options) - STRATEGY_OPTIONS
+        if unknown_options:
+            raise Exception(
+                f"Unknown options of strategy {name}: {', '.join(sorted(unknown_options))}"
+            )
+        if isinstance(options.get("only_tokens"), list):
+            options["only_tokens"] = ",".join(options["only_tokens"])
+        config = Config(
+            strategy=StrategyEnum[strategy_type],
+            kovan=self.config.kovan,
+            debug=self.config.debug,
+            send_tx=self.config.send_tx,
+            parallel=self.config.parallel,
+            workers=self.config.workers,
+            remote_workers=",".join(self.config.remote_workers) or None,
+            shared_reserves=self.config.shared_reserves,
+            block_deadline=self.config.block_deadline,
+            nonce_file=self.config.nonce_file,
+            metrics_port=self.config.metrics_port,
+            record_path=self.config.record_path,
+            profile_blocks=self.config.profile_blocks,
+            **options,
+        )
+        strategy: StrategyInterface
+        if strategy_type == "SCAN":
+            strategy = StrategyScan(
+                self.shared.load_pools(config), self.ethereum, config, self.shared
+            )
+        elif strategy_type == "FRESH":
+            strategy = StrategyFresh(consecutive, self.ethereum, config, self.shared)
+        else:
+            strategy = StrategyWatcher(consecutive, self.ethereum, config, self.shared)
+        strategy.name = name
+        self.logger.info(
+            f"Strategy {name}: {strategy_type.lower()} "
+            f"(Liquidity: {config.min_liquidity}-{config.max_liquidity}, "
+            f"Consecutive: {consecutive}, Gas Multiplier: {config.gas_multiplier})",
+            strategy=name,
+        )
+        return strategy
@@ -0,0 +1,111 @@
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+from web3 import Web3
+
+from config import Config
+from services.arbitrage.gas_model import GasModel
+from services.arbitrage.path_stats import PathStatsStore
+from services.arbitrage.safety_cache import SafetyCheckCache
+from services.ethereum.ethereum import Ethereum
+from services.exchange.factory import ExchangeFactory
+from services.exchange.iexchange import ExchangeInterface
+from services.pools.loader import PoolLoader
+from services.path.path import PathFinder
+from services.pools.pool import Pool
+from services.ttypes.arbitrage import ArbitragePath
+
+
+class SharedPipeline:
+    """State shared by the strategies of a daemon, so that each of them costs its evaluation only.
+
+    Pool lists are downloaded once per liquidity range (strategies reloading within
+    `DAEMON_POOLS_CACHE_SECONDS` reuse the same download), paths are found once per liquidity
+    range and set of pools, a pool is a single `Pool` with a single exchange contract
+    whatever the number of strategies using it, and the swap logs
+    are polled once per block. The path stats, the safety checks and the gas model are shared
+    too. Reserves are fetched once per block by the engine (see `Arbitrage.share_snapshot`).
+    """
+
+    def __init__(self, ethereum: Ethereum, config: Config) -> None:
+        self.ethereum = ethereum
+        self.config = config
+        self.pools_cache_seconds = self.config.get_int("DAEMON_POOLS_CACHE_SECONDS")
+        self.path_stats = PathStatsStore.load(config)
+        self.safety_cache = SafetyCheckCache(config)
+        self.gas_model = GasModel(config)
+        self.pool_by_address: Dict[str, Pool] = {}
+        self.exchange_by_pool_address: Dict[str, ExchangeInterface] = {}
+        # (loaded at, pools) by (min liquidity, max liquidity, only tokens)
+        self.pools_by_key: Dict[Tuple[Any, ...], Tuple[float, List[Pool]]] = {}
+        self.pools_lock = threading.Lock()
+        # (pool addresses, paths) by the key of `pools_by_key`
+        self.paths_by_key: Dict[
+            Tuple[Any, ...], Tuple[FrozenSet[str], List[ArbitragePath]]
+        ] = {}
+        self.paths_lock = threading.Lock()
+        # Not the pools lock, pools are downloaded in the background while blocks are evaluated
+        self.swap_events_lock = threading.Lock()
+        self.swap_filter = None
+        self.swap_events_block: int = None
+        self.swap_events: List[Any] = []
+
+    def load_pools(self, config: Config) -> List[Pool]:
+        """Pools of the liquidity range and tokens of `config`, and their exchanges"""
+        key = self._pools_key(config)
+        with self.pools_lock:
+            loaded_at, pools = self.pools_by_key.get(key, (0.0, None))
+            if pools is None or time.time() - loaded_at > self.pools_cache_seconds:
+                pools = PoolLoader(config=config).load_all_pools()
+                self.pools_by_key[key] = (time.time(), pools)
+        return self.register_pools(pools)
+
+    def find_paths(self, config: Config, pools: List[Pool]) -> List[ArbitragePath]:
+        """Paths of `pools`, found again only when the pools of the range of `config` changed"""
+        key = self._pools_key(config)
+        pool_addresses = frozenset(pool.address for pool in pools)
+        with self.paths_lock:
+            found_pool_addresses, arbitrage_paths = self.paths_by_key.get(
+                key, (None, None)
+            )
+            if arbitrage_paths is None or found_pool_addresses != pool_addresses:
+                arbitrage_paths = PathFinder(pools, config).find_all_paths()
+                self.paths_by_key[key] = (pool_addresses, arbitrage_paths)
+            return arbitrage_paths
+
+    def register_pools(self, pools: List[Pool]) -> List[Pool]:
+        """Return the shared instance of each pool, creating the exchanges of the new ones"""
+        with self.pools_lock:
+            pools = [
+                self.pool_by_address.setdefault(pool.address, pool) for pool in pools
+            ]
+            for pool in pools:
+                if pool.address not in self.exchange_by_pool_address:
+                    contract = self.ethereum.init_contract(pool)
+                    self.exchange_by_pool_address[pool.address] = (
+                        ExchangeFactory.create(contract, pool.type, config=self.config)
+                    )
+            return pools
+
+    def get_swap_events(self, latest_block: int) -> List[Any]:
+        """Uniswap transfers and Balancer swaps since the previous block, polled once per block"""
+        with self.swap_events_lock:
+            if self.swap_filter is None:
+                transfer_hash = Web3.keccak(
+                    text="Transfer(address,address,uint256)"
+                ).hex()
+                balancer_swap_hash = Web3.keccak(
+                    text="LOG_SWAP(address,address,address,uint256,uint256)"
+                ).hex()
+                self.swap_filter = self.ethereum.w3.eth.filter(
+                    {"topics": [[balancer_swap_hash, transfer_hash]]}
+                )
+            if self.swap_events_block != latest_block:
+                self.swap_events = self.swap_filter.get_new_entries()
+                self.swap_events_block = latest_block
+            return self.swap_events
+
+    @staticmethod
+    def _pools_key(config: Config) -> Tuple[Any, ...]:
+        return (config.min_liquidity, config.max_liquidity, tuple(config.only_tokens))
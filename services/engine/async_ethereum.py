@@ -0,0 +1,74 @@
+import itertools
+from typing import Any, Dict, List, Union
+
+import aiohttp
+
+from config import Config
+from services.metrics.metrics import Metrics
+
+
+class AsyncEthereum:
+    """Minimal JSON-RPC client over aiohttp for the calls the engine awaits on the event loop.
+
+    Contract calls, gas estimations and transactions still go through the web3 `Ethereum`
+    object, run in the engine's thread pool.
+    """
+
+    def __init__(self, config: Config, session: aiohttp.ClientSession) -> None:
+        self.config = config
+        self.session = session
+        self.uri = self.config.get("ETHEREUM_HTTP_URI")
+        self.request_ids = itertools.count()
+        self.metrics = Metrics.instance(self.config)
+
+    async def request(self, method: str, params: List[Any] = None) -> Any:
+        payload = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params or [],
+            "id": next(self.request_ids),
+        }
+        self.metrics.count_rpc(method)
+        async with self.session.post(self.uri, json=payload) as resp:
+            response = await resp.json(content_type=None)
+        if "error" in response:
+            raise Exception(f"{method} failed: {response['error']}")
+        return response["result"]
+
+    async def batch_request(self, calls: List[List[Any]]) -> List[Any]:
+        """Send `[method, params]` calls as one JSON-RPC batch, results are in the same order"""
+        payload = [
+            {
+                "jsonrpc": "2.0",
+                "method": method,
+                "params": params,
+                "id": next(self.request_ids),
+            }
+            for method, params in calls
+        ]
+        for method, _ in calls:
+            self.metrics.count_rpc(method)
+        async with self.session.post(self.uri, json=payload) as resp:
+            responses = await resp.json(content_type=None)
+        result_by_id: Dict[int, Any] = {
+            response["id"]: response.get("result", response.get("error"))
+            for response in responses
+        }
+        return [result_by_id.get(call["id"]) for call in payload]
+
+    async def block_number(self) -> int:
+        return int(await self.request("eth_blockNumber"), 16)
+
+    async def gas_price(self) -> int:
+        return int(await self.request("eth_gasPrice"), 16)
+
+    async def get_block(
+        self,
+        block_identifier: Union[int, str] = "latest",
+        full_transactions: bool = False,
+    ) -> Dict[str, Any]:
+        if isinstance(block_identifier, int):
+            block_identifier = hex(block_identifier)
+        return await self.request(
+            "eth_getBlockByNumber", [block_identifier, full_transactions]
+        )
@@ -0,0 +1,551 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Dict, List, Set, Tuple, Union
+
+import aiohttp
+from web3 import Web3
+
+from config import Config
+from services.arbitrage.arbitrage import Arbitrage
+from services.arbitrage.path_stats import PathStatsStore
+from services.engine.async_ethereum import AsyncEthereum
+from services.ethereum.ethereum import Ethereum
+from services.logger.logger import ERROR, Logger
+from services.metrics.metrics import BLOCK, BLOCK_ARRIVAL, SAFETY_CHECK, Metrics
+from services.pools.files import PoolFilesWatcher
+from services.pools.pool import Pool
+from services.profiler.profiler import Profiler
+from services.replay.recorder import BlockRecorder
+from services.reserves.snapshot import ReserveSnapshot
+from services.strategy.istrategy import StrategyInterface
+from services.ttypes.arbitrage import ArbitragePath
+from services.utils import calculate_gas_price, heartbeat
+
+
+class Engine:
+    """Run one or several strategies on an asyncio event loop.
+
+    Block arrival is watched by its own task. Each block then goes through the state fetch and
+    the gas price (concurrently), the evaluation, the safety checks and the sending.
+    Blocking web3 calls and the evaluation run in a thread pool so that a slow call never stalls
+    the block watcher or the notifications.
+    Several strategies share the block stream, the gas price and the reserves of each block,
+    their exchanges have to be shared as well (see `services.daemon.pipeline.SharedPipeline`).
+    They are evaluated one after the other, and a path sent by one is not sent again by the
+    next ones in the same block.
+    Strategies reload their pools and paths in a dedicated thread while the current ones keep
+    being evaluated, the new ones are swapped in between two blocks. Changes of the pool YAML
+    files are applied the same way, to the current pools.
+    """
+
+    def __init__(
+        self,
+        strategies: List[StrategyInterface],
+        ethereum: Ethereum,
+        config: Config,
+    ) -> None:
+        self.strategies = strategies
+        self.ethereum = ethereum
+        self.config = config
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.config.get_int("ENGINE_THREADS")
+        )
+        self.fetch_executor = ThreadPoolExecutor(
+            max_workers=self.config.get_int("ENGINE_FETCH_THREADS")
+        )
+        # One reload at a time, not to take threads from the evaluation
+        self.reload_executor = ThreadPoolExecutor(max_workers=1)
+        self.reloading: Set[StrategyInterface] = set()
+        # Result of `prepare_reload` by strategy, waiting for the end of the current block
+        self.reloaded_by_strategy: Dict[StrategyInterface, Any] = {}
+        self.pool_files = PoolFilesWatcher(self.config)
+        self.updating_pools = False
+        self.latest_block: int = None
+        self.latest_block_time = time.time()
+        self.block_event: asyncio.Event = None
+        self.session: aiohttp.ClientSession = None
+        self.async_ethereum: AsyncEthereum = None
+        self.background_tasks: Set[asyncio.Task] = set()
+        self.logger = Logger.instance(self.config)
+        self.metrics = Metrics.instance(self.config)
+        self.profiler = Profiler.instance(self.config)
+        self.recorder: BlockRecorder = None
+        if self.config.record_path:
+            self.recorder = BlockRecorder(self.config.record_path, self.config)
+
+    def run(self) -> None:
+        asyncio.run(self._run())
+
+    async def _run(self) -> None:
+        self.block_event = asyncio.Event()
+        async with aiohttp.ClientSession() as session:
+            self.session = session
+            self.async_ethereum = AsyncEthereum(self.config, session)
+            for strategy in self.strategies:
+                await self._with_retries(strategy, strategy.load_arbitrage_paths)
+            self.latest_block = await self.async_ethereum.block_number()
+            # Fill the gas oracle window, then every new block is ingested by the watcher
+            window = self.config.get_int("GAS_ORACLE_WINDOW")
+            for block_number in range(
+                self.latest_block - window + 1, self.latest_block + 1
+            ):
+                self.spawn(self._ingest_gas_prices(block_number, sample_pending=False))
+            block_watcher = asyncio.create_task(self._watch_blocks())
+            try:
+                await self._process_blocks()
+            finally:
+                block_watcher.cancel()
+                for strategy in self.strategies:
+                    if strategy.arbitrage:
+                        strategy.arbitrage.close()
+                for path_stats in self._path_stats_stores():
+                    path_stats.save()
+                self.executor.shutdown(wait=False)
+                self.fetch_executor.shutdown(wait=False)
+                self.reload_executor.shutdown(wait=False)
+                if self.recorder:
+                    self.recorder.close()
+
+    async def to_thread(self, function: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, function, *args
+        )
+
+    def spawn(self, coroutine: Coroutine) -> asyncio.Task:
+        """Run `coroutine` in the background, keeping a reference until it is done"""
+        task = asyncio.create_task(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    async def wait_new_block(self, current_block: int) -> int:
+        start_time = time.time()
+        while self.latest_block <= current_block:
+            self.block_event.clear()
+            await self.block_event.wait()
+        self.logger.info(
+            f"Block Number: {self.latest_block} (%s seconds)"
+            % (time.time() - start_time),
+            block=self.latest_block,
+        )
+        return self.latest_block
+
+    async def _watch_blocks(self) -> None:
+        reserve_table = self.ethereum.reserve_table
+        while True:
+            # The feeder commits a block once all its reserves are published
+            use_reserve_table = reserve_table and (
+                time.time() - self.latest_block_time
+                < self.config.get_int("SHARED_RESERVES_TIMEOUT")
+            )
+            try:
+                if use_reserve_table:
+                    block_number = reserve_table.block_number
+                else:
+                    block_number = await self.async_ethereum.block_number()
+                if block_number > self.latest_block:
+                    self.latest_block = block_number
+                    self.latest_block_time = time.time()
+                    self.block_event.set()
+                    self.ethereum.tx_manager.notify_block(block_number)
+                    self.spawn(
+                        self._ingest_gas_prices(
+                            block_number, seen_time=self.latest_block_time
+                        )
+                    )
+            except Exception as e:
+                self.logger.log(
+                    ERROR,
+                    f"Could not fetch block number {str(e)}",
+                    color="red",
+                    sample_key="block_number",
+                )
+            await asyncio.sleep(0.005 if use_reserve_table else 0.5)
+
+    async def _process_blocks(self) -> None:
+        current_block = self.latest_block
+        counter = 1
+        save_every_blocks = self.config.get_int("PATH_STATS_SAVE_EVERY_BLOCKS")
+        while True:
+            for strategy in self.strategies:
+                if (
+                    strategy.should_reload(counter, current_block)
+                    and strategy not in self.reloading
+                ):
+                    self.reloading.add(strategy)
+                    self.spawn(self._reload(strategy))
+            # Not on top of a reload that might have read the files before they changed
+            if (
+                not self.reloading
+                and not self.reloaded_by_strategy
+                and not self.updating_pools
+                and self.pool_files.changed_paths()
+            ):
+                self.updating_pools = True
+                self.spawn(self._update_pools())
+            if any(
+                strategy.should_heartbeat(counter, current_block)
+                for strategy in self.strategies
+            ):
+                heartbeat(self.config)
+            latest_block = await self.wait_new_block(current_block)
+            current_block = latest_block
+            start_time = time.time()
+            for strategy in list(self.reloaded_by_strategy):
+                self._apply_reload(strategy, self.reloaded_by_strategy.pop(strategy))
+
+            gas_price = None
+            try:
+                gas_price = await self._process_block(latest_block, start_time)
+            except Exception as e:
+                self.logger.log(
+                    ERROR, f"Exception processing block {str(e)}", color="red"
+                )
+
+            if counter % save_every_blocks == 0:
+                for path_stats in self._path_stats_stores():
+                    try:
+                        await self.to_thread(path_stats.save)
+                    except Exception as e:
+                        self.logger.log(
+                            ERROR, f"Could not save path stats {str(e)}", color="red"
+                        )
+            counter += 1
+            gas_price_str = Web3.fromWei(gas_price, "gwei") if gas_price else None
+            report_by_strategy = {
+                strategy: strategy.arbitrage.report
+                for strategy in self.strategies
+                if strategy.arbitrage
+                and strategy.arbitrage.report
+                and strategy.arbitrage.report.block_number == latest_block
+            }
+            reports = list(report_by_strategy.values())
+            if len(self.strategies) > 1:
+                reports_str = "".join(
+                    f" ({strategy.name}: {report})"
+                    for strategy, report in report_by_strategy.items()
+                )
+            else:
+                reports_str = "".join(f" ({report})" for report in reports)
+            seconds = time.time() - start_time
+            self.metrics.observe(BLOCK, seconds)
+            self.logger.info(
+                f"--- {latest_block} Ended in {seconds} seconds --- (Gas: {gas_price_str})"
+                + reports_str,
+                block=latest_block,
+                seconds=seconds,
+                gas_price=gas_price,
+                evaluated=(
+                    sum(report.evaluated for report in reports) if reports else None
+                ),
+                skipped=sum(report.skipped for report in reports) if reports else None,
+                positive=(
+                    sum(report.positive for report in reports) if reports else None
+                ),
+            )
+            self.profiler.on_block()
+
+    async def _with_retries(
+        self, strategy: StrategyInterface, function: Callable
+    ) -> Any:
+        """Run `function` in the reload thread, raising once `RELOAD_MAX_ATTEMPTS` failed"""
+        max_attempts = self.config.get_int("RELOAD_MAX_ATTEMPTS")
+        for attempt in range(1, max_attempts + 1):
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.reload_executor, function
+                )
+            except Exception as e:
+                self.logger.log(
+                    ERROR,
+                    f"Exception loading arbitrage path ({attempt}/{max_attempts}): {str(e)}"
+                    + (f" ({strategy.name})" if strategy.name else ""),
+                    color="red",
+                )
+                if attempt == max_attempts:
+                    raise
+                await asyncio.sleep(self.config.get_int("RELOAD_RETRY_SECONDS"))
+
+    async def _reload(self, strategy: StrategyInterface) -> None:
+        try:
+            self.reloaded_by_strategy[strategy] = await self._with_retries(
+                strategy, strategy.prepare_reload
+            )
+        except Exception:
+            self.logger.log(
+                ERROR,
+                "Keeping the current paths until the next reload"
+                + (f" ({strategy.name})" if strategy.name else ""),
+                color="red",
+            )
+        finally:
+            self.reloading.discard(strategy)
+
+    async def _update_pools(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            update = await loop.run_in_executor(
+                self.reload_executor, self.pool_files.load
+            )
+            for strategy in self.strategies:
+                if self._reload_pending(strategy):
+                    continue
+                try:
+                    reloaded = await loop.run_in_executor(
+                        self.reload_executor, strategy.prepare_pools_update, update
+                    )
+                except Exception as e:
+                    self.logger.log(
+                        ERROR,
+                        f"Could not update pools, keeping the current ones: {str(e)}"
+                        + (f" ({strategy.name})" if strategy.name else ""),
+                        color="red",
+                    )
+                    continue
+                # Updated from the pools of before a reload started in the meantime
+                if not self._reload_pending(strategy):
+                    self.reloaded_by_strategy[strategy] = reloaded
+        except Exception as e:
+            self.logger.log(
+                ERROR,
+                f"Invalid pool files, keeping the current pools: {str(e)}",
+                color="red",
+            )
+        finally:
+            self.updating_pools = False
+
+    def _reload_pending(self, strategy: StrategyInterface) -> bool:
+        """A reload started after the pool files changed, it reads them too"""
+        return strategy in self.reloading or strategy in self.reloaded_by_strategy
+
+    def _apply_reload(self, strategy: StrategyInterface, reloaded: Any) -> None:
+        previous_arbitrage = strategy.arbitrage
+        strategy.apply_reload(reloaded)
+        if previous_arbitrage and previous_arbitrage is not strategy.arbitrage:
+            # Joining the worker processes of --parallel can take a while
+            asyncio.get_running_loop().run_in_executor(
+                self.reload_executor, previous_arbitrage.close
+            )
+
+    def _should_stop(self, latest_block: int, deadline: float) -> str:
+        """Called from the evaluation thread between chunks of paths"""
+        if self.latest_block > latest_block:
+            return f"block {self.latest_block} arrived"
+        if time.time() > deadline:
+            return "deadline"
+        return None
+
+    def _path_stats_stores(self) -> List[PathStatsStore]:
+        """Path stats of the strategies, saved once when shared"""
+        path_stats_by_id = {
+            id(strategy.path_stats): strategy.path_stats
+            for strategy in self.strategies
+            if strategy.path_stats
+        }
+        return list(path_stats_by_id.values())
+
+    async def _process_block(self, latest_block: int, block_start_time: float) -> int:
+        """Return the gas price of the first strategy with paths to evaluate"""
+        selections: List[Tuple[StrategyInterface, List[ArbitragePath]]] = []
+        for strategy in self.strategies:
+            arbitrage_paths = await self.to_thread(strategy.select_paths, latest_block)
+            if arbitrage_paths:
+                selections.append((strategy, arbitrage_paths))
+            else:
+                strategy.on_block_end(latest_block, False)
+        if not selections:
+            return None
+
+        # Reserves of the paths of every strategy are fetched once, by the first one
+        arbitrage = selections[0][0].arbitrage
+        network_gas_price, _ = await asyncio.gather(
+            self._gas_price(),
+            self.to_thread(
+                arbitrage.load_snapshot,
+                [
+                    arbitrage_path
+                    for _, arbitrage_paths in selections
+                    for arbitrage_path in arbitrage_paths
+                ],
+                latest_block,
+                "",
+                self.fetch_executor,
+            ),
+        )
+        for strategy, _ in selections[1:]:
+            strategy.arbitrage.share_snapshot(arbitrage.snapshot)
+        deadline = block_start_time + self.config.block_deadline
+        printed_path_ids: Set[str] = set()
+        for strategy, arbitrage_paths in selections:
+            try:
+                await self._process_strategy(
+                    strategy,
+                    arbitrage_paths,
+                    latest_block,
+                    strategy.adjust_gas_price(network_gas_price),
+                    deadline,
+                    printed_path_ids,
+                )
+            except Exception as e:
+                self.logger.log(
+                    ERROR,
+                    f"Exception processing block {str(e)}"
+                    + (f" ({strategy.name})" if strategy.name else ""),
+                    color="red",
+                )
+        if self.recorder:
+            pool_by_address = {
+                pool.address: pool
+                for strategy, _ in selections
+                for pool in strategy.arbitrage.pools
+            }
+            self.spawn(
+                self._record_block(
+                    latest_block,
+                    network_gas_price,
+                    arbitrage.snapshot,
+                    list(pool_by_address.values()),
+                )
+            )
+        return selections[0][0].adjust_gas_price(network_gas_price)
+
+    async def _process_strategy(
+        self,
+        strategy: StrategyInterface,
+        arbitrage_paths: List[ArbitragePath],
+        latest_block: int,
+        gas_price: int,
+        deadline: float,
+        printed_path_ids: Set[str],
+    ) -> None:
+        arbitrage = strategy.arbitrage
+        positive_paths = await self.to_thread(
+            arbitrage.find_positive_paths,
+            arbitrage_paths,
+            latest_block,
+            gas_price,
+            "",
+            lambda: self._should_stop(latest_block, deadline),
+            strategy.sample_cold_paths,
+        )
+        # Already sent in this block by a strategy evaluated before
+        positive_paths = [
+            arbitrage_path
+            for arbitrage_path in positive_paths
+            if arbitrage_path.path_id not in printed_path_ids
+        ]
+
+        printed_path = None
+        if positive_paths:
+            gas_estimates = await self._estimate_gas(arbitrage, positive_paths)
+            arbitrage.record_gas_estimates(positive_paths, gas_estimates, latest_block)
+            if self.latest_block > latest_block:
+                self.logger.info(
+                    f"Block {self.latest_block} arrived, dropping stale arbitrages"
+                )
+            else:
+                printed_path = await self.to_thread(
+                    arbitrage.printer.print_best,
+                    positive_paths,
+                    gas_estimates,
+                    latest_block,
+                )
+        if printed_path:
+            printed_path_ids.add(printed_path.path_id)
+            strategy.on_arbitrage_printed(latest_block, printed_path)
+        strategy.on_block_end(latest_block, printed_path is not None)
+
+    async def _record_block(
+        self,
+        block_number: int,
+        gas_price: int,
+        snapshot: ReserveSnapshot,
+        pools: List[Pool],
+    ) -> None:
+        try:
+            header = await self.async_ethereum.get_block(block_number)
+            await self.to_thread(
+                self.recorder.record,
+                header,
+                gas_price,
+                snapshot.reserves_by_pool_address,
+                pools,
+            )
+        except Exception as e:
+            self.logger.log(
+                ERROR,
+                f"Could not record block {block_number} {str(e)}",
+                color="red",
+                sample_key="recorder",
+            )
+
+    async def _estimate_gas(
+        self, arbitrage: Arbitrage, arbitrage_paths: List[ArbitragePath]
+    ) -> Dict[str, Union[int, str]]:
+        """Run `estimateGas` for every candidate in one JSON-RPC batch, by path id"""
+        with self.metrics.time(SAFETY_CHECK):
+            return await self._batch_estimate_gas(arbitrage, arbitrage_paths)
+
+    async def _batch_estimate_gas(
+        self, arbitrage: Arbitrage, arbitrage_paths: List[ArbitragePath]
+    ) -> Dict[str, Union[int, str]]:
+        printer = arbitrage.printer
+        try:
+            results = await self.async_ethereum.batch_request(
+                [
+                    ["eth_estimateGas", [printer.estimate_gas_call(arbitrage_path)]]
+                    for arbitrage_path in arbitrage_paths
+                ]
+            )
+        except Exception as e:
+            self.logger.log(ERROR, f"Could not batch estimateGas {str(e)}", color="red")
+            return await self.to_thread(
+                printer.estimate_gas_all, arbitrage_paths, self.fetch_executor
+            )
+        return {
+            arbitrage_path.path_id: (
+                int(result, 16) if isinstance(result, str) else str(result)
+            )
+            for arbitrage_path, result in zip(arbitrage_paths, results)
+        }
+
+    async def _ingest_gas_prices(
+        self, block_number: int, sample_pending: bool = True, seen_time: float = None
+    ) -> None:
+        """Feed the gas oracle, `seen_time` is when the block was first seen"""
+        gas_oracle = self.ethereum.gas_oracle
+        try:
+            block = await self.async_ethereum.get_block(block_number, True)
+            if block is None:
+                # Not known by the node (yet), i.e. before the chain started
+                return
+            if seen_time:
+                self.metrics.observe(
+                    BLOCK_ARRIVAL, seen_time - int(block["timestamp"], 16)
+                )
+            gas_oracle.ingest(block)
+            if sample_pending and gas_oracle.sample_pending:
+                gas_oracle.ingest_pending(
+                    await self.async_ethereum.get_block("pending", True)
+                )
+        except Exception as e:
+            self.logger.log(
+                ERROR,
+                f"Could not ingest gas prices {str(e)}",
+                color="red",
+                sample_key="gas_oracle",
+            )
+
+    async def _gas_price(self) -> int:
+        """Network gas price, before the multiplier of each strategy"""
+        try:
+            gas_price = await self.to_thread(
+                calculate_gas_price, self.ethereum, self.config
+            )
+        except Exception as e:
+            self.logger.log(
+                ERROR, f"Could not calculate gas price {str(e)}", color="red"
+            )
+            gas_price = await self.async_ethereum.gas_price()
+        return gas_price
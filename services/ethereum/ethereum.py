@@ -1,29 +1,51 @@
 import json
 import os
+from typing import Any
 
 import requests
 from web3 import Web3
 from web3.eth import Contract
-from web3.gas_strategies.time_based import construct_time_based_gas_price_strategy
 
 from config import Config
+from services.ethereum.gas_oracle import GasOracle
+from services.ethereum.nonce import NonceManager
+from services.ethereum.transactions import TransactionManager
+from services.metrics.metrics import Metrics, construct_rpc_counter_middleware
 from services.pools.pool import Pool
+from services.reserves.shared import SharedReserveTable
 from services.ttypes.contract import ContractTypeEnum
 
 
+def time_based_gas_price_strategy(w3: Web3, transaction_params: Any = None) -> int:
+    """web3's time based gas price strategy, only imported once a gas price is generated"""
+    from web3.gas_strategies.time_based import construct_time_based_gas_price_strategy
+
+    gas_strategy = construct_time_based_gas_price_strategy(
+        max_wait_seconds=5, sample_size=1, probability=98, weighted=True
+    )
+    return gas_strategy(w3, transaction_params)
+
+
 class Ethereum:
     def __init__(self, config: Config) -> None:
         self.config = config
         self._init_web3()
+        self.reserve_table: SharedReserveTable = None
+        if self.config.shared_reserves:
+            self.reserve_table = SharedReserveTable.attach(self.config.shared_reserves)
+        self.gas_oracle = GasOracle(self.config)
+        self.nonce_manager = NonceManager(self.w3, self.config)
+        self.tx_manager = TransactionManager(self.w3, self.config, self.nonce_manager)
 
     def _init_web3(self) -> None:
         # self.w3 = Web3(Web3.WebsocketProvider(self.config.get("ETHEREUM_WS_URI")))
         self.w3 = Web3(Web3.HTTPProvider(self.config.get("ETHEREUM_HTTP_URI")))
 
-        gas_strategy = construct_time_based_gas_price_strategy(
-            max_wait_seconds=5, sample_size=1, probability=98, weighted=True
+        self.w3.eth.setGasPriceStrategy(time_based_gas_price_strategy)
+        self.w3.middleware_onion.add(
+            construct_rpc_counter_middleware(Metrics.instance(self.config)),
+            "rpc_counter",
         )
-        self.w3.eth.setGasPriceStrategy(gas_strategy)
         # w3.middleware_onion.add(middleware.time_based_cache_middleware)
         # w3.middleware_onion.add(middleware.latest_block_based_cache_middleware)
         # w3.middleware_onion.add(middleware.simple_cache_middleware)
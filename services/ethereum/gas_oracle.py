@@ -0,0 +1,77 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+from config import Config
+
+
+class GasOracle:
+    """Gas price estimated from the blocks already seen, answered without any RPC call.
+
+    Every block is ingested once: the lowest gas price included in it is kept for the last
+    `GAS_ORACLE_WINDOW` blocks. The estimate is the `GAS_ORACLE_PERCENTILE` of those minimums,
+    a price that would have made it in that share of the recent blocks (web3's time based
+    strategy targets the next block with a 98% probability). With `GAS_ORACLE_SAMPLE_PENDING`
+    the same percentile of the pending transactions is used as a floor.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.percentile = self.config.get_float("GAS_ORACLE_PERCENTILE")
+        self.max_age = self.config.get_int("GAS_ORACLE_MAX_AGE")
+        self.sample_pending = bool(self.config.get_int("GAS_ORACLE_SAMPLE_PENDING"))
+        self.min_gas_prices: Deque[Tuple[int, int]] = deque(
+            maxlen=self.config.get_int("GAS_ORACLE_WINDOW")
+        )
+        self.lock = threading.Lock()
+        self.estimate: int = None
+        self.pending_estimate: int = None
+        self.updated_time = 0.0
+
+    def gas_price(self) -> int:
+        """Return None until a block was ingested, or if none was for `GAS_ORACLE_MAX_AGE` seconds"""
+        with self.lock:
+            if self.estimate is None or time.time() - self.updated_time > self.max_age:
+                return None
+            return max(self.estimate, self.pending_estimate or 0)
+
+    def ingest(self, block: Dict[str, Any]) -> None:
+        """Ingest a block fetched with its full transactions (web3 or raw JSON-RPC)"""
+        block_number = _to_int(block["number"])
+        gas_prices = _gas_prices(block["transactions"])
+        with self.lock:
+            if any(number == block_number for number, _ in self.min_gas_prices):
+                return
+            if gas_prices:
+                self.min_gas_prices.append((block_number, min(gas_prices)))
+            if not self.min_gas_prices:
+                return
+            self.estimate = _percentile(
+                [gas_price for _, gas_price in self.min_gas_prices], self.percentile
+            )
+            self.updated_time = time.time()
+
+    def ingest_pending(self, block: Dict[str, Any]) -> None:
+        gas_prices = _gas_prices(block["transactions"])
+        with self.lock:
+            self.pending_estimate = (
+                _percentile(gas_prices, self.percentile) if gas_prices else None
+            )
+
+
+def _to_int(value: Any) -> int:
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def _gas_prices(transactions: List[Dict[str, Any]]) -> List[int]:
+    # Transactions of the miner itself are often free and tell nothing about the market
+    gas_prices = [_to_int(transaction["gasPrice"]) for transaction in transactions]
+    return [gas_price for gas_price in gas_prices if gas_price > 0]
+
+
+def _percentile(values: List[int], percentile: float) -> int:
+    values = sorted(values)
+    index = max(math.ceil(percentile / 100 * len(values)) - 1, 0)
+    return values[index]
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List
+
+import websockets
+from web3 import Web3
+
+from config import Config
+from services.logger.logger import ERROR, Logger
+
+
+class PendingTransactionStream:
+    """Pending transactions sent by a set of addresses, pushed from a background thread.
+
+    With `ETHEREUM_WS_URI`, the thread subscribes to `newPendingTransactions` with full
+    transaction objects, so a transaction is received as soon as the node sees it without any
+    further request. Without it, or if the node only streams hashes, the thread polls
+    `txpool_contentFrom` for each address every `MEMPOOL_POLL_SECONDS` instead of downloading
+    the whole mempool. Either way transactions are filtered by sender in the thread and each
+    one is delivered once.
+    """
+
+    def __init__(self, w3: Web3, config: Config, addresses: Iterable[str]) -> None:
+        self.w3 = w3
+        self.config = config
+        self.logger = Logger.instance(self.config)
+        self.ws_uri = self.config.get("ETHEREUM_WS_URI")
+        self.poll_seconds = self.config.get_float("MEMPOOL_POLL_SECONDS")
+        self.reconnect_seconds = self.config.get_float("MEMPOOL_RECONNECT_SECONDS")
+        self.max_seen = self.config.get_int("MEMPOOL_SEEN_TRANSACTIONS")
+        self.addresses: List[str] = []
+        self.lower_addresses: frozenset = frozenset()
+        self.set_addresses(addresses)
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        # Hashes already delivered, oldest first
+        self.seen_hashes: "OrderedDict[str, None]" = OrderedDict()
+        self.thread: threading.Thread = None
+
+    def start(self) -> None:
+        target = self._run_subscription if self.ws_uri else self._run_polling
+        self.thread = threading.Thread(target=target, name="mempool", daemon=True)
+        self.thread.start()
+
+    def set_addresses(self, addresses: Iterable[str]) -> None:
+        """Replace the watched senders, taken into account by the next transaction"""
+        addresses = [Web3.toChecksumAddress(address) for address in addresses]
+        # Both are replaced at once, never mutated, so the thread reads them without a lock
+        self.addresses = addresses
+        self.lower_addresses = frozenset(address.lower() for address in addresses)
+
+    def get(self, timeout: float) -> List[Dict[str, Any]]:
+        """Wait at most `timeout` seconds for a transaction and return all the received ones"""
+        try:
+            transactions = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                transactions.append(self.queue.get_nowait())
+            except queue.Empty:
+                return transactions
+
+    def _push(self, transaction: Dict[str, Any]) -> None:
+        sender = transaction.get("from")
+        if not sender or sender.lower() not in self.lower_addresses:
+            return
+        tx_hash = transaction["hash"]
+        if tx_hash in self.seen_hashes:
+            return
+        self.seen_hashes[tx_hash] = None
+        if len(self.seen_hashes) > self.max_seen:
+            self.seen_hashes.popitem(last=False)
+        self.queue.put(transaction)
+
+    def _run_polling(self) -> None:
+        while True:
+            start_time = time.time()
+            for address in self.addresses:
+                try:
+                    content = self.w3.manager.request_blocking(
+                        "txpool_contentFrom", [address]
+                    )
+                except Exception as e:
+                    self.logger.log(
+                        ERROR,
+                        f"Unable to poll the pending transactions of {address}: {str(e)}",
+                        color="red",
+                    )
+                    time.sleep(self.reconnect_seconds)
+                    continue
+                for transaction in (content.get("pending") or {}).values():
+                    self._push(transaction)
+            time.sleep(max(self.poll_seconds - (time.time() - start_time), 0))
+
+    def _run_subscription(self) -> None:
+        while True:
+            try:
+                streams_hashes = asyncio.run(self._subscribe())
+            except Exception as e:
+                self.logger.log(
+                    ERROR,
+                    f"Pending transactions subscription lost: {str(e) or type(e).__name__}",
+                    color="red",
+                )
+                time.sleep(self.reconnect_seconds)
+                continue
+            if streams_hashes:
+                self.logger.log(
+                    ERROR,
+                    "The node streams pending transaction hashes only, polling txpool_contentFrom instead",
+                    color="red",
+                )
+                self._run_polling()
+
+    async def _subscribe(self) -> bool:
+        """Push the subscribed transactions, return True if the node only sends hashes"""
+        async with websockets.connect(self.ws_uri, max_size=None) as websocket:
+            await websocket.send(
+                json.dumps(
+                    {
+                        "jsonrpc": "2.0",
+                        "id": 1,
+                        "method": "eth_subscribe",
+                        "params": ["newPendingTransactions", True],
+                    }
+                )
+            )
+            response = json.loads(await websocket.recv())
+            if "error" in response:
+                raise Exception(response["error"].get("message"))
+            self.logger.info(f"Subscribed to the pending transactions of {self.ws_uri}")
+            async for message in websocket:
+                transaction = json.loads(message).get("params", {}).get("result")
+                if isinstance(transaction, str):
+                    return True
+                if transaction:
+                    self._push(transaction)
+        raise Exception("connection closed")
@@ -0,0 +1,81 @@
+import fcntl
+import os
+import threading
+
+from web3 import Web3
+
+from config import Config
+
+
+class NonceManager:
+    """Hand out the nonces of the executor account without asking the node on every send.
+
+    The next nonce is read from the node on startup (`reconcile`) and then incremented locally.
+    It is reconciled again once a transaction is mined, dropped or failed to broadcast.
+    With `--nonce-file`, processes sharing `EXECUTOR_ADDRESS` keep the next nonce in that file
+    under an exclusive lock so they never hand out the same one.
+    """
+
+    def __init__(self, w3: Web3, config: Config) -> None:
+        self.w3 = w3
+        self.config = config
+        self.executor_address = self.config.get("EXECUTOR_ADDRESS")
+        self.file_path = self.config.nonce_file
+        self.nonce: int = None
+        self.lock = threading.Lock()
+
+    def next_nonce(self) -> int:
+        with self.lock:
+            if self.file_path:
+                with open(self.file_path, "a+") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    nonce = self._read(f)
+                    if nonce is None:
+                        nonce = self._node_nonce()
+                    self._write(f, nonce + 1)
+            else:
+                if self.nonce is None:
+                    self.nonce = self._node_nonce()
+                nonce = self.nonce
+            self.nonce = nonce + 1
+            return nonce
+
+    def reconcile(self, dropped: bool = False) -> None:
+        """Catch up with the node. After a dropped or failed transaction its nonce is free again,
+        so the node is trusted even if it is behind the local nonce. With `--nonce-file` this
+        is only the case if no other process took a nonce from the file since ours, it may not
+        have broadcast it yet.
+        """
+        node_nonce = self._node_nonce()
+        with self.lock:
+            if self.file_path:
+                with open(self.file_path, "a+") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    nonce = self._read(f)
+                    if nonce is None or (dropped and nonce == self.nonce):
+                        nonce = node_nonce
+                    else:
+                        nonce = max(nonce, node_nonce)
+                    self._write(f, nonce)
+            elif dropped or self.nonce is None:
+                nonce = node_nonce
+            else:
+                nonce = max(self.nonce, node_nonce)
+            self.nonce = nonce
+
+    def _node_nonce(self) -> int:
+        return self.w3.eth.getTransactionCount(self.executor_address, "pending")
+
+    @staticmethod
+    def _read(f) -> int:
+        f.seek(0)
+        content = f.read().strip()
+        return int(content) if content else None
+
+    @staticmethod
+    def _write(f, nonce: int) -> None:
+        f.seek(0)
+        f.truncate()
+        f.write(str(nonce))
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,130 @@
+import threading
+import time
+from typing import Dict, List, Set
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from config import Config
+from services.logger.logger import ERROR, Logger
+from services.ethereum.nonce import NonceManager
+from services.notifications.notifications import Notification
+from services.ttypes.transaction import PendingTransaction
+
+
+class TransactionManager:
+    """Track the receipts of sent transactions in a background thread.
+
+    The strategy only broadcasts and returns. The tracker checks the pending receipts when it
+    is notified of a new block (or every `TX_TRACKER_POLL_INTERVAL` seconds without
+    notifications), posts the outcome and forgets transactions not mined after
+    `TX_RECEIPT_TIMEOUT` seconds. `conflicts` lets the caller avoid sending a transaction that
+    touches the pools of one still in flight.
+    """
+
+    def __init__(self, w3: Web3, config: Config, nonce_manager: NonceManager) -> None:
+        self.w3 = w3
+        self.config = config
+        self.logger = Logger.instance(self.config)
+        self.nonce_manager = nonce_manager
+        self.notification: Notification = None
+        self.pending_by_tx_hash: Dict[str, PendingTransaction] = {}
+        self.latest_block = 0
+        self.condition = threading.Condition()
+        self.thread: threading.Thread = None
+
+    @property
+    def in_flight(self) -> List[PendingTransaction]:
+        with self.condition:
+            return list(self.pending_by_tx_hash.values())
+
+    def conflicts(self, pool_addresses: Set[str]) -> bool:
+        return any(
+            pending.pool_addresses & pool_addresses for pending in self.in_flight
+        )
+
+    def track(
+        self, tx_hash: str, path_id: str, pool_addresses: Set[str], latest_block: int
+    ) -> None:
+        pending = PendingTransaction(
+            tx_hash=tx_hash,
+            path_id=path_id,
+            pool_addresses=pool_addresses,
+            sent_block=latest_block,
+            sent_time=time.time(),
+        )
+        with self.condition:
+            self.pending_by_tx_hash[tx_hash] = pending
+            if self.thread is None:
+                self.notification = Notification(self.config)
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def notify_block(self, block_number: int) -> None:
+        with self.condition:
+            if block_number > self.latest_block:
+                self.latest_block = block_number
+                self.condition.notify()
+
+    def _run(self) -> None:
+        poll_interval = self.config.get_int("TX_TRACKER_POLL_INTERVAL")
+        checked_block = 0
+        while True:
+            with self.condition:
+                while True:
+                    if self.pending_by_tx_hash and self.latest_block > checked_block:
+                        break
+                    timed_out = not self.condition.wait(timeout=poll_interval)
+                    # No block notifications (e.g. the node is down), poll anyway
+                    if timed_out and self.pending_by_tx_hash:
+                        break
+                checked_block = self.latest_block
+                pending_transactions = list(self.pending_by_tx_hash.values())
+
+            for pending in pending_transactions:
+                try:
+                    done = self._check(pending)
+                except Exception as e:
+                    self.logger.log(
+                        ERROR,
+                        f"Could not fetch receipt of {pending.tx_hash}: {str(e)}",
+                        color="red",
+                        tx_hash=pending.tx_hash,
+                    )
+                    continue
+                if done:
+                    with self.condition:
+                        self.pending_by_tx_hash.pop(pending.tx_hash, None)
+
+    def _check(self, pending: PendingTransaction) -> bool:
+        """Return True once the transaction is mined or timed out, after posting the outcome"""
+        etherscan_url = (
+            "https://kovan.etherscan.io"
+            if self.config.kovan
+            else "https://etherscan.io"
+        )
+        tx_hash_url = f"{etherscan_url}/tx/{pending.tx_hash}"
+        try:
+            receipt = self.w3.eth.getTransactionReceipt(pending.tx_hash)
+        except TransactionNotFound:
+            receipt = None
+
+        if receipt is None:
+            if time.time() - pending.sent_time < self.config.get_int(
+                "TX_RECEIPT_TIMEOUT"
+            ):
+                return False
+            self.notification.send_slack_errors(
+                f"Transaction failed {tx_hash_url}: not mined after {self.config.get_int('TX_RECEIPT_TIMEOUT')} seconds"
+            )
+            self.nonce_manager.reconcile(dropped=True)
+            return True
+
+        self.nonce_manager.reconcile()
+        if receipt["status"] == 1:
+            self.notification.send_slack_printing_tx(tx_hash_url, success=True)
+            self.notification.send_twilio(f"Brrrrrr: {tx_hash_url}")
+        else:
+            self.notification.send_slack_printing_tx(tx_hash_url, success=False)
+        return True
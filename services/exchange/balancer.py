@@ -1,16 +1,19 @@
-import sys
+from typing import List, Tuple
 
 from web3.eth import Contract
 
+from services.exchange.bmath import BONE, calc_out_given_in
 from services.exchange.iexchange import ExchangeInterface
 from services.pools.token import Token
 from config import Config
+from services.logger.logger import DEBUG, Logger
 
 
 class BalancerExchange(ExchangeInterface):
     def __init__(self, contract: Contract, config: Config) -> None:
         self.contract = contract
         self.config = config
+        self.logger = Logger.instance(self.config)
         self.swap_fee = self.contract.functions.getSwapFee().call(
             block_identifier=self.config.since
         )
@@ -39,14 +42,56 @@ class BalancerExchange(ExchangeInterface):
             amount_in_wei,
             self.swap_fee,
         ).call(block_identifier=self.config.since)
-        if self.config.debug:
-            print(
+        if self.logger.is_enabled(DEBUG):
+            self.logger.debug(
                 f"[BPOOL] Exchange {token_in.from_wei(amount_in_wei)} {token_in.name} -> {token_out.from_wei(amount_out_wei)} {token_out.name}"
             )
-            sys.stdout.flush()
 
         return amount_out_wei
 
+    def fetch_reserves(self, tokens: List[Token]) -> Tuple[int, int, int, int, int]:
+        """Fetch (balance_0, balance_1, weight_0, weight_1, swap_fee) ordered as `tokens`"""
+        balances = [
+            self.contract.functions.getBalance(token.checksum_address).call(
+                block_identifier=self.config.since
+            )
+            for token in tokens
+        ]
+        weights = [
+            self.contract.functions.getDenormalizedWeight(token.checksum_address).call(
+                block_identifier=self.config.since
+            )
+            for token in tokens
+        ]
+        return balances[0], balances[1], weights[0], weights[1], self.swap_fee
+
+    @staticmethod
+    def calc_amount_out_from_reserves(
+        reserves: Tuple[int, ...],
+        token_in_index: int,
+        token_in: Token,
+        token_out: Token,
+        amount_in_wei: int,
+    ) -> int:
+        token_out_index = 1 - token_in_index
+        return calc_out_given_in(
+            reserves[token_in_index],
+            reserves[2 + token_in_index],
+            reserves[token_out_index],
+            reserves[2 + token_out_index],
+            amount_in_wei,
+            reserves[4],
+        )
+
+    @staticmethod
+    def spot_rate(reserves: Tuple[int, ...], token_in_index: int) -> float:
+        token_out_index = 1 - token_in_index
+        return (
+            (reserves[token_out_index] / reserves[2 + token_out_index])
+            / (reserves[token_in_index] / reserves[2 + token_in_index])
+            * (1 - reserves[4] / BONE)
+        )
+
     def calc_amount_out_proxy(
         self, token_in: Token, token_out: Token, amount_in_wei: int
     ) -> int:
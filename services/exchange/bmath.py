@@ -0,0 +1,106 @@
+"""Integer port of Balancer's BNum/BMath so BPool swaps can be simulated without an eth_call.
+
+Mirrors https://github.com/balancer-labs/balancer-core/blob/master/contracts/BMath.sol
+"""
+
+BONE = 10**18
+MIN_BPOW_BASE = 1
+MAX_BPOW_BASE = (2 * BONE) - 1
+BPOW_PRECISION = BONE // 10**10
+
+
+def btoi(a: int) -> int:
+    return a // BONE
+
+
+def bfloor(a: int) -> int:
+    return btoi(a) * BONE
+
+
+def bsub(a: int, b: int) -> int:
+    if b > a:
+        raise Exception("ERR_SUB_UNDERFLOW")
+    return a - b
+
+
+def bsub_sign(a: int, b: int):
+    if a >= b:
+        return a - b, False
+    return b - a, True
+
+
+def bmul(a: int, b: int) -> int:
+    return ((a * b) + (BONE // 2)) // BONE
+
+
+def bdiv(a: int, b: int) -> int:
+    if b == 0:
+        raise Exception("ERR_DIV_ZERO")
+    return ((a * BONE) + (b // 2)) // b
+
+
+def bpowi(a: int, n: int) -> int:
+    z = a if n % 2 != 0 else BONE
+    n = n // 2
+    while n != 0:
+        a = bmul(a, a)
+        if n % 2 != 0:
+            z = bmul(z, a)
+        n = n // 2
+    return z
+
+
+def bpow(base: int, exp: int) -> int:
+    if base < MIN_BPOW_BASE:
+        raise Exception("ERR_BPOW_BASE_TOO_LOW")
+    if base > MAX_BPOW_BASE:
+        raise Exception("ERR_BPOW_BASE_TOO_HIGH")
+    whole = bfloor(exp)
+    remain = bsub(exp, whole)
+    whole_pow = bpowi(base, btoi(whole))
+    if remain == 0:
+        return whole_pow
+    partial_result = bpow_approx(base, remain, BPOW_PRECISION)
+    return bmul(whole_pow, partial_result)
+
+
+def bpow_approx(base: int, exp: int, precision: int) -> int:
+    a = exp
+    x, xneg = bsub_sign(base, BONE)
+    term = BONE
+    total = term
+    negative = False
+    i = 1
+    while term >= precision:
+        big_k = i * BONE
+        c, cneg = bsub_sign(a, bsub(big_k, BONE))
+        term = bmul(term, bmul(c, x))
+        term = bdiv(term, big_k)
+        if term == 0:
+            break
+        if xneg:
+            negative = not negative
+        if cneg:
+            negative = not negative
+        if negative:
+            total = bsub(total, term)
+        else:
+            total = total + term
+        i += 1
+    return total
+
+
+def calc_out_given_in(
+    token_balance_in: int,
+    token_weight_in: int,
+    token_balance_out: int,
+    token_weight_out: int,
+    token_amount_in: int,
+    swap_fee: int,
+) -> int:
+    weight_ratio = bdiv(token_weight_in, token_weight_out)
+    adjusted_in = bmul(token_amount_in, bsub(BONE, swap_fee))
+    y = bdiv(token_balance_in, token_balance_in + adjusted_in)
+    foo = bpow(y, weight_ratio)
+    bar = bsub(BONE, foo)
+    return bmul(token_balance_out, bar)
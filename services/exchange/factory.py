@@ -1,3 +1,5 @@
+from typing import Type
+
 from web3.eth import Contract
 
 from services.exchange.balancer import BalancerExchange
@@ -12,10 +14,15 @@ class ExchangeFactory:
     def create(
         contract: Contract, contract_type: ContractTypeEnum, config: Config
     ) -> ExchangeInterface:
+        exchange_class = ExchangeFactory.get_class(contract_type)
+        return exchange_class(contract, config)
+
+    @staticmethod
+    def get_class(contract_type: ContractTypeEnum) -> Type[ExchangeInterface]:
         if contract_type == ContractTypeEnum.BPOOL:
-            return BalancerExchange(contract, config)
+            return BalancerExchange
         if contract_type == ContractTypeEnum.UNISWAP:
-            return UniswapExchange(contract, config)
+            return UniswapExchange
         if contract_type == ContractTypeEnum.SUSHISWAP:
-            return UniswapExchange(contract, config)
+            return UniswapExchange
         raise Exception("Exchange not supported.")
@@ -1,4 +1,5 @@
 import abc
+from typing import List, Tuple
 
 from web3.eth import Contract
 
@@ -17,3 +18,24 @@ class ExchangeInterface(abc.ABC):
     ) -> int:
         """Calculate the amount out (in Wei) based on `amount_in` (in Wei). """
         pass
+
+    @abc.abstractclassmethod
+    def fetch_reserves(self, tokens: List[Token]) -> Tuple[int, ...]:
+        """Fetch on-chain the pool state needed to simulate a swap locally (ordered as `tokens`)"""
+        pass
+
+    @abc.abstractstaticmethod
+    def calc_amount_out_from_reserves(
+        reserves: Tuple[int, ...],
+        token_in_index: int,
+        token_in: Token,
+        token_out: Token,
+        amount_in_wei: int,
+    ) -> int:
+        """Calculate the amount out (in Wei) from reserves returned by `fetch_reserves`"""
+        pass
+
+    @abc.abstractstaticmethod
+    def spot_rate(reserves: Tuple[int, ...], token_in_index: int) -> float:
+        """Marginal amount out (in Wei) per Wei in, fees included, used to rank paths cheaply"""
+        pass
@@ -1,50 +1,69 @@
-import sys
+from typing import List, Tuple
+
 from web3.eth import Contract
 
 from services.exchange.iexchange import ExchangeInterface
 from services.pools.token import Token
 from config import Config
+from services.logger.logger import DEBUG, Logger
+
+SWAP_FEE = 997
 
 
 class UniswapExchange(ExchangeInterface):
     def __init__(self, contract: Contract, config: Config) -> None:
         self.contract = contract
         self.config = config
-        self.swap_fee = 997
+        self.logger = Logger.instance(self.config)
+        self.swap_fee = SWAP_FEE
 
     def calc_amount_out(
         self, token_in: Token, token_out: Token, amount_in_wei: int
     ) -> int:
         """Calculate the amount out (in Wei) based on `amount_in` (in Wei). """
         amount_out_wei = self._calc_amount_out(token_in, token_out, amount_in_wei)
-        if self.config.debug:
-            print(
+        if self.logger.is_enabled(DEBUG):
+            self.logger.debug(
                 f"[Uniswap] Exchange {token_in.from_wei(amount_in_wei)} {token_in.name} -> {token_out.from_wei(amount_out_wei)} {token_out.name}"
             )
-            sys.stdout.flush()
         return amount_out_wei
 
-    def _calc_amount_out(
-        self, token_in: Token, token_out: Token, amount_in_wei: int
-    ) -> int:
-        amount_in = token_in.from_wei(amount_in_wei)
-        token_0 = self.contract.functions.token0().call()
+    def fetch_reserves(self, tokens: List[Token]) -> Tuple[int, int]:
+        """Fetch reserves ordered as `tokens` (token0 is always the lowest address of the pair)"""
         reserve_0, reserve_1, _ = self.contract.functions.getReserves().call(
             block_identifier=self.config.since
         )
-        if token_0.lower() == token_in.address.lower():
-            token_in_reserve = reserve_0
-            token_out_reserve = reserve_1
-        else:
-            token_in_reserve = reserve_1
-            token_out_reserve = reserve_0
+        if int(tokens[0].address, 16) < int(tokens[1].address, 16):
+            return reserve_0, reserve_1
+        return reserve_1, reserve_0
 
-        token_in_reserve = token_in.from_wei(token_in_reserve)
-        token_out_reserve = token_out.from_wei(token_out_reserve)
+    @staticmethod
+    def calc_amount_out_from_reserves(
+        reserves: Tuple[int, ...],
+        token_in_index: int,
+        token_in: Token,
+        token_out: Token,
+        amount_in_wei: int,
+    ) -> int:
+        amount_in = token_in.from_wei(amount_in_wei)
+        token_in_reserve = token_in.from_wei(reserves[token_in_index])
+        token_out_reserve = token_out.from_wei(reserves[1 - token_in_index])
 
-        amount_in_with_fee = self.swap_fee * amount_in
+        amount_in_with_fee = SWAP_FEE * amount_in
         numerator = amount_in_with_fee * token_out_reserve
         denominator = (token_in_reserve * 1000) + amount_in_with_fee
         amount_out = numerator / denominator
         amount_out_wei = token_out.to_wei(amount_out)
         return amount_out_wei
+
+    @staticmethod
+    def spot_rate(reserves: Tuple[int, ...], token_in_index: int) -> float:
+        return reserves[1 - token_in_index] / reserves[token_in_index] * SWAP_FEE / 1000
+
+    def _calc_amount_out(
+        self, token_in: Token, token_out: Token, amount_in_wei: int
+    ) -> int:
+        reserves = self.fetch_reserves([token_in, token_out])
+        return self.calc_amount_out_from_reserves(
+            reserves, 0, token_in, token_out, amount_in_wei
+        )
@@ -0,0 +1,525 @@
+import itertools
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import rlp
+from eth_account import Account
+from web3 import Web3
+
+from config import Config
+from services.fakenode.contracts import CALL_GAS, ContractSimulator
+from services.pools.pool import Pool
+from services.ttypes.contract import ContractTypeEnum
+from services.ttypes.fakenode import FakeBlock, FakeNodeReport
+from services.ttypes.replay import RecordedBlock
+
+TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)").hex()
+LOG_SWAP_TOPIC = Web3.keccak(
+    text="LOG_SWAP(address,address,address,uint256,uint256)"
+).hex()
+ZERO_HASH = "0x" + "00" * 32
+EMPTY_BLOOM = "0x" + "00" * 256
+MINER_ADDRESS = "0x" + "ee" * 20
+BLOCK_GAS_LIMIT = 12500000
+SWAP_GAS = 150000
+GAS_PRICE_SPREAD = 0.2
+
+
+class FakeChain:
+    """Blocks of the fake node, mined from a pool-state timeline, and the transactions it received.
+
+    Every block holds one swap per pool whose reserves moved, with the `Transfer` (pairs) or
+    `LOG_SWAP` (BPools) logs the watcher filters, plus `FAKENODE_FILLER_TRANSACTIONS` transfers
+    so that gas price oracles always have samples. Transactions received with
+    `eth_sendRawTransaction` are mined in the next block, reverted if their call does not go
+    through at that block. Only the last `FAKENODE_HISTORY_BLOCKS` blocks are kept, like a
+    pruned node. Safe across threads.
+    """
+
+    def __init__(self, config: Config, report: FakeNodeReport) -> None:
+        self.config = config
+        self.report = report
+        self.simulator = ContractSimulator(self.config)
+        self.random = random.Random(0)
+        self.lock = threading.RLock()
+        self.history_blocks = self.config.get_int("FAKENODE_HISTORY_BLOCKS")
+        self.filler_transactions = self.config.get_int("FAKENODE_FILLER_TRANSACTIONS")
+        self.next_block_number: int = None
+        self.block_by_number: "OrderedDict[int, FakeBlock]" = OrderedDict()
+        self.block_number_by_hash: Dict[str, int] = {}
+        self.pools: List[Pool] = []
+        self.pending_transactions: List[Dict[str, Any]] = []
+        self.transaction_by_hash: Dict[str, Dict[str, Any]] = {}
+        self.receipt_by_hash: Dict[str, Dict[str, Any]] = {}
+        # Nonce of the next transaction mined by address
+        self.nonce_by_address: Dict[str, int] = {}
+        # Filter parameters and last block returned by filter id
+        self.filter_by_id: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        self.filter_ids = itertools.count(1)
+
+    @property
+    def latest(self) -> FakeBlock:
+        with self.lock:
+            return next(reversed(self.block_by_number.values()))
+
+    def mine(self, recorded_block: RecordedBlock) -> FakeBlock:
+        with self.lock:
+            if self.next_block_number is None:
+                self.next_block_number = (
+                    recorded_block.block_number
+                    or self.config.get_int("FAKENODE_START_BLOCK")
+                )
+            new_pools = [
+                pool
+                for pool in recorded_block.new_pools
+                if pool.address not in self.simulator.pool_by_address
+            ]
+            self.simulator.add_pools(new_pools)
+            self.pools += new_pools
+            number = self.next_block_number
+            self.next_block_number += 1
+            block_hash = self._hash("block", number)
+            parent = self.latest if self.block_by_number else None
+            previous_reserves = parent.reserves_by_pool_address if parent else {}
+            reserves_by_pool_address = dict(recorded_block.reserves_by_pool_address)
+            gas_price = recorded_block.gas_price
+
+            transactions: List[Dict[str, Any]] = []
+            logs: List[Dict[str, Any]] = []
+            for address, reserves in reserves_by_pool_address.items():
+                previous = previous_reserves.get(address)
+                if previous is None or previous == reserves:
+                    continue
+                transaction = self._background_transaction(
+                    address, gas_price, number, block_hash, len(transactions)
+                )
+                transactions.append(transaction)
+                logs += self._swap_logs(
+                    self.simulator.pool_by_address[address],
+                    previous,
+                    reserves,
+                    transaction,
+                    len(logs),
+                )
+            for _ in range(self.filler_transactions):
+                transactions.append(
+                    self._background_transaction(
+                        MINER_ADDRESS, gas_price, number, block_hash, len(transactions)
+                    )
+                )
+            gas_used = SWAP_GAS * len(transactions)
+            for transaction in self.pending_transactions:
+                transaction.update(
+                    blockNumber=hex(number),
+                    blockHash=block_hash,
+                    transactionIndex=hex(len(transactions)),
+                )
+                transactions.append(transaction)
+                gas_used += self._execute(
+                    transaction, reserves_by_pool_address, number, gas_used
+                )
+            self.pending_transactions = []
+
+            header = {
+                "number": hex(number),
+                "hash": block_hash,
+                "parentHash": parent.hash if parent else ZERO_HASH,
+                "nonce": "0x0000000000000000",
+                "mixHash": ZERO_HASH,
+                "sha3Uncles": ZERO_HASH,
+                "logsBloom": EMPTY_BLOOM,
+                "transactionsRoot": ZERO_HASH,
+                "stateRoot": ZERO_HASH,
+                "receiptsRoot": ZERO_HASH,
+                "miner": MINER_ADDRESS,
+                "difficulty": "0x1",
+                "totalDifficulty": hex(number),
+                "extraData": "0x",
+                "size": "0x0",
+                "gasLimit": hex(BLOCK_GAS_LIMIT),
+                "gasUsed": hex(gas_used),
+                "timestamp": hex(int(time.time())),
+                "uncles": [],
+            }
+            block = FakeBlock(
+                number=number,
+                hash=block_hash,
+                header=header,
+                transactions=transactions,
+                logs=logs,
+                reserves_by_pool_address=reserves_by_pool_address,
+                gas_price=gas_price,
+                published_at=time.time(),
+            )
+            self.block_by_number[number] = block
+            self.block_number_by_hash[block_hash] = number
+            while len(self.block_by_number) > self.history_blocks:
+                _, pruned_block = self.block_by_number.popitem(last=False)
+                del self.block_number_by_hash[pruned_block.hash]
+            self.report.blocks += 1
+            return block
+
+    def get_block(
+        self, block_identifier: str, full_transactions: bool = False
+    ) -> Dict[str, Any]:
+        with self.lock:
+            if block_identifier == "pending":
+                latest = self.latest
+                return dict(
+                    latest.header,
+                    number=hex(latest.number + 1),
+                    hash=None,
+                    parentHash=latest.hash,
+                    transactions=[
+                        transaction if full_transactions else transaction["hash"]
+                        for transaction in self.pending_transactions
+                    ],
+                )
+            block = self._find_block(block_identifier)
+            if block is None:
+                return None
+            return dict(
+                block.header,
+                transactions=[
+                    transaction if full_transactions else transaction["hash"]
+                    for transaction in block.transactions
+                ],
+            )
+
+    def get_block_by_hash(
+        self, block_hash: str, full_transactions: bool = False
+    ) -> Dict[str, Any]:
+        with self.lock:
+            number = self.block_number_by_hash.get(block_hash)
+            if number is None:
+                return None
+            return self.get_block(hex(number), full_transactions)
+
+    def call(self, transaction: Dict[str, Any], block_identifier: str) -> bytes:
+        with self.lock:
+            block = self._state_block(block_identifier)
+            output, _ = self.simulator.call(
+                transaction.get("to") or "",
+                transaction.get("data") or transaction.get("input"),
+                block.reserves_by_pool_address,
+                block.number,
+            )
+            return output
+
+    def estimate_gas(self, transaction: Dict[str, Any], block_identifier: str) -> int:
+        with self.lock:
+            if not transaction.get("to"):
+                return CALL_GAS
+            block = self._state_block(block_identifier)
+            _, gas = self.simulator.call(
+                transaction["to"],
+                transaction.get("data") or transaction.get("input"),
+                block.reserves_by_pool_address,
+                block.number,
+            )
+            return gas
+
+    def send_raw_transaction(self, raw_transaction: str) -> Tuple[str, int, float]:
+        """Queue a signed transaction for the next block
+
+        Return its hash, the latest block and the seconds since that block was published.
+        """
+        raw_bytes = Web3.toBytes(hexstr=raw_transaction)
+        nonce, gas_price, gas, to, value, data, v, r, s = rlp.decode(raw_bytes)
+        sender = Account.recover_transaction(raw_bytes)
+        tx_hash = Web3.keccak(raw_bytes).hex()
+        with self.lock:
+            if tx_hash in self.transaction_by_hash:
+                raise Exception("already known")
+            nonce = Web3.toInt(nonce)
+            if nonce < self.nonce_by_address.get(sender.lower(), 0):
+                raise Exception("nonce too low")
+            transaction = {
+                "hash": tx_hash,
+                "from": sender,
+                "to": Web3.toChecksumAddress(to) if to else None,
+                "nonce": hex(nonce),
+                "gasPrice": hex(Web3.toInt(gas_price)),
+                "gas": hex(Web3.toInt(gas)),
+                "value": hex(Web3.toInt(value)),
+                "input": Web3.toHex(data),
+                "v": hex(Web3.toInt(v)),
+                "r": hex(Web3.toInt(r)),
+                "s": hex(Web3.toInt(s)),
+                "blockNumber": None,
+                "blockHash": None,
+                "transactionIndex": None,
+            }
+            self.pending_transactions.append(transaction)
+            self.transaction_by_hash[tx_hash] = transaction
+            latest = self.latest
+            seconds = time.time() - latest.published_at
+            self.report.transactions += 1
+            self.report.detect_to_broadcast_seconds.append(seconds)
+            return tx_hash, latest.number, seconds
+
+    def get_transaction_count(self, address: str, block_identifier: str) -> int:
+        with self.lock:
+            nonce = self.nonce_by_address.get(address.lower(), 0)
+            if block_identifier != "pending":
+                return nonce
+            for transaction in self.pending_transactions:
+                if transaction["from"].lower() == address.lower():
+                    nonce = max(nonce, int(transaction["nonce"], 16) + 1)
+            return nonce
+
+    def get_transaction(self, tx_hash: str) -> Dict[str, Any]:
+        with self.lock:
+            return self.transaction_by_hash.get(tx_hash)
+
+    def get_receipt(self, tx_hash: str) -> Dict[str, Any]:
+        with self.lock:
+            return self.receipt_by_hash.get(tx_hash)
+
+    def get_logs(self, filter_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self.lock:
+            latest_number = self.latest.number
+            from_block = self._block_number(
+                filter_params.get("fromBlock", "latest"), latest_number
+            )
+            to_block = self._block_number(
+                filter_params.get("toBlock", "latest"), latest_number
+            )
+            return self._matching_logs(filter_params, from_block, to_block)
+
+    def new_filter(self, filter_params: Dict[str, Any]) -> str:
+        with self.lock:
+            filter_id = hex(next(self.filter_ids))
+            self.filter_by_id[filter_id] = (filter_params, self.latest.number)
+            return filter_id
+
+    def get_filter_changes(self, filter_id: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            if filter_id not in self.filter_by_id:
+                raise Exception("filter not found")
+            filter_params, last_block = self.filter_by_id[filter_id]
+            latest_number = self.latest.number
+            self.filter_by_id[filter_id] = (filter_params, latest_number)
+            return self._matching_logs(filter_params, last_block + 1, latest_number)
+
+    def get_filter_logs(self, filter_id: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            if filter_id not in self.filter_by_id:
+                raise Exception("filter not found")
+            filter_params, _ = self.filter_by_id[filter_id]
+            return self.get_logs(filter_params)
+
+    def uninstall_filter(self, filter_id: str) -> bool:
+        with self.lock:
+            return self.filter_by_id.pop(filter_id, None) is not None
+
+    def txpool_content(self) -> Dict[str, Any]:
+        with self.lock:
+            pending: Dict[str, Dict[str, Any]] = {}
+            for transaction in self.pending_transactions:
+                pending.setdefault(transaction["from"], {})[
+                    str(int(transaction["nonce"], 16))
+                ] = transaction
+            return {"pending": pending, "queued": {}}
+
+    def txpool_content_from(self, address: str) -> Dict[str, Any]:
+        with self.lock:
+            pending = {
+                str(int(transaction["nonce"], 16)): transaction
+                for transaction in self.pending_transactions
+                if transaction["from"].lower() == address.lower()
+            }
+            return {"pending": pending, "queued": {}}
+
+    def _execute(
+        self,
+        transaction: Dict[str, Any],
+        reserves_by_pool_address: Dict[str, Tuple[int, ...]],
+        number: int,
+        cumulative_gas_used: int,
+    ) -> int:
+        """Run a received transaction in block `number`, store its receipt and return its gas"""
+        status = 1
+        gas_used = CALL_GAS
+        if transaction["to"]:
+            try:
+                _, gas_used = self.simulator.call(
+                    transaction["to"],
+                    transaction["input"],
+                    reserves_by_pool_address,
+                    number,
+                )
+            except Exception:
+                status = 0
+                gas_used = self.config.get_int("FAKENODE_GAS_BASE")
+                self.report.reverted += 1
+        sender = transaction["from"].lower()
+        self.nonce_by_address[sender] = max(
+            self.nonce_by_address.get(sender, 0), int(transaction["nonce"], 16) + 1
+        )
+        self.receipt_by_hash[transaction["hash"]] = {
+            "transactionHash": transaction["hash"],
+            "transactionIndex": transaction["transactionIndex"],
+            "blockHash": transaction["blockHash"],
+            "blockNumber": transaction["blockNumber"],
+            "from": transaction["from"],
+            "to": transaction["to"],
+            "cumulativeGasUsed": hex(cumulative_gas_used + gas_used),
+            "gasUsed": hex(gas_used),
+            "contractAddress": None,
+            "logs": [],
+            "logsBloom": EMPTY_BLOOM,
+            "status": hex(status),
+        }
+        return gas_used
+
+    def _background_transaction(
+        self, to: str, gas_price: int, number: int, block_hash: str, index: int
+    ) -> Dict[str, Any]:
+        return {
+            "hash": self._hash("tx", number, index),
+            "from": self._random_address(),
+            "to": to,
+            "nonce": "0x0",
+            "gasPrice": hex(
+                int(gas_price * (1 + self.random.uniform(0, GAS_PRICE_SPREAD)))
+            ),
+            "gas": hex(SWAP_GAS),
+            "value": "0x0",
+            "input": "0x",
+            "v": "0x1b",
+            "r": "0x1",
+            "s": "0x1",
+            "blockNumber": hex(number),
+            "blockHash": block_hash,
+            "transactionIndex": hex(index),
+        }
+
+    def _swap_logs(
+        self,
+        pool: Pool,
+        previous_reserves: Tuple[int, ...],
+        reserves: Tuple[int, ...],
+        transaction: Dict[str, Any],
+        log_index: int,
+    ) -> List[Dict[str, Any]]:
+        """Logs of a swap moving the reserves of `pool` from `previous_reserves` to `reserves`"""
+        token_in_index = 0 if reserves[0] > previous_reserves[0] else 1
+        token_out_index = 1 - token_in_index
+        amounts = [abs(reserves[index] - previous_reserves[index]) for index in (0, 1)]
+        trader = self._random_address()
+        if pool.type == ContractTypeEnum.BPOOL:
+            entries = [
+                (
+                    pool.address,
+                    [
+                        LOG_SWAP_TOPIC,
+                        self._topic(trader),
+                        self._topic(pool.tokens[token_in_index].address),
+                        self._topic(pool.tokens[token_out_index].address),
+                    ],
+                    self._data(amounts[token_in_index], amounts[token_out_index]),
+                )
+            ]
+        else:
+            entries = [
+                (
+                    pool.tokens[token_in_index].address,
+                    [TRANSFER_TOPIC, self._topic(trader), self._topic(pool.address)],
+                    self._data(amounts[token_in_index]),
+                ),
+                (
+                    pool.tokens[token_out_index].address,
+                    [TRANSFER_TOPIC, self._topic(pool.address), self._topic(trader)],
+                    self._data(amounts[token_out_index]),
+                ),
+            ]
+        return [
+            {
+                "address": Web3.toChecksumAddress(address),
+                "topics": topics,
+                "data": data,
+                "blockNumber": transaction["blockNumber"],
+                "blockHash": transaction["blockHash"],
+                "transactionHash": transaction["hash"],
+                "transactionIndex": transaction["transactionIndex"],
+                "logIndex": hex(log_index + index),
+                "removed": False,
+            }
+            for index, (address, topics, data) in enumerate(entries)
+        ]
+
+    def _matching_logs(
+        self, filter_params: Dict[str, Any], from_block: int, to_block: int
+    ) -> List[Dict[str, Any]]:
+        addresses = filter_params.get("address") or []
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {address.lower() for address in addresses}
+        topic_filters = filter_params.get("topics") or []
+        logs: List[Dict[str, Any]] = []
+        for number in range(from_block, to_block + 1):
+            block = self.block_by_number.get(number)
+            if block is None:
+                continue
+            for log in block.logs:
+                if addresses and log["address"].lower() not in addresses:
+                    continue
+                if self._topics_match(log["topics"], topic_filters):
+                    logs.append(log)
+        return logs
+
+    @staticmethod
+    def _topics_match(topics: List[str], topic_filters: List[Any]) -> bool:
+        for index, topic_filter in enumerate(topic_filters):
+            if topic_filter is None:
+                continue
+            if index >= len(topics):
+                return False
+            accepted = [topic_filter] if isinstance(topic_filter, str) else topic_filter
+            if topics[index].lower() not in [topic.lower() for topic in accepted]:
+                return False
+        return True
+
+    def _find_block(self, block_identifier: Any) -> FakeBlock:
+        if block_identifier in (None, "latest", "pending"):
+            return self.latest
+        if block_identifier == "earliest":
+            return next(iter(self.block_by_number.values()))
+        return self.block_by_number.get(
+            self._block_number(block_identifier, self.latest.number)
+        )
+
+    def _state_block(self, block_identifier: Any) -> FakeBlock:
+        block = self._find_block(block_identifier)
+        if block is None:
+            raise Exception(f"missing trie node for block {block_identifier}")
+        return block
+
+    @staticmethod
+    def _block_number(block_identifier: Any, latest_number: int) -> int:
+        if block_identifier in (None, "latest", "pending"):
+            return latest_number
+        if block_identifier == "earliest":
+            return 0
+        if isinstance(block_identifier, int):
+            return block_identifier
+        return int(block_identifier, 16)
+
+    def _random_address(self) -> str:
+        return "0x%040x" % self.random.getrandbits(160)
+
+    @staticmethod
+    def _hash(*parts: Any) -> str:
+        return Web3.keccak(text="-".join(str(part) for part in parts)).hex()
+
+    @staticmethod
+    def _topic(address: str) -> str:
+        return "0x" + address.lower()[2:].rjust(64, "0")
+
+    @staticmethod
+    def _data(*amounts: int) -> str:
+        return "0x" + "".join("%064x" % amount for amount in amounts)
@@ -0,0 +1,214 @@
+import json
+import os
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+from eth_abi import decode_abi, encode_abi
+from eth_utils import function_abi_to_4byte_selector
+from web3 import Web3
+
+from config import Config
+from services.benchmark.exchanges import create_in_memory_exchange
+from services.exchange.bmath import calc_out_given_in
+from services.pools.pool import Pool
+from services.pools.token import Token
+from services.ttypes.contract import ContractTypeEnum
+from services.utils import unmask_address
+
+PRINTER = "PRINTER"
+# Gas of a transaction without swaps
+CALL_GAS = 21000
+
+
+class ContractSimulator:
+    """Run the pair, BPool and Printer functions called by the bot against in-memory reserves.
+
+    Calls are decoded with the ABIs of `ABI_PATH`. Only the view functions read by the
+    exchanges and the printer `arbitrage` are implemented, others revert. `arbitrage` swaps
+    along its token paths with the math of the exchanges and reverts like the contract would:
+    block too high, min amount out not reached or profit below the gas cost.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.printer_address = self.config.get("PRINTER_ADDRESS").lower()
+        self.function_by_selector_by_kind: Dict[Any, Dict[bytes, Dict[str, Any]]] = {
+            ContractTypeEnum.BPOOL: self._load_functions("bpool_abi.json"),
+            ContractTypeEnum.UNISWAP: self._load_functions("uniswap_pair_abi.json"),
+            PRINTER: self._load_functions("printer_abi.json"),
+        }
+        self.function_by_selector_by_kind[ContractTypeEnum.SUSHISWAP] = (
+            self.function_by_selector_by_kind[ContractTypeEnum.UNISWAP]
+        )
+        self.pool_by_address: Dict[str, Pool] = {}
+        # Uniswap like pairs by (router address, token addresses)
+        self.pair_by_key: Dict[Tuple[str, FrozenSet[str]], Pool] = {}
+
+    def add_pools(self, pools: List[Pool]) -> None:
+        for pool in pools:
+            self.pool_by_address[pool.address] = pool
+            if pool.router_address:
+                pair_key = self._pair_key(pool.router_address, pool.tokens)
+                pair = self.pair_by_key.get(pair_key)
+                if pair is not None and pair.address != pool.address:
+                    # A router has a single pair per token pair, hops would use either pool
+                    raise Exception(
+                        f"Pools {pair.address} and {pool.address} are both the {pool.name} pair of router {pool.router_address}"
+                    )
+                self.pair_by_key[pair_key] = pool
+
+    def call(
+        self,
+        to: str,
+        data: str,
+        reserves_by_pool_address: Dict[str, Tuple[int, ...]],
+        block_number: int,
+    ) -> Tuple[bytes, int]:
+        """Return the encoded output of the call and the gas it used"""
+        to = to.lower()
+        if to == self.printer_address:
+            kind = PRINTER
+        elif to in self.pool_by_address and to in reserves_by_pool_address:
+            kind = self.pool_by_address[to].type
+        else:
+            # No code at that address
+            return b"", CALL_GAS
+        data_bytes = Web3.toBytes(hexstr=data or "0x")
+        function = self.function_by_selector_by_kind[kind].get(data_bytes[:4])
+        if function is None:
+            raise Exception("execution reverted")
+        args = decode_abi(
+            [argument["type"] for argument in function["inputs"]], data_bytes[4:]
+        )
+        if kind == PRINTER:
+            if function["name"] != "arbitrage":
+                raise Exception("execution reverted")
+            gas = self._arbitrage(args, reserves_by_pool_address, block_number)
+            return b"", gas
+        outputs = self._pool_function(
+            function["name"],
+            args,
+            self.pool_by_address[to],
+            reserves_by_pool_address[to],
+            block_number,
+        )
+        return (
+            encode_abi([output["type"] for output in function["outputs"]], outputs),
+            CALL_GAS,
+        )
+
+    def _pool_function(
+        self,
+        name: str,
+        args: Tuple[Any, ...],
+        pool: Pool,
+        reserves: Tuple[int, ...],
+        block_number: int,
+    ) -> List[Any]:
+        token_addresses = [token.address.lower() for token in pool.tokens]
+        if name == "getReserves":
+            # Pairs order their tokens by address
+            if int(token_addresses[0], 16) < int(token_addresses[1], 16):
+                return [reserves[0], reserves[1], block_number]
+            return [reserves[1], reserves[0], block_number]
+        if name in ("token0", "token1"):
+            return [
+                sorted(token_addresses, key=lambda address: int(address, 16))[
+                    0 if name == "token0" else 1
+                ]
+            ]
+        if name in ("getCurrentTokens", "getFinalTokens"):
+            return [token_addresses]
+        if name == "getNumTokens":
+            return [len(token_addresses)]
+        if name == "isPublicSwap":
+            return [True]
+        if name == "getSwapFee":
+            return [reserves[4]]
+        if name in ("getBalance", "getDenormalizedWeight"):
+            token_address = args[0].lower()
+            if token_address not in token_addresses:
+                raise Exception("execution reverted: ERR_NOT_BOUND")
+            offset = 0 if name == "getBalance" else 2
+            return [reserves[offset + token_addresses.index(token_address)]]
+        if name == "calcOutGivenIn":
+            return [calc_out_given_in(*args)]
+        raise Exception("execution reverted")
+
+    def _arbitrage(
+        self,
+        args: Tuple[Any, ...],
+        reserves_by_pool_address: Dict[str, Tuple[int, ...]],
+        block_number: int,
+    ) -> int:
+        (
+            token_paths,
+            min_amount_outs,
+            amount_in,
+            gas_cost,
+            pool_types,
+            max_block_number,
+        ) = args
+        if block_number > max_block_number:
+            raise Exception("execution reverted: Block number too high")
+        amount = amount_in
+        swaps = 0
+        for token_path, min_amount_out, pool_type in zip(
+            token_paths, min_amount_outs, pool_types
+        ):
+            if pool_type == ContractTypeEnum.BPOOL.value:
+                pool_address, token_in_address, token_out_address = [
+                    unmask_address(address) for address in token_path[:3]
+                ]
+                hops = [(self.pool_by_address.get(pool_address), token_in_address)]
+            elif pool_type == ContractTypeEnum.UNISWAP.value:
+                router_address = token_path[-2].lower()
+                num_tokens = int(token_path[-1], 16)
+                token_addresses = [
+                    unmask_address(address) for address in token_path[:num_tokens]
+                ]
+                hops = [
+                    (
+                        self.pair_by_key.get(
+                            (router_address, frozenset([token_in, token_out]))
+                        ),
+                        token_in,
+                    )
+                    for token_in, token_out in zip(token_addresses, token_addresses[1:])
+                ]
+            else:
+                continue
+            for pool, token_in_address in hops:
+                if pool is None:
+                    raise Exception("execution reverted: Pool not found")
+                token_in, token_out = pool.get_token_pair_from_token_in(
+                    token_in_address
+                )
+                amount = create_in_memory_exchange(
+                    pool, reserves_by_pool_address, self.config
+                ).calc_amount_out(token_in, token_out, amount)
+                swaps += 1
+            if amount < min_amount_out:
+                raise Exception("execution reverted: Min amount out not reached")
+        if amount - amount_in < gas_cost:
+            raise Exception("execution reverted: Not profitable")
+        return self.config.get_int("FAKENODE_GAS_BASE") + swaps * self.config.get_int(
+            "FAKENODE_GAS_PER_SWAP"
+        )
+
+    @staticmethod
+    def _pair_key(
+        router_address: str, tokens: List[Token]
+    ) -> Tuple[str, FrozenSet[str]]:
+        return (
+            router_address.lower(),
+            frozenset(token.address.lower() for token in tokens),
+        )
+
+    def _load_functions(self, json_file: str) -> Dict[bytes, Dict[str, Any]]:
+        with open(os.path.join(self.config.get("ABI_PATH"), json_file)) as f:
+            contract_abi = json.load(f)
+        return {
+            function_abi_to_4byte_selector(function): function
+            for function in contract_abi
+            if function.get("type") == "function"
+        }
@@ -0,0 +1,259 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator
+
+from web3 import Web3
+
+from config import Config
+from services.fakenode.chain import FakeChain
+from services.logger.logger import INFO, Logger
+from services.pools.pool import Pool
+from services.profiler.profiler import Profiler
+from services.ttypes.contract import ContractTypeEnum
+from services.ttypes.fakenode import FakeNodeReport
+from services.ttypes.replay import RecordedBlock
+
+
+class FakeNode:
+    """Local stand-in of an Ethereum node serving a pool-state timeline over JSON-RPC (HTTP).
+
+    A block is mined from the timeline every `block_time` seconds, the first one right away.
+    Every method answers after its latency of `latency_ms_by_method` (`default_latency_ms`
+    otherwise) spread by +/- `jitter`, and a batch after the slowest of its calls.
+    The node also answers the subgraph queries of the `PoolLoader` with the pools of the
+    timeline and accepts Slack webhooks, so that strategies run without any remote service.
+    """
+
+    def __init__(
+        self,
+        timeline: Iterator[RecordedBlock],
+        config: Config,
+        block_time: float,
+        latency_ms_by_method: Dict[str, float] = None,
+        default_latency_ms: float = 0.0,
+        jitter: float = 0.0,
+    ) -> None:
+        self.timeline = timeline
+        self.config = config
+        self.block_time = block_time
+        self.latency_ms_by_method = latency_ms_by_method or {}
+        self.default_latency_ms = default_latency_ms
+        self.jitter = jitter
+        self.random = random.Random()
+        self.logger = Logger.instance(self.config)
+        self.profiler = Profiler.instance(self.config)
+        self.report = FakeNodeReport()
+        self.report_lock = threading.Lock()
+        self.chain = FakeChain(self.config, self.report)
+        self.server: ThreadingHTTPServer = None
+        self.method_handlers: Dict[str, Callable] = {
+            "web3_clientVersion": lambda: "FakeNode/v1.0.0",
+            "net_version": lambda: "1",
+            "eth_chainId": lambda: "0x1",
+            "eth_syncing": lambda: False,
+            "eth_blockNumber": lambda: hex(self.chain.latest.number),
+            "eth_gasPrice": lambda: hex(self.chain.latest.gas_price),
+            "eth_getBlockByNumber": self.chain.get_block,
+            "eth_getBlockByHash": self.chain.get_block_by_hash,
+            "eth_call": self._call,
+            "eth_estimateGas": self._estimate_gas,
+            "eth_sendRawTransaction": self._send_raw_transaction,
+            "eth_getTransactionCount": self._get_transaction_count,
+            "eth_getTransactionByHash": self.chain.get_transaction,
+            "eth_getTransactionReceipt": self.chain.get_receipt,
+            "eth_getLogs": self.chain.get_logs,
+            "eth_newFilter": self.chain.new_filter,
+            "eth_getFilterChanges": self.chain.get_filter_changes,
+            "eth_getFilterLogs": self.chain.get_filter_logs,
+            "eth_uninstallFilter": self.chain.uninstall_filter,
+            "txpool_content": self.chain.txpool_content,
+            "txpool_contentFrom": self.chain.txpool_content_from,
+        }
+
+    def run(self, port: int) -> FakeNodeReport:
+        """Mine the timeline until it is exhausted, then keep serving until interrupted"""
+        try:
+            next_block_time = time.time()
+            for recorded_block in self.timeline:
+                block = self.chain.mine(recorded_block)
+                if self.server is None:
+                    self.serve(port)
+                self.logger.info(
+                    f"Block {block.number} mined ({len(block.transactions)} transactions, {len(block.logs)} logs)",
+                    block=block.number,
+                )
+                self.profiler.on_block()
+                next_block_time += self.block_time
+                time.sleep(max(next_block_time - time.time(), 0))
+            self.logger.info("Timeline exhausted, serving the last block")
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        if self.server:
+            self.server.shutdown()
+        return self.report
+
+    def serve(self, port: int) -> None:
+        """Serve JSON-RPC, subgraph and Slack requests from a background thread"""
+        node = self
+
+        class FakeNodeHandler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length))
+                except ValueError:
+                    self.send_error(400)
+                    return
+                path = self.path.split("?")[0]
+                if path.startswith("/subgraphs/"):
+                    response = node.query_subgraph(path, payload.get("query", ""))
+                elif path.startswith("/slack/"):
+                    node.logger.info(
+                        f"Slack {path[len('/slack/'):]}: {payload.get('text')}"
+                    )
+                    response = "ok"
+                else:
+                    response = node.handle(payload)
+                body = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(
+            (self.config.get("FAKENODE_HOST"), port), FakeNodeHandler
+        )
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.logger.info(
+            f"Fake node listening on http://{self.config.get('FAKENODE_HOST')}:{port}"
+        )
+
+    def handle(self, payload: Any) -> Any:
+        """Answer a JSON-RPC request or batch, after the latency of its slowest method"""
+        requests = payload if isinstance(payload, list) else [payload]
+        start_time = time.perf_counter()
+        responses = [self._handle_request(request) for request in requests]
+        latency = max(
+            (self._latency(request.get("method")) for request in requests), default=0
+        )
+        time.sleep(max(latency - (time.perf_counter() - start_time), 0))
+        return responses if isinstance(payload, list) else responses[0]
+
+    def query_subgraph(self, path: str, query: str) -> Dict[str, Any]:
+        """Answer the `PoolLoader` queries with the pools of the timeline
+
+        Every pool has a liquidity of `FAKENODE_POOL_LIQUIDITY_USD`, so that each pool is only
+        returned by the queries whose liquidity range includes it.
+        """
+        liquidity = self.config.get_float("FAKENODE_POOL_LIQUIDITY_USD")
+        lower_bound = re.search(r"_gt:\s*([\d.]+)", query)
+        upper_bound = re.search(r"_lt:\s*([\d.]+)", query)
+        in_range = (
+            lower_bound is None or liquidity > float(lower_bound.group(1))
+        ) and (upper_bound is None or liquidity < float(upper_bound.group(1)))
+        if "balancer" in path:
+            pool_type = ContractTypeEnum.BPOOL
+        elif "sushiswap" in path:
+            pool_type = ContractTypeEnum.SUSHISWAP
+        else:
+            pool_type = ContractTypeEnum.UNISWAP
+        with self.chain.lock:
+            pools = [pool for pool in self.chain.pools if pool.type == pool_type]
+        if not in_range:
+            pools = []
+        if pool_type == ContractTypeEnum.BPOOL:
+            return {
+                "data": {
+                    "pools": [
+                        {
+                            "id": pool.address,
+                            "tokens": [
+                                {
+                                    "address": token.address,
+                                    "decimals": str(token.decimal),
+                                    "symbol": token.name,
+                                }
+                                for token in pool.tokens
+                            ],
+                        }
+                        for pool in pools
+                    ]
+                }
+            }
+        return {"data": {"pairs": [self._subgraph_pair(pool) for pool in pools]}}
+
+    def _handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        method = request.get("method")
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        with self.report_lock:
+            self.report.requests_by_method[method] = (
+                self.report.requests_by_method.get(method, 0) + 1
+            )
+        handler = self.method_handlers.get(method)
+        if handler is None:
+            response["error"] = {
+                "code": -32601,
+                "message": f"the method {method} does not exist/is not available",
+            }
+            return response
+        try:
+            response["result"] = handler(*request.get("params", []))
+        except Exception as e:
+            response["error"] = {"code": -32000, "message": str(e)}
+        return response
+
+    def _latency(self, method: str) -> float:
+        latency_ms = self.latency_ms_by_method.get(method, self.default_latency_ms)
+        return latency_ms * self.random.uniform(1 - self.jitter, 1 + self.jitter) / 1000
+
+    def _call(
+        self, transaction: Dict[str, Any], block_identifier: str = "latest"
+    ) -> str:
+        return Web3.toHex(self.chain.call(transaction, block_identifier))
+
+    def _estimate_gas(
+        self, transaction: Dict[str, Any], block_identifier: str = "latest"
+    ) -> str:
+        return hex(self.chain.estimate_gas(transaction, block_identifier))
+
+    def _send_raw_transaction(self, raw_transaction: str) -> str:
+        tx_hash, block_number, seconds = self.chain.send_raw_transaction(
+            raw_transaction
+        )
+        self.logger.log(
+            INFO,
+            f"Transaction {tx_hash} received {seconds * 1000:.1f} ms after block {block_number}",
+            color="yellow",
+            tx_hash=tx_hash,
+            block=block_number,
+            seconds=seconds,
+        )
+        return tx_hash
+
+    def _get_transaction_count(
+        self, address: str, block_identifier: str = "latest"
+    ) -> str:
+        return hex(self.chain.get_transaction_count(address, block_identifier))
+
+    @staticmethod
+    def _subgraph_pair(pool: Pool) -> Dict[str, Any]:
+        token_0, token_1 = [
+            {
+                "id": token.address,
+                "name": token.name,
+                "symbol": token.name,
+                "decimals": str(token.decimal),
+            }
+            for token in pool.tokens
+        ]
+        return {"id": pool.address, "token0": token_0, "token1": token_1}
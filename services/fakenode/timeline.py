@@ -0,0 +1,29 @@
+import itertools
+from typing import Iterator
+
+from services.benchmark.synthetic import SyntheticPoolGraph
+from services.ttypes.replay import RecordedBlock
+
+GAS_PRICE_VOLATILITY = 0.1
+
+
+def synthetic_timeline(
+    graph: SyntheticPoolGraph, gas_price: int, churn: float
+) -> Iterator[RecordedBlock]:
+    """Endless pool-state timeline: every block moves the reserves of `churn` of the pools.
+
+    Blocks have the shape of the ones written by a `BlockRecorder`, so that a fake node can
+    serve a recording or a synthetic graph alike. Every pool is new in the first block.
+    """
+    for index in itertools.count():
+        if index:
+            graph.churn(churn)
+        yield RecordedBlock(
+            block_number=index,
+            header={},
+            gas_price=int(
+                gas_price * max(1 + graph.random.gauss(0, GAS_PRICE_VOLATILITY), 0.5)
+            ),
+            reserves_by_pool_address=dict(graph.reserves_by_pool_address),
+            new_pools=graph.pools if index == 0 else [],
+        )
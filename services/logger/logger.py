@@ -0,0 +1,141 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from colored import fg, stylize
+
+from config import Config
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+
+
+class Logger:
+    """Structured logger, records are queued and written by a background thread.
+
+    `LOG_FORMAT=json` writes every record as a JSON object with its fields. Records logged with
+    a `sample_key` are limited to `LOG_SAMPLE_BURST` every `LOG_SAMPLE_WINDOW` seconds.
+    """
+
+    _instance: "Logger" = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, config: Config) -> None:
+        self.level = DEBUG if config.debug else INFO
+        self.json = config.get("LOG_FORMAT") == "json"
+        self.sample_burst = config.get_int("LOG_SAMPLE_BURST")
+        self.sample_window = config.get_float("LOG_SAMPLE_WINDOW")
+        # Sample key -> (window start, records let through, records suppressed)
+        self.samples: Dict[str, Tuple[float, int, int]] = {}
+        self._start()
+
+    def _start(self) -> None:
+        self.samples_lock = threading.Lock()
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def instance(cls, config: Config) -> "Logger":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(config)
+                atexit.register(cls._instance.flush)
+            return cls._instance
+
+    @classmethod
+    def _after_fork_in_child(cls) -> None:
+        # The writer thread is not forked
+        cls._instance_lock = threading.Lock()
+        if cls._instance is not None:
+            cls._instance._start()
+
+    def is_enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def debug(self, message: str, **fields: Any) -> None:
+        self.log(DEBUG, message, **fields)
+
+    def info(self, message: str, **fields: Any) -> None:
+        self.log(INFO, message, **fields)
+
+    def warning(self, message: str, **fields: Any) -> None:
+        self.log(WARNING, message, **fields)
+
+    def error(self, message: str, **fields: Any) -> None:
+        self.log(ERROR, message, **fields)
+
+    def log(
+        self,
+        level: int,
+        message: str,
+        color: str = None,
+        sample_key: str = None,
+        **fields: Any,
+    ) -> None:
+        if level < self.level:
+            return
+        if sample_key:
+            suppressed = self._sample(sample_key)
+            if suppressed is None:
+                return
+            if suppressed:
+                message = f"{message} ({suppressed} similar suppressed)"
+                fields["suppressed"] = suppressed
+        if self.json:
+            record = {
+                "ts": round(time.time(), 3),
+                "level": LEVEL_NAMES[level],
+                "msg": message,
+            }
+            record.update(fields)
+            line = json.dumps(record, separators=(",", ":"), default=str)
+        else:
+            line = stylize(message, fg(color)) if color else message
+        self.queue.put(line)
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """Wait for the queued records to be written, at most `timeout` seconds"""
+        written = threading.Event()
+        self.queue.put(written)
+        written.wait(timeout)
+
+    def _sample(self, sample_key: str) -> int:
+        """Return the number of records suppressed since the last one, None to suppress this one"""
+        now = time.time()
+        with self.samples_lock:
+            window_start, count, suppressed = self.samples.get(sample_key, (now, 0, 0))
+            if now - window_start > self.sample_window:
+                window_start, count = now, 0
+            if count >= self.sample_burst:
+                self.samples[sample_key] = (window_start, count, suppressed + 1)
+                return None
+            self.samples[sample_key] = (window_start, count + 1, 0)
+            return suppressed
+
+    def _run(self) -> None:
+        while True:
+            items: List[Any] = [self.queue.get()]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [item for item in items if isinstance(item, str)]
+            if lines:
+                sys.stdout.write("\n".join(lines) + "\n")
+                sys.stdout.flush()
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+
+os.register_at_fork(after_in_child=Logger._after_fork_in_child)
@@ -0,0 +1,159 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from config import Config
+from services.profiler.profiler import Profiler
+
+BLOCK_ARRIVAL = "block_arrival"
+STATE_FETCH = "state_fetch"
+PREFILTER = "prefilter"
+EVALUATION = "evaluation"
+SIMULATION = "simulation"
+OPTIMIZATION = "optimization"
+SAFETY_CHECK = "safety_check"
+SIGNING = "signing"
+BROADCAST = "broadcast"
+BLOCK = "block"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets (upper bounds in seconds), safe across threads"""
+
+    def __init__(self, buckets: List[float]) -> None:
+        self.buckets = buckets
+        # The last count is for the values above every bucket (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self.lock:
+            return list(self.counts), self.sum
+
+
+class Metrics:
+    """Per-stage latency histograms and JSON-RPC call counters, served with `--metrics-port`"""
+
+    _instance: "Metrics" = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.buckets = sorted(
+            float(bucket) for bucket in self.config.get("METRICS_LATENCY_BUCKETS")
+        )
+        self.histogram_by_stage: Dict[str, Histogram] = {}
+        self.rpc_calls_by_method: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.server: ThreadingHTTPServer = None
+
+    @classmethod
+    def instance(cls, config: Config) -> "Metrics":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(config)
+                if config.metrics_port:
+                    cls._instance.serve(config.metrics_port)
+            return cls._instance
+
+    def observe(self, stage: str, seconds: float) -> None:
+        histogram = self.histogram_by_stage.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histogram_by_stage.setdefault(
+                    stage, Histogram(self.buckets)
+                )
+        histogram.observe(max(seconds, 0.0))
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start_time = time.perf_counter()
+        try:
+            with Profiler.instance(self.config).stage(stage):
+                yield
+        finally:
+            self.observe(stage, time.perf_counter() - start_time)
+
+    def count_rpc(self, method: str, calls: int = 1) -> None:
+        with self.lock:
+            self.rpc_calls_by_method[method] = (
+                self.rpc_calls_by_method.get(method, 0) + calls
+            )
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format"""
+        lines = [
+            "# HELP fvc_stage_latency_seconds Latency of each stage of a block",
+            "# TYPE fvc_stage_latency_seconds histogram",
+        ]
+        with self.lock:
+            histogram_by_stage = dict(self.histogram_by_stage)
+            rpc_calls_by_method = dict(self.rpc_calls_by_method)
+        for stage, histogram in sorted(histogram_by_stage.items()):
+            counts, total = histogram.snapshot()
+            cumulative_count = 0
+            for bucket, count in zip(self.buckets + [float("inf")], counts):
+                cumulative_count += count
+                upper_bound = "+Inf" if bucket == float("inf") else repr(bucket)
+                lines.append(
+                    f'fvc_stage_latency_seconds_bucket{{stage="{stage}",le="{upper_bound}"}} {cumulative_count}'
+                )
+            lines.append(f'fvc_stage_latency_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(
+                f'fvc_stage_latency_seconds_count{{stage="{stage}"}} {cumulative_count}'
+            )
+        lines += [
+            "# HELP fvc_rpc_calls_total JSON-RPC calls sent to the node by method",
+            "# TYPE fvc_rpc_calls_total counter",
+        ]
+        for method, calls in sorted(rpc_calls_by_method.items()):
+            lines.append(f'fvc_rpc_calls_total{{method="{method}"}} {calls}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int) -> None:
+        """Serve `/metrics` from a background thread"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(
+            (self.config.get("METRICS_HOST"), port), MetricsHandler
+        )
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def construct_rpc_counter_middleware(metrics: Metrics) -> Callable:
+    """Web3 middleware counting the JSON-RPC calls by method"""
+
+    def rpc_counter_middleware(make_request: Callable, w3: Any) -> Callable:
+        def middleware(method: str, params: Any) -> Any:
+            metrics.count_rpc(method)
+            return make_request(method, params)
+
+        return middleware
+
+    return rpc_counter_middleware
@@ -0,0 +1,135 @@
+import atexit
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple
+
+import requests
+
+from config import Config
+from services.logger.logger import ERROR, Logger
+
+# (destination, text, send function called with the destination and the batched text)
+QueueItem = Tuple[str, str, Callable[[str, str], None]]
+
+
+class NotificationDispatcher:
+    """Send notifications from a background thread so they never delay the strategies.
+
+    Messages wait in a bounded queue that drops the oldest ones when full. Messages to the same
+    destination (webhook, phone number) are sent at most `NOTIFICATION_RATE_LIMIT` times per
+    second; the ones queued in the meantime are batched into a single message. Failed sends are
+    retried with a backoff. Slack webhooks share one pooled HTTP session.
+    """
+
+    _instance: "NotificationDispatcher" = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.logger = Logger.instance(self.config)
+        self.batch_size = self.config.get_int("NOTIFICATION_BATCH_SIZE")
+        self.send_interval = 1 / self.config.get_float("NOTIFICATION_RATE_LIMIT")
+        self.retries = self.config.get_int("NOTIFICATION_RETRIES")
+        self.queue: Deque[QueueItem] = deque(
+            maxlen=self.config.get_int("NOTIFICATION_QUEUE_SIZE")
+        )
+        self.condition = threading.Condition()
+        self.session = requests.Session()
+        self.next_send_time_by_destination: Dict[str, float] = {}
+        self.sending = False
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def instance(cls, config: Config) -> "NotificationDispatcher":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(config)
+                atexit.register(cls._instance.flush)
+            return cls._instance
+
+    def post_slack(self, webhook: str, text: str) -> None:
+        self.put(webhook, text, self._post_slack)
+
+    def put(
+        self, destination: str, text: str, send: Callable[[str, str], None]
+    ) -> None:
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append((destination, text, send))
+            self.condition.notify()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait for the queued notifications to be sent, at most `timeout` seconds"""
+        deadline = time.time() + timeout
+        with self.condition:
+            while (self.queue or self.sending) and time.time() < deadline:
+                self.condition.wait(timeout=0.1)
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                self.sending = False
+                self.condition.notify_all()
+                batch = self._next_batch()
+                if not batch:
+                    continue
+                self.sending = True
+                dropped, self.dropped = self.dropped, 0
+
+            destination, _, send = batch[0]
+            text = "\n\n".join(item_text for _, item_text, _ in batch)
+            self._send(destination, text, send)
+            self.next_send_time_by_destination[destination] = (
+                time.time() + self.send_interval
+            )
+            if dropped:
+                self.logger.log(
+                    ERROR,
+                    f"Notification queue full, dropped {dropped} oldest",
+                    color="red",
+                    dropped=dropped,
+                )
+
+    def _next_batch(self) -> List[QueueItem]:
+        """Pop the messages of the first destination that isn't rate limited, waits otherwise"""
+        if not self.queue:
+            self.condition.wait()
+            return []
+        now = time.time()
+        next_send_times = [
+            self.next_send_time_by_destination.get(destination, 0.0)
+            for destination, _, _ in self.queue
+        ]
+        if min(next_send_times) > now:
+            self.condition.wait(timeout=min(next_send_times) - now)
+            return []
+        destination = self.queue[next_send_times.index(min(next_send_times))][0]
+        batch = [item for item in self.queue if item[0] == destination][
+            : self.batch_size
+        ]
+        for item in batch:
+            self.queue.remove(item)
+        return batch
+
+    def _send(
+        self, destination: str, text: str, send: Callable[[str, str], None]
+    ) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                send(destination, text)
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    self.logger.log(
+                        ERROR, f"Could not send notification {str(e)}", color="red"
+                    )
+                    return
+                time.sleep(0.5 * 2**attempt)
+
+    def _post_slack(self, webhook: str, text: str) -> None:
+        resp = self.session.post(webhook, json={"text": text}, timeout=10)
+        resp.raise_for_status()
@@ -2,6 +2,7 @@ from collections import defaultdict
 from typing import Dict, List
 
 from config import Config
+from services.logger.logger import DEBUG, Logger
 from services.pools.pool import Pool
 from services.pools.token import Token
 from services.ttypes.arbitrage import ArbitragePath, ConnectingPath
@@ -16,6 +17,8 @@ class PathFinder:
             for token in pool.tokens:
                 self.pools_by_token[token.address.lower()].append(pool)
         self.weth_address = self.config.get("WETH_ADDRESS").lower()
+        self.max_step_supported = self.config.get_int("MAX_STEP_SUPPORTED")
+        self.logger = Logger.instance(self.config)
 
     def find_all_paths(self) -> List[ArbitragePath]:
         all_arbitrage_paths: List[ArbitragePath] = []
@@ -45,16 +48,25 @@ class PathFinder:
                     continue
                 all_arbitrage_paths.append(arb_path)
                 existing_paths.add(arb_path.path_id)
-        for path in all_arbitrage_paths:
-            path.print_path()
-        print(
-            f"Out of {self.num_pools} pools (Uniswap/Balancer/Sushiswap), PathFinder detected {len(all_arbitrage_paths)} paths:"
+        # Formatting tens of thousands of paths takes seconds, only do it with --debug
+        if self.logger.is_enabled(DEBUG):
+            for path in all_arbitrage_paths:
+                self.logger.debug(path.path_str)
+        self.logger.info(
+            f"Out of {self.num_pools} pools (Uniswap/Balancer/Sushiswap), PathFinder detected {len(all_arbitrage_paths)} paths",
+            pools=self.num_pools,
+            paths=len(all_arbitrage_paths),
         )
         return all_arbitrage_paths
 
     def find_all_paths_by_token(self) -> Dict[str, Dict[str, ArbitragePath]]:
+        return self.group_paths_by_token(self.find_all_paths())
+
+    @staticmethod
+    def group_paths_by_token(
+        arb_paths: List[ArbitragePath],
+    ) -> Dict[str, Dict[str, ArbitragePath]]:
         paths_by_token_addr: Dict[str, Dict[str, ArbitragePath]] = {}
-        arb_paths = self.find_all_paths()
         for path in arb_paths:
             for token_path in path.connecting_paths:
                 paths_by_token_addr[token_path.token_in.address] = {path.path_id: path}
@@ -65,9 +77,7 @@ class PathFinder:
         self, step: int, token_in: Token, previous_pool: Pool = None
     ) -> List[List[ConnectingPath]]:
         """Given a Token in, find all connecting paths from the list of all Pools avaivable"""
-        if token_in.address == self.weth_address or step > self.config.get_int(
-            "MAX_STEP_SUPPORTED"
-        ):
+        if token_in.address == self.weth_address or step > self.max_step_supported:
             # Means that we're already returning a WETH or we're about `MAX_STEP_SUPPORTED`
             return []
         all_connecting_paths: List[List[ConnectingPath]] = []
@@ -75,7 +85,7 @@ class PathFinder:
         for pool in self.pools_by_token[token_in.address]:
             _, token_out = pool.get_token_pair_from_token_in(token_in.address)
             if (previous_pool and pool.address == previous_pool.address) or (
-                step == self.config.get_int("MAX_STEP_SUPPORTED")
+                step == self.max_step_supported
                 and token_out.address != self.weth_address
             ):
                 continue
@@ -93,10 +103,7 @@ class PathFinder:
                 connecting_paths,
             )
 
-        if (
-            step == self.config.get_int("MAX_STEP_SUPPORTED")
-            and end_weth_path_found is False
-        ):
+        if step == self.max_step_supported and end_weth_path_found is False:
             return None
         return all_connecting_paths
 
@@ -113,12 +120,7 @@ class PathFinder:
     def _safety_checks(self, step: int, token_in: Token, token_out: Token) -> None:
         if step == 1 and token_in.address != self.weth_address:
             raise Exception("Only support entry with WETH")
-        if (
-            step == self.config.get_int("MAX_STEP_SUPPORTED")
-            and token_out.address != self.weth_address
-        ):
+        if step == self.max_step_supported and token_out.address != self.weth_address:
             raise Exception("Last step should always result in WETH")
-        if step > self.config.get_int("MAX_STEP_SUPPORTED"):
-            raise Exception(
-                f"We only supporte {self.config.get_int('MAX_STEP_SUPPORTED')} steps"
-            )
+        if step > self.max_step_supported:
+            raise Exception(f"We only supporte {self.max_step_supported} steps")
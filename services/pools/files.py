@@ -0,0 +1,77 @@
+import os
+from typing import Dict, Sequence, Set
+
+from config import Config
+from services.logger.logger import Logger
+from services.pools.loader import PoolLoader
+from services.ttypes.pools import PoolsUpdate
+
+
+class PoolFilesWatcher:
+    """Watch the YAML files read by `PoolLoader`: pools, tokens, blacklist and auto-blacklist.
+
+    `changed_paths` only compares modification times so it can be called every block, `load`
+    reads and validates the files. A change is consumed by `load` even if a file is invalid,
+    it is loaded again once the file is fixed.
+    """
+
+    def __init__(self, config: Config, extra_paths: Sequence[str] = ()) -> None:
+        self.config = config
+        self.logger = Logger.instance(self.config)
+        self.pool_loader = PoolLoader(config=config)
+        self.paths = [
+            self.config.get("POOL_YAML_PATH"),
+            self.config.get("TOKEN_YAML_PATH"),
+            self.config.get("TOKEN_BLACKLIST_YAML_PATH"),
+            self.config.get("AUTO_BLACKLIST_YAML_PATH"),
+        ] + list(extra_paths)
+        self.mtime_by_path = self._mtimes()
+        self.pool_addresses: Set[str] = set()
+        self.blacklist_addresses: Set[str] = set()
+        try:
+            self.pool_addresses = {
+                pool.address for pool in self.pool_loader.load_pools_yaml()
+            }
+            self.blacklist_addresses = self.pool_loader.load_blacklist_addresses()
+        except Exception:
+            # Reported when the pools are loaded
+            pass
+
+    def changed_paths(self) -> Set[str]:
+        mtime_by_path = self._mtimes()
+        return {
+            path
+            for path, mtime in mtime_by_path.items()
+            if mtime != self.mtime_by_path.get(path)
+        }
+
+    def load(self) -> PoolsUpdate:
+        """Read the pool files, raising if one of them is invalid"""
+        self.mtime_by_path = self._mtimes()
+        pools = self.pool_loader.load_pools_yaml()
+        blacklist_addresses = self.pool_loader.load_blacklist_addresses()
+        pool_addresses = {pool.address for pool in pools}
+        update = PoolsUpdate(
+            pools=pools,
+            removed_pool_addresses=self.pool_addresses - pool_addresses,
+            blacklist_addresses=blacklist_addresses,
+        )
+        self.logger.info(
+            f"Pool files changed: {len(pool_addresses - self.pool_addresses)} pools added, "
+            f"{len(update.removed_pool_addresses)} pools removed, "
+            f"{len(blacklist_addresses - self.blacklist_addresses)} tokens blacklisted, "
+            f"{len(self.blacklist_addresses - blacklist_addresses)} tokens unblacklisted"
+        )
+        self.pool_addresses = pool_addresses
+        self.blacklist_addresses = blacklist_addresses
+        return update
+
+    def _mtimes(self) -> Dict[str, float]:
+        mtime_by_path: Dict[str, float] = {}
+        for path in self.paths:
+            try:
+                mtime_by_path[path] = os.stat(path).st_mtime
+            except OSError:
+                # The auto-blacklist only exists once a token was blacklisted
+                mtime_by_path[path] = None
+        return mtime_by_path
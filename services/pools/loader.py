@@ -1,21 +1,27 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Set
+import os
+import re
 
 import requests
 import yaml
-import sys
 
 from config import Config
+from services.logger.logger import Logger
 from services.pools.pool import Pool
 from services.pools.token import Token
+from services.ttypes.contract import ContractTypeEnum
+from services.ttypes.pools import PoolsUpdate
+
+ADDRESS_PATTERN = re.compile("^0x[0-9a-fA-F]{40}$")
 
 
 class PoolLoader:
     def __init__(self, config: Config):
         self.config = config
+        self.logger = Logger.instance(self.config)
 
     def load_all_pools(self) -> List[Pool]:
-        print("Loading Uniswap, Balancer, SushiSwap and others pools ...")
-        sys.stdout.flush()
+        self.logger.info("Loading Uniswap, Balancer, SushiSwap and others pools ...")
 
         if self.config.kovan:
             return self._load_pools_yaml()
@@ -39,7 +45,7 @@ class PoolLoader:
             ]
         )
 
-        for (min_liq, max_liq) in min_max_liq:
+        for min_liq, max_liq in min_max_liq:
             uniswap_pools += self._load_uniswap_pools(min_liq, max_liq)
             balancer_pools += self._load_balancer_pools(min_liq, max_liq)
         sushiswap_pools = []  # self._load_sushiswap_pools()
@@ -50,6 +56,37 @@ class PoolLoader:
         pools_without_blacklist = self._filter_blacklist_pools(pools_with_only_tokens)
         return pools_without_blacklist
 
+    def load_pools_yaml(self) -> List[Pool]:
+        """Pools of pools.yaml, raising if it or tokens.yaml is invalid"""
+        return self._load_pools_yaml()
+
+    def load_blacklist_addresses(self) -> Set[str]:
+        """Lower case addresses of the blacklisted tokens, auto-blacklisted ones included"""
+        blacklist_tokens = self._load_tokens_yaml(
+            self.config.get("TOKEN_BLACKLIST_YAML_PATH")
+        )
+        # Tokens whose paths kept reverting, see SafetyCheckCache
+        if os.path.exists(self.config.get("AUTO_BLACKLIST_YAML_PATH")):
+            blacklist_tokens += self._load_tokens_yaml(
+                self.config.get("AUTO_BLACKLIST_YAML_PATH")
+            )
+        return {token.address.lower() for token in blacklist_tokens}
+
+    def apply_update(self, pools: List[Pool], update: PoolsUpdate) -> List[Pool]:
+        """Return `pools` with the pools of the YAML files as they are in `update`"""
+        if self.config.kovan:
+            return update.pools
+        yaml_pool_addresses = {pool.address for pool in update.pools}
+        updated_pools = [
+            pool
+            for pool in pools
+            if pool.address not in update.removed_pool_addresses
+            and pool.address not in yaml_pool_addresses
+        ] + update.pools
+        return self._filter_blacklist_pools(
+            self._filter_only_tokens(updated_pools), update.blacklist_addresses
+        )
+
     def _filter_only_tokens(self, pools: List[Pool]) -> List[Pool]:
         if not self.config.only_tokens:
             return pools
@@ -61,11 +98,11 @@ class PoolLoader:
                     continue
         return filtered_pools
 
-    def _filter_blacklist_pools(self, pools: List[Pool]) -> List[Pool]:
-        blacklist_tokens = self._load_tokens_yaml(
-            self.config.get("TOKEN_BLACKLIST_YAML_PATH")
-        )
-        blacklist_addresses = [token.address.lower() for token in blacklist_tokens]
+    def _filter_blacklist_pools(
+        self, pools: List[Pool], blacklist_addresses: Set[str] = None
+    ) -> List[Pool]:
+        if blacklist_addresses is None:
+            blacklist_addresses = self.load_blacklist_addresses()
 
         filtered_pools: List[Pool] = []
         for pool in pools:
@@ -107,7 +144,7 @@ class PoolLoader:
                 }}
             }}
         """
-        url = "https://api.thegraph.com/subgraphs/name/uniswap/uniswap-v2"
+        url = self.config.get("UNISWAP_SUBGRAPH_URI")
         resp = requests.post(url, json={"query": query})
         pairs = resp.json()["data"]["pairs"]
         pools: List[Pool] = []
@@ -157,7 +194,7 @@ class PoolLoader:
             }}
         }}
         """
-        url = "https://api.thegraph.com/subgraphs/name/dmihal/sushiswap"
+        url = self.config.get("SUSHISWAP_SUBGRAPH_URI")
         resp = requests.post(url, json={"query": query})
         pairs = resp.json()["data"]["pairs"]
         pools: List[Pool] = []
@@ -211,7 +248,7 @@ class PoolLoader:
                 }}
             }}
         """
-        url = "https://api.thegraph.com/subgraphs/name/balancer-labs/balancer"
+        url = self.config.get("BALANCER_SUBGRAPH_URI")
         resp = requests.post(url, json={"query": query})
         pairs = resp.json()["data"]["pools"]
         pools: List[Pool] = []
@@ -238,36 +275,81 @@ class PoolLoader:
         return pools
 
     def _load_pools_yaml(self) -> List[Pool]:
+        pool_path = self.config.get("POOL_YAML_PATH")
         tokens = self._load_tokens_yaml(self.config.get("TOKEN_YAML_PATH"))
         token_by_name: Dict[str, Token] = {token.name: token for token in tokens}
         pools: List[Pool] = []
-        with open(self.config.get("POOL_YAML_PATH"), "r") as stream:
-            pools_dict = yaml.safe_load(stream)
-            if pools_dict["pools"]:
-                for pool_yaml in pools_dict["pools"]:
-                    pool_tokens = [
-                        token_by_name[token_name] for token_name in pool_yaml["tokens"]
-                    ]
-                    pool = Pool(
-                        name=pool_yaml["name"],
-                        pool_type=pool_yaml["type"],
-                        address=pool_yaml["address"],
-                        tokens=pool_tokens,
+        for index, pool_yaml in enumerate(self._read_yaml_list(pool_path, "pools")):
+            self._check_yaml_entry(
+                pool_path, index, pool_yaml, ["name", "type", "address", "tokens"]
+            )
+            if pool_yaml["type"] not in ContractTypeEnum.__members__:
+                raise Exception(
+                    f"{pool_path}: pool {pool_yaml['name']} has an unknown type {pool_yaml['type']}"
+                )
+            if (
+                not isinstance(pool_yaml["tokens"], list)
+                or len(pool_yaml["tokens"]) != 2
+            ):
+                raise Exception(
+                    f"{pool_path}: pool {pool_yaml['name']} has to list 2 tokens"
+                )
+            for token_name in pool_yaml["tokens"]:
+                if token_name not in token_by_name:
+                    raise Exception(
+                        f"{pool_path}: token {token_name} of pool {pool_yaml['name']} is not in tokens.yaml"
                     )
-                    pools.append(pool)
+            pool_tokens = [
+                token_by_name[token_name] for token_name in pool_yaml["tokens"]
+            ]
+            pool = Pool(
+                name=pool_yaml["name"],
+                pool_type=pool_yaml["type"],
+                address=pool_yaml["address"],
+                tokens=pool_tokens,
+            )
+            pools.append(pool)
 
         return pools
 
     def _load_tokens_yaml(self, token_path: str) -> List[Token]:
         tokens: List[Token] = []
-        with open(token_path, "r") as stream:
-            token_dict = yaml.safe_load(stream)
-            if token_dict["tokens"]:
-                for token_yaml in token_dict["tokens"]:
-                    token = Token(
-                        name=token_yaml["name"],
-                        address=token_yaml["address"],
-                        decimal=token_yaml["decimal"],
-                    )
-                    tokens.append(token)
+        for index, token_yaml in enumerate(self._read_yaml_list(token_path, "tokens")):
+            self._check_yaml_entry(
+                token_path, index, token_yaml, ["name", "address", "decimal"]
+            )
+            if not isinstance(token_yaml["decimal"], int):
+                raise Exception(
+                    f"{token_path}: token {token_yaml['name']} has an invalid decimal {token_yaml['decimal']}"
+                )
+            token = Token(
+                name=token_yaml["name"],
+                address=token_yaml["address"],
+                decimal=token_yaml["decimal"],
+            )
+            tokens.append(token)
         return tokens
+
+    def _read_yaml_list(self, path: str, key: str) -> List[Any]:
+        with open(path, "r") as stream:
+            content = yaml.safe_load(stream)
+        if not isinstance(content, dict) or key not in content:
+            raise Exception(f"{path}: missing `{key}` list")
+        if content[key] is None:
+            return []
+        if not isinstance(content[key], list):
+            raise Exception(f"{path}: `{key}` has to be a list")
+        return content[key]
+
+    def _check_yaml_entry(
+        self, path: str, index: int, entry: Any, keys: List[str]
+    ) -> None:
+        if not isinstance(entry, dict):
+            raise Exception(f"{path}: entry {index} is not a mapping")
+        missing_keys = [key for key in keys if key not in entry]
+        if missing_keys:
+            raise Exception(f"{path}: entry {index} misses {', '.join(missing_keys)}")
+        if not ADDRESS_PATTERN.match(str(entry["address"])):
+            raise Exception(
+                f"{path}: {entry.get('name', index)} has an invalid address {entry['address']}"
+            )
@@ -1,14 +1,33 @@
-from colored import fg, stylize
-from web3.exceptions import TimeExhausted
-import sys
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from config import Config
 from services.ethereum.ethereum import Ethereum
+from services.logger.logger import INFO, Logger
+from services.metrics.metrics import BROADCAST, SIGNING, Metrics
 from services.notifications.notifications import Notification
+from services.profiler.profiler import Profiler
 from services.ttypes.arbitrage import ArbitragePath
 from services.ttypes.strategy import StrategyEnum
 
 
+def rank_by_net_profit(
+    arbitrage_paths: List[ArbitragePath], gas_used_by_path_id: Dict[str, int]
+) -> List[Tuple[ArbitragePath, int]]:
+    """Paths with a gas estimate and their net profit in Wei, most profitable first"""
+    ranked_paths = [
+        (
+            arbitrage_path,
+            arbitrage_path.max_arbitrage_amount_wei
+            - gas_used_by_path_id[arbitrage_path.path_id] * arbitrage_path.gas_price,
+        )
+        for arbitrage_path in arbitrage_paths
+        if arbitrage_path.path_id in gas_used_by_path_id
+    ]
+    return sorted(ranked_paths, key=lambda ranked_path: ranked_path[1], reverse=True)
+
+
 class PrinterContract:
     def __init__(
         self,
@@ -24,111 +43,165 @@ class PrinterContract:
         self.notification = notification
         self.executor_address = self.config.get("EXECUTOR_ADDRESS")
         self.consecutive = consecutive
+        self.logger = Logger.instance(self.config)
+        self.metrics = Metrics.instance(self.config)
+        self.profiler = Profiler.instance(self.config)
+        if self.config.send_tx:
+            self.ethereum.nonce_manager.reconcile()
 
-    def arbitrage_on_chain(
+    def print_best(
         self,
-        arbitrage_path: ArbitragePath,
+        arbitrage_paths: List[ArbitragePath],
+        gas_estimates: Dict[str, Union[int, str]],
         latest_block: int,
         tx_hash: str = "",
-    ) -> bool:
-        """Return True if arbitrage is/would have been successful on-chain, False otherwise"""
-        if self._safety_send(arbitrage_path) and self._validate_transactions(
-            arbitrage_path
+    ) -> Optional[ArbitragePath]:
+        """Rank the paths that passed `estimateGas` by net profit and print the best valid one
+        `gas_estimates` holds the gas used, or the error, by path id. Paths using the pools of a
+        transaction still in flight are passed over. Return the printed path if any.
+        """
+        gas_used_by_path_id: Dict[str, int] = {}
+        for arbitrage_path in arbitrage_paths:
+            gas_estimate = gas_estimates.get(arbitrage_path.path_id)
+            if isinstance(gas_estimate, int):
+                arbitrage_path.consecutive_arbs += 1
+                gas_used_by_path_id[arbitrage_path.path_id] = gas_estimate
+            else:
+                self.logger.info(
+                    f"This transaction would not go through: {gas_estimate}",
+                    path_id=arbitrage_path.path_id,
+                )
+                arbitrage_path.consecutive_arbs = 0
+                self._print_estimate_gas_failed(arbitrage_path, latest_block, tx_hash)
+
+        for arbitrage_path, _ in rank_by_net_profit(
+            arbitrage_paths, gas_used_by_path_id
         ):
+            if not self._validate_transactions(arbitrage_path):
+                self._print_estimate_gas_failed(arbitrage_path, latest_block, tx_hash)
+                continue
+            if self.config.send_tx and self.ethereum.tx_manager.conflicts(
+                arbitrage_path.pool_addresses
+            ):
+                self.logger.log(
+                    INFO,
+                    f"A transaction using the same pools is still in flight, skipping {arbitrage_path.path_str}",
+                    color="yellow",
+                    path_id=arbitrage_path.path_id,
+                )
+                continue
             self._display_arbitrage(arbitrage_path, latest_block, tx_hash)
             if self.config.send_tx:
-                self._send_transaction_on_chain(arbitrage_path)
-            return True
-        else:
-            print(
-                stylize(
-                    f"Estimate Gas Failed {arbitrage_path.print(latest_block, tx_hash)}",
-                    fg("light_red"),
-                )
+                self._send_transaction_on_chain(arbitrage_path, latest_block)
+            return arbitrage_path
+        return None
+
+    def estimate_gas_call(self, arbitrage_path: ArbitragePath) -> Dict[str, str]:
+        """Return the `eth_estimateGas` transaction of `arbitrage_path`, to batch JSON-RPC calls"""
+        return {
+            "from": self.executor_address,
+            "to": self.contract.address,
+            "data": self.contract.encodeABI(
+                fn_name="arbitrage", args=self._arbitrage_args(arbitrage_path)
+            ),
+        }
+
+    def estimate_gas_all(
+        self, arbitrage_paths: List[ArbitragePath], executor: Executor = None
+    ) -> Dict[str, Union[int, str]]:
+        """Run `estimateGas` for every path, concurrently with `executor`
+        This simulates sending the transactions on-chain and let us know if they would go through.
+        Return the gas used, or the error, by path id.
+        """
+        map_function = executor.map if executor else map
+        return {
+            arbitrage_path.path_id: gas_estimate
+            for arbitrage_path, gas_estimate in zip(
+                arbitrage_paths, map_function(self._try_estimate_gas, arbitrage_paths)
             )
-            sys.stdout.flush()
-        return False
+        }
 
-    def _safety_send(self, arbitrage_path: ArbitragePath) -> bool:
-        """This function will simulate sending the transaction on-chain and let us know if it would go through"""
+    def _try_estimate_gas(self, arbitrage_path: ArbitragePath) -> Union[int, str]:
         try:
-            # Run estimateGas to see if the transaction would go through
-            self.contract.functions.arbitrage(
-                arbitrage_path.token_paths,
-                arbitrage_path.all_min_amount_out_wei_grouped,
-                arbitrage_path.optimal_amount_in_wei,
-                arbitrage_path.gas_price_execution,
-                arbitrage_path.pool_types,
-                arbitrage_path.max_block_height,
+            return self.contract.functions.arbitrage(
+                *self._arbitrage_args(arbitrage_path)
             ).estimateGas({"from": self.executor_address})
-            arbitrage_path.consecutive_arbs += 1
-            return True
         except Exception as e:
-            print(f"This transaction would not go through: {str(e)}")
-            sys.stdout.flush()
-            arbitrage_path.consecutive_arbs = 0
-            return False
+            return str(e)
+
+    def _arbitrage_args(self, arbitrage_path: ArbitragePath) -> List[Any]:
+        return [
+            arbitrage_path.token_paths,
+            arbitrage_path.all_min_amount_out_wei_grouped,
+            arbitrage_path.optimal_amount_in_wei,
+            arbitrage_path.gas_price_execution,
+            arbitrage_path.pool_types,
+            arbitrage_path.max_block_height,
+        ]
+
+    def _print_estimate_gas_failed(
+        self, arbitrage_path: ArbitragePath, latest_block: int, tx_hash: str
+    ) -> None:
+        self.logger.log(
+            INFO,
+            f"Estimate Gas Failed {arbitrage_path.print(latest_block, tx_hash)}",
+            color="light_red",
+            path_id=arbitrage_path.path_id,
+        )
 
-    def _send_transaction_on_chain(self, arbitrage_path: ArbitragePath) -> None:
-        """Trigger the arbitrage transaction on-chain"""
+    def _send_transaction_on_chain(
+        self, arbitrage_path: ArbitragePath, latest_block: int
+    ) -> None:
+        """Trigger the arbitrage transaction on-chain, the receipt is tracked in the background"""
         if arbitrage_path.consecutive_arbs < self.consecutive:
             return
 
         try:
             arbitrage_path.consecutive_arbs = 0
             tx_hash = self._building_tx_and_signing_and_send(arbitrage_path)
-            receipt = self.ethereum.w3.eth.waitForTransactionReceipt(tx_hash)
-            etherscan_url = (
-                "https://kovan.etherscan.io/"
-                if self.config.kovan
-                else "https://etherscan.io"
-            )
-            tx_hash_url = f"{etherscan_url}/tx/{tx_hash}"
-            if receipt["status"] == 1:
-                self.notification.send_slack_printing_tx(tx_hash_url, success=True)
-                self.notification.send_twilio(f"Brrrrrr: {tx_hash_url}")
-            else:
-                self.notification.send_slack_printing_tx(tx_hash_url, success=False)
-        except TimeExhausted as e:
-            self.notification.send_slack_errors(
-                f"Transaction failed {tx_hash_url}: {str(e)}"
+            self.ethereum.tx_manager.track(
+                tx_hash,
+                arbitrage_path.path_id,
+                arbitrage_path.pool_addresses,
+                latest_block,
             )
         except Exception as e:
             self.notification.send_slack_errors(f"Exception: {str(e)}")
+            try:
+                # The nonce might not have been used
+                self.ethereum.nonce_manager.reconcile(dropped=True)
+            except Exception as e:
+                self.notification.send_slack_errors(f"Nonce reconcile failed: {str(e)}")
 
     def _building_tx_and_signing_and_send(
         self,
         arbitrage_path: ArbitragePath,
     ) -> str:
         """Helper function to build the transaction and signed it with priv key"""
-        unsigned_tx = self.contract.functions.arbitrage(
-            arbitrage_path.token_paths,
-            arbitrage_path.all_min_amount_out_wei_grouped,
-            arbitrage_path.optimal_amount_in_wei,
-            arbitrage_path.gas_price_execution,
-            arbitrage_path.pool_types,
-            arbitrage_path.max_block_height,
-        ).buildTransaction(
-            {
-                "chainId": 42 if self.config.kovan else 1,
-                "gas": self.config.get_int("ESTIMATE_GAS_LIMIT"),
-                "gasPrice": int(arbitrage_path.gas_price),
-                "nonce": self.ethereum.w3.eth.getTransactionCount(
-                    self.executor_address
-                ),
-            }
-        )
-        signed_tx = self.ethereum.w3.eth.account.sign_transaction(
-            unsigned_tx, self.config.get("MY_SOCKS")
-        )
-        tx_hash = self.ethereum.w3.eth.sendRawTransaction(signed_tx.rawTransaction)
-        print(
-            stylize(
-                f"Sending transaction {tx_hash.hex()} ...",
-                fg("yellow"),
+        signing_start_time = time.perf_counter()
+        with self.profiler.stage(SIGNING):
+            unsigned_tx = self.contract.functions.arbitrage(
+                *self._arbitrage_args(arbitrage_path)
+            ).buildTransaction(
+                {
+                    "chainId": 42 if self.config.kovan else 1,
+                    "gas": self.config.get_int("ESTIMATE_GAS_LIMIT"),
+                    "gasPrice": int(arbitrage_path.gas_price),
+                    "nonce": self.ethereum.nonce_manager.next_nonce(),
+                }
             )
+            signed_tx = self.ethereum.w3.eth.account.sign_transaction(
+                unsigned_tx, self.config.get("MY_SOCKS")
+            )
+        self.metrics.observe(SIGNING, time.perf_counter() - signing_start_time)
+        with self.metrics.time(BROADCAST):
+            tx_hash = self.ethereum.w3.eth.sendRawTransaction(signed_tx.rawTransaction)
+        self.logger.log(
+            INFO,
+            f"Sending transaction {tx_hash.hex()} ...",
+            color="yellow",
+            tx_hash=tx_hash.hex(),
         )
-        sys.stdout.flush()
         return tx_hash.hex()
 
     def _validate_transactions(
@@ -161,8 +234,15 @@ class PrinterContract:
         tx_hash: str = "",
     ) -> None:
         to_print = arbitrage_path.print(latest_block, tx_hash)
-        print(stylize(to_print, fg("light_blue")))
-        sys.stdout.flush()
+        self.logger.log(
+            INFO,
+            to_print,
+            color="light_blue",
+            path_id=arbitrage_path.path_id,
+            block=latest_block,
+            profit_wei=arbitrage_path.max_arbitrage_amount_wei,
+            amount_in_wei=arbitrage_path.optimal_amount_in_wei,
+        )
         self.notification.send_slack_arbitrage(to_print)
 
         # if arbitrage_path.consecutive_arbs >= self.consecutive:
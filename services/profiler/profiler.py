@@ -0,0 +1,243 @@
+import atexit
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from types import CodeType
+from typing import Any, Dict, Iterator, List, Tuple
+
+from config import THIS_DIR, Config
+from services.logger.logger import Logger
+
+NO_STAGE = "other"
+# Untagged threads that used less than this share of the interval in CPU time are idle
+IDLE_STAGE = "idle"
+IDLE_CPU_SHARE = 0.1
+
+
+class Profiler:
+    """Sampling profiler of every thread, with samples tagged by block stage.
+
+    A session lasts the first `--profile N` blocks, or from one SIGUSR1 to the next, and writes
+    collapsed stacks and a per-function summary to `PROFILER_PATH`.
+    """
+
+    _instance: "Profiler" = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.logger = Logger.instance(self.config)
+        self.pid = os.getpid()
+        self.session_blocks = self.config.profile_blocks
+        self.interval = self.config.get_float("PROFILER_INTERVAL")
+        self.max_depth = self.config.get_int("PROFILER_MAX_DEPTH")
+        self.stage_by_thread_id: Dict[int, str] = {}
+        self.label_by_code: Dict[CodeType, str] = {}
+        self.cpu_time_by_thread_id: Dict[int, float] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread = None
+        self.active = False
+        self.blocks_left: int = None
+        self.started_at: float = None
+        self.samples = 0
+        # Samples by (stage, outermost frame, ..., innermost frame)
+        self.samples_by_stack: Dict[Tuple[str, ...], int] = {}
+
+    @classmethod
+    def instance(cls, config: Config) -> "Profiler":
+        """Create it from the main thread, to handle SIGUSR1"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(config)
+                if config.profile_blocks is not None:
+                    if threading.current_thread() is threading.main_thread():
+                        signal.signal(signal.SIGUSR1, cls._instance._on_signal)
+                    atexit.register(cls._instance.stop)
+                    if config.profile_blocks:
+                        cls._instance.start()
+            return cls._instance
+
+    @classmethod
+    def _after_fork_in_child(cls) -> None:
+        # The sampling thread is not forked, the child starts its own sessions
+        cls._instance_lock = threading.Lock()
+        if cls._instance is not None:
+            cls._instance.lock = threading.Lock()
+            cls._instance.stop_event = threading.Event()
+            cls._instance.thread = None
+            cls._instance.active = False
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """Tag the samples of the current thread with `stage`"""
+        thread_id = threading.get_ident()
+        previous_stage = self.stage_by_thread_id.get(thread_id)
+        self.stage_by_thread_id[thread_id] = stage
+        try:
+            yield
+        finally:
+            if previous_stage is None:
+                self.stage_by_thread_id.pop(thread_id, None)
+            else:
+                self.stage_by_thread_id[thread_id] = previous_stage
+
+    def start(self) -> None:
+        with self.lock:
+            if self.active:
+                return
+            self.active = True
+            self.blocks_left = self.session_blocks or None
+            self.started_at = time.time()
+            self.samples = 0
+            self.samples_by_stack = {}
+            self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self._sample_loop, name="profiler", daemon=True
+        )
+        self.thread.start()
+        self.logger.info(
+            f"Profiling {f'{self.blocks_left} blocks' if self.blocks_left else 'until SIGUSR1'}"
+        )
+
+    def on_block(self) -> None:
+        """Count a processed block, the session ends after `--profile` blocks"""
+        if not self.active or self.blocks_left is None:
+            return
+        with self.lock:
+            self.blocks_left -= 1
+            done = self.blocks_left <= 0
+        if done:
+            self.stop()
+
+    def stop(self) -> None:
+        with self.lock:
+            if not self.active:
+                return
+            self.active = False
+        self.stop_event.set()
+        self.thread.join()
+        self._write()
+
+    def _on_signal(self, signum: int, frame: Any) -> None:
+        # Not from the handler itself, the interrupted code might hold the lock
+        threading.Thread(
+            target=self.stop if self.active else self.start, daemon=True
+        ).start()
+
+    def _sample_loop(self) -> None:
+        own_thread_id = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            frame_by_thread_id = sys._current_frames()
+            with self.lock:
+                for thread_id, frame in frame_by_thread_id.items():
+                    if thread_id == own_thread_id:
+                        continue
+                    stage = self.stage_by_thread_id.get(thread_id)
+                    if stage is None:
+                        stage = IDLE_STAGE if self._is_idle(thread_id) else NO_STAGE
+                    labels: List[str] = []
+                    while frame is not None and len(labels) < self.max_depth:
+                        labels.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    labels.append(stage)
+                    stack = tuple(reversed(labels))
+                    self.samples_by_stack[stack] = (
+                        self.samples_by_stack.get(stack, 0) + 1
+                    )
+                self.samples += 1
+
+    def _is_idle(self, thread_id: int) -> bool:
+        try:
+            cpu_time = time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+        except (AttributeError, OSError):
+            # No per-thread CPU clock on this platform, or the thread just ended
+            return False
+        previous_cpu_time = self.cpu_time_by_thread_id.get(thread_id)
+        self.cpu_time_by_thread_id[thread_id] = cpu_time
+        return (
+            previous_cpu_time is not None
+            and cpu_time - previous_cpu_time < self.interval * IDLE_CPU_SHARE
+        )
+
+    def _label(self, code: CodeType) -> str:
+        label = self.label_by_code.get(code)
+        if label is None:
+            file_name = code.co_filename
+            if file_name.startswith(THIS_DIR):
+                file_name = os.path.relpath(file_name, THIS_DIR)
+            elif "site-packages" in file_name:
+                file_name = file_name.split("site-packages" + os.sep)[-1]
+            else:
+                file_name = os.path.basename(file_name)
+            label = f"{code.co_name} ({file_name}:{code.co_firstlineno})".replace(
+                ";", ","
+            )
+            self.label_by_code[code] = label
+        return label
+
+    def _write(self) -> None:
+        directory = self.config.get("PROFILER_PATH")
+        os.makedirs(directory, exist_ok=True)
+        name = "%s-%s" % (
+            self.config.strategy.name.lower() if self.config.strategy else "profile",
+            time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at)),
+        )
+        if os.getpid() != self.pid:
+            name = f"{name}-{os.getpid()}"
+        collapsed_path = os.path.join(directory, f"{name}.collapsed")
+        with open(collapsed_path, "w") as stream:
+            for stack, count in sorted(self.samples_by_stack.items()):
+                stream.write(f"{';'.join(stack)} {count}\n")
+        summary_path = os.path.join(directory, f"{name}.txt")
+        with open(summary_path, "w") as stream:
+            stream.write(self._summary())
+        self.logger.info(
+            f"Profile of {self.samples} samples written to {collapsed_path} and {summary_path}",
+            samples=self.samples,
+        )
+
+    def _summary(self) -> str:
+        total_samples = sum(self.samples_by_stack.values()) or 1
+        samples_by_stage: Dict[str, int] = {}
+        self_samples_by_label: Dict[str, int] = {}
+        total_samples_by_label: Dict[str, int] = {}
+        for stack, count in self.samples_by_stack.items():
+            stage, frames = stack[0], stack[1:]
+            samples_by_stage[stage] = samples_by_stage.get(stage, 0) + count
+            if stage == IDLE_STAGE:
+                continue
+            if frames:
+                self_samples_by_label[frames[-1]] = (
+                    self_samples_by_label.get(frames[-1], 0) + count
+                )
+            for label in set(frames):
+                total_samples_by_label[label] = (
+                    total_samples_by_label.get(label, 0) + count
+                )
+        lines = [
+            f"Samples: {self.samples} every {self.interval} s over {time.time() - self.started_at:.1f} s "
+            f"({total_samples} thread stacks)",
+            "",
+            f"{'Stage':<20} {'Samples':>10} {'%':>7}",
+        ]
+        for stage, count in sorted(samples_by_stage.items(), key=lambda item: -item[1]):
+            lines.append(f"{stage:<20} {count:>10} {count / total_samples:>7.1%}")
+        # Functions of the busy threads only
+        total_samples = (total_samples - samples_by_stage.get(IDLE_STAGE, 0)) or 1
+        lines += ["", f"{'Self':>10} {'%':>7} {'Total':>10} {'%':>7}  Function"]
+        for label, count in sorted(
+            total_samples_by_label.items(), key=lambda item: -item[1]
+        )[: self.config.get_int("PROFILER_SUMMARY_FUNCTIONS")]:
+            self_count = self_samples_by_label.get(label, 0)
+            lines.append(
+                f"{self_count:>10} {self_count / total_samples:>7.1%} "
+                f"{count:>10} {count / total_samples:>7.1%}  {label}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+os.register_at_fork(after_in_child=Profiler._after_fork_in_child)
@@ -0,0 +1,144 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from config import Config
+from services.pools.pool import Pool
+from services.pools.token import Token
+from services.ttypes.replay import RecordedBlock
+
+FRAME_HEADER_FORMAT = ">I"
+FRAME_HEADER_SIZE = struct.calcsize(FRAME_HEADER_FORMAT)
+HEADER_FIELDS = (
+    "number",
+    "hash",
+    "parentHash",
+    "timestamp",
+    "miner",
+    "gasUsed",
+    "gasLimit",
+)
+
+
+class BlockRecorder:
+    """Append the state of the tracked pools at every block to a file, to replay it offline.
+
+    Each record is a length prefixed, zlib compressed JSON frame holding the block header, the
+    gas price, the reserves that changed since the previous record and the metadata of the
+    pools seen for the first time. Every `RECORDER_KEYFRAME_BLOCKS` records (and at the first
+    record of each run) a keyframe holds the reserves of all the tracked pools.
+    A frame cut short by a crash is ignored by `read_blocks`.
+    """
+
+    def __init__(self, file_path: str, config: Config) -> None:
+        self.config = config
+        self.file_path = file_path
+        self.keyframe_blocks = self.config.get_int("RECORDER_KEYFRAME_BLOCKS")
+        if os.path.dirname(self.file_path):
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        self.file = open(self.file_path, "ab")
+        self.lock = threading.Lock()
+        self.records = 0
+        # What a reader knows once it read the records written so far
+        self.reserves_by_pool_address: Dict[str, Tuple[int, ...]] = {}
+        self.pool_addresses: Set[str] = set()
+
+    def record(
+        self,
+        header: Dict[str, Any],
+        gas_price: int,
+        reserves_by_pool_address: Dict[str, Tuple[int, ...]],
+        pools: List[Pool],
+    ) -> None:
+        with self.lock:
+            keyframe = self.records % self.keyframe_blocks == 0
+            if keyframe:
+                self.reserves_by_pool_address = {}
+            changed_addresses = [
+                address
+                for address, reserves in reserves_by_pool_address.items()
+                if self.reserves_by_pool_address.get(address) != reserves
+            ]
+            pool_by_address = {
+                pool.address: pool
+                for pool in pools
+                if pool.address in reserves_by_pool_address
+                and pool.address not in self.pool_addresses
+            }
+            record = {
+                "header": {key: header.get(key) for key in HEADER_FIELDS},
+                "gas_price": gas_price,
+                "keyframe": keyframe,
+                "reserves": {
+                    address: list(reserves_by_pool_address[address])
+                    for address in changed_addresses
+                },
+                "pools": [
+                    self._pool_to_json(pool) for pool in pool_by_address.values()
+                ],
+            }
+            frame = zlib.compress(json.dumps(record, separators=(",", ":")).encode())
+            self.file.write(struct.pack(FRAME_HEADER_FORMAT, len(frame)) + frame)
+            self.file.flush()
+            self.reserves_by_pool_address.update(
+                (address, reserves_by_pool_address[address])
+                for address in changed_addresses
+            )
+            self.pool_addresses.update(pool_by_address)
+            self.records += 1
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+    @staticmethod
+    def _pool_to_json(pool: Pool) -> Dict[str, Any]:
+        return {
+            "name": pool.name,
+            "type": pool.type.name,
+            "address": pool.address,
+            "tokens": [
+                {"name": token.name, "address": token.address, "decimal": token.decimal}
+                for token in pool.tokens
+            ],
+        }
+
+
+def read_blocks(file_path: str) -> Iterator[RecordedBlock]:
+    """Yield the recorded blocks in order, with the state of every pool tracked so far"""
+    reserves_by_pool_address: Dict[str, Tuple[int, ...]] = {}
+    with open(file_path, "rb") as stream:
+        while True:
+            frame_header = stream.read(FRAME_HEADER_SIZE)
+            if len(frame_header) < FRAME_HEADER_SIZE:
+                return
+            (frame_size,) = struct.unpack(FRAME_HEADER_FORMAT, frame_header)
+            frame = stream.read(frame_size)
+            if len(frame) < frame_size:
+                return
+            record = json.loads(zlib.decompress(frame))
+            if record["keyframe"]:
+                reserves_by_pool_address = {}
+            for address, reserves in record["reserves"].items():
+                reserves_by_pool_address[address] = tuple(reserves)
+            header = record["header"]
+            yield RecordedBlock(
+                block_number=int(header["number"], 16),
+                header=header,
+                gas_price=record["gas_price"],
+                reserves_by_pool_address=dict(reserves_by_pool_address),
+                new_pools=[
+                    Pool(
+                        name=pool_json["name"],
+                        pool_type=pool_json["type"],
+                        address=pool_json["address"],
+                        tokens=[
+                            Token(**token_json) for token_json in pool_json["tokens"]
+                        ],
+                    )
+                    for pool_json in record["pools"]
+                ],
+            )
@@ -0,0 +1,170 @@
+import time
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple, Union
+
+from config import Config
+from services.arbitrage.arbitrage import Arbitrage
+from services.benchmark.exchanges import create_in_memory_exchange
+from services.ethereum.ethereum import Ethereum
+from services.logger.logger import Logger
+from services.path.path import PathFinder
+from services.pools.pool import Pool
+from services.printer.printer import rank_by_net_profit
+from services.profiler.profiler import Profiler
+from services.replay.recorder import read_blocks
+from services.ttypes.arbitrage import ArbitragePath
+from services.ttypes.replay import RecordedBlock, ReplayReport
+
+
+class ReplayReserveTable:
+    """Serve the recorded reserves to `Arbitrage` like the `SharedReserveTable` of a feeder"""
+
+    def __init__(self) -> None:
+        self.block_number = 0
+        self.reserves_by_pool_address: Dict[str, Tuple[int, ...]] = {}
+
+    def publish(
+        self, block_number: int, reserves_by_pool_address: Dict[str, Tuple[int, ...]]
+    ) -> None:
+        self.block_number = block_number
+        self.reserves_by_pool_address.update(reserves_by_pool_address)
+
+    def read(self) -> Tuple[int, Dict[str, Tuple[int, ...]]]:
+        return self.block_number, dict(self.reserves_by_pool_address)
+
+
+class ReplayPrinter:
+    """Stand-in for `PrinterContract`: every candidate passes its safety check and nothing is sent
+
+    The gas used is the one predicted by the `GasModel`. The best candidate of every block is
+    added to the report.
+    """
+
+    def __init__(self, config: Config, report: ReplayReport) -> None:
+        self.config = config
+        self.report = report
+        self.logger = Logger.instance(self.config)
+
+    def estimate_gas_all(
+        self, arbitrage_paths: List[ArbitragePath], executor: Executor = None
+    ) -> Dict[str, Union[int, str]]:
+        return {
+            arbitrage_path.path_id: arbitrage_path.estimated_gas
+            for arbitrage_path in arbitrage_paths
+        }
+
+    def print_best(
+        self,
+        arbitrage_paths: List[ArbitragePath],
+        gas_estimates: Dict[str, Union[int, str]],
+        latest_block: int,
+        tx_hash: str = "",
+    ) -> Optional[ArbitragePath]:
+        ranked_paths = rank_by_net_profit(
+            arbitrage_paths,
+            {
+                path_id: gas_estimate
+                for path_id, gas_estimate in gas_estimates.items()
+                if isinstance(gas_estimate, int)
+            },
+        )
+        if not ranked_paths:
+            return None
+        best_path, net_profit_wei = ranked_paths[0]
+        self.report.printed += 1
+        self.report.net_profit_wei += net_profit_wei
+        self.logger.debug(
+            best_path.print(latest_block, tx_hash),
+            path_id=best_path.path_id,
+            block=latest_block,
+        )
+        return best_path
+
+
+class Replay:
+    """Feed the blocks written by a `BlockRecorder` through `Arbitrage.calc_arbitrage_and_print`.
+
+    Blocks are replayed back to back, as fast as the evaluation goes. Reserves are only read
+    from the recording and nothing is sent: the printer is a `ReplayPrinter`. Paths are found
+    again whenever the recording starts tracking new pools, like a live reload.
+    """
+
+    def __init__(self, file_path: str, ethereum: Ethereum, config: Config) -> None:
+        self.file_path = file_path
+        self.ethereum = ethereum
+        self.config = config
+        self.logger = Logger.instance(self.config)
+        self.profiler = Profiler.instance(self.config)
+        self.reserve_table = ReplayReserveTable()
+        self.ethereum.reserve_table = self.reserve_table
+        self.report = ReplayReport()
+        self.pool_by_address: Dict[str, Pool] = {}
+        self.arbitrage: Arbitrage = None
+        self.arbitrage_paths: List[ArbitragePath] = []
+
+    def run(self, from_block: int = None, to_block: int = None) -> ReplayReport:
+        start_time = time.perf_counter()
+        for recorded_block in read_blocks(self.file_path):
+            block_number = recorded_block.block_number
+            if to_block is not None and block_number > to_block:
+                break
+            new_pools = [
+                pool
+                for pool in recorded_block.new_pools
+                if pool.address not in self.pool_by_address
+            ]
+            for pool in new_pools:
+                self.pool_by_address[pool.address] = pool
+            if from_block is not None and block_number < from_block:
+                continue
+            if new_pools or self.arbitrage is None:
+                self._load_arbitrage()
+            self._replay_block(recorded_block)
+        if self.arbitrage:
+            self.arbitrage.close()
+        self.report.seconds = time.perf_counter() - start_time
+        return self.report
+
+    def _replay_block(self, recorded_block: RecordedBlock) -> None:
+        block_number = recorded_block.block_number
+        self.reserve_table.publish(
+            block_number, recorded_block.reserves_by_pool_address
+        )
+        block_start_time = time.perf_counter()
+        self.arbitrage.calc_arbitrage_and_print(
+            self.arbitrage_paths, block_number, recorded_block.gas_price
+        )
+        seconds = time.perf_counter() - block_start_time
+        evaluation_report = self.arbitrage.report
+        self.report.blocks += 1
+        self.report.evaluated += evaluation_report.evaluated
+        self.report.positive += evaluation_report.positive
+        if seconds > self.report.slowest_block_seconds:
+            self.report.slowest_block = block_number
+            self.report.slowest_block_seconds = seconds
+        self.logger.debug(
+            f"--- {block_number} Replayed in {seconds} seconds --- ({evaluation_report})",
+            block=block_number,
+            seconds=seconds,
+        )
+        self.profiler.on_block()
+
+    def _load_arbitrage(self) -> None:
+        pools = list(self.pool_by_address.values())
+        if self.arbitrage:
+            self.arbitrage.close()
+        # Pools missing from a block are read from the last recorded state, never the node
+        self.arbitrage = Arbitrage(
+            pools,
+            self.ethereum,
+            self.config,
+            exchange_by_pool_address={
+                pool.address: create_in_memory_exchange(
+                    pool, self.reserve_table.reserves_by_pool_address, self.config
+                )
+                for pool in pools
+            },
+        )
+        self.arbitrage.printer = ReplayPrinter(self.config, self.report)
+        self.arbitrage_paths = PathFinder(pools, self.config).find_all_paths()
+        self.arbitrage.load_paths(self.arbitrage_paths)
@@ -0,0 +1,108 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from config import Config
+from services.ethereum.ethereum import Ethereum
+from services.exchange.factory import ExchangeFactory
+from services.exchange.iexchange import ExchangeInterface
+from services.logger.logger import ERROR, Logger
+from services.pools.loader import PoolLoader
+from services.pools.pool import Pool
+from services.profiler.profiler import Profiler
+from services.reserves.shared import SharedReserveTable
+from services.utils import wait_new_block, heartbeat
+
+
+class ReserveFeeder:
+    """Fetch the reserves of every pool once per block and publish them in a `SharedReserveTable`.
+
+    Strategy processes started with `--shared-reserves` read the table instead of polling the node.
+    """
+
+    def __init__(
+        self,
+        ethereum: Ethereum,
+        config: Config,
+        table: SharedReserveTable,
+        threads: int = 16,
+    ) -> None:
+        self.ethereum = ethereum
+        self.config = config
+        self.table = table
+        self.pool_loader = PoolLoader(config=config)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.pools: List[Pool] = []
+        self.exchange_by_pool_address: Dict[str, ExchangeInterface] = {}
+        self.logger = Logger.instance(self.config)
+        self.profiler = Profiler.instance(self.config)
+
+    def _load_pools(self) -> None:
+        try:
+            start_time = time.time()
+            pools = self.pool_loader.load_all_pools()
+            exchange_by_pool_address = {}
+            for pool in pools:
+                contract = self.ethereum.init_contract(pool)
+                exchange_by_pool_address[pool.address] = ExchangeFactory.create(
+                    contract, pool.type, config=self.config
+                )
+        except Exception as e:
+            self.logger.log(
+                ERROR,
+                f"Exception loading pools, keeping the previous ones: {str(e)}",
+                color="red",
+            )
+            return
+        self.pools = pools
+        self.exchange_by_pool_address = exchange_by_pool_address
+        self.logger.info(
+            f"Feeding reserves of {len(self.pools)} pools (%s s)"
+            % (time.time() - start_time),
+            pools=len(self.pools),
+        )
+
+    def feed(self) -> None:
+        current_block = self.ethereum.w3.eth.blockNumber
+        while not self.pools:
+            self._load_pools()
+            time.sleep(1)
+        counter = 1
+        while True:
+            if counter % 200 == 0:
+                self._load_pools()
+                heartbeat(self.config)
+            latest_block = wait_new_block(self.ethereum, current_block)
+            current_block = latest_block
+            start_time = time.time()
+
+            reserves_by_pool_address: Dict[str, Tuple[int, ...]] = {}
+            for pool, reserves in zip(
+                self.pools, self.executor.map(self._fetch_reserves, self.pools)
+            ):
+                if reserves:
+                    reserves_by_pool_address[pool.address] = reserves
+            self.table.publish(latest_block, reserves_by_pool_address)
+
+            counter += 1
+            seconds = time.time() - start_time
+            self.logger.info(
+                f"--- {latest_block} Published {len(reserves_by_pool_address)}/{len(self.pools)} reserves in {seconds} seconds ---",
+                block=latest_block,
+                published=len(reserves_by_pool_address),
+                pools=len(self.pools),
+                seconds=seconds,
+            )
+            self.profiler.on_block()
+
+    def _fetch_reserves(self, pool: Pool) -> Tuple[int, ...]:
+        try:
+            return self.exchange_by_pool_address[pool.address].fetch_reserves(
+                pool.tokens
+            )
+        except Exception as e:
+            self.logger.debug(
+                f"Could not fetch reserves of {pool.address}: {str(e)}",
+                pool=pool.address,
+            )
+            return None
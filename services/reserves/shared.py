@@ -0,0 +1,138 @@
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Tuple
+
+# Header: sequence (odd while the feeder writes), block number, number of pools, capacity
+HEADER_FORMAT = "<QQQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+ADDRESS_SIZE = 20
+# Each reserve is an uint256. Balancer pools need 5 of them (2 balances, 2 weights, swap fee)
+MAX_RESERVES = 5
+RESERVE_SIZE = 32
+RECORD_SIZE = 1 + MAX_RESERVES * RESERVE_SIZE
+
+
+class SharedReserveTable:
+    """Fixed-layout table of pool reserves in shared memory, indexed by pool id.
+
+    A single feeder process publishes every block (see `ReserveFeeder`) and any number of
+    strategy processes attach to it read-only. Consistency is guaranteed by a sequence lock:
+    the sequence is odd while a block is being written, readers retry until they copy the
+    table between two identical even sequences.
+    Pool ids are append-only so they stay stable while the feeder adds pools on reload.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self.shm = shm
+        self.owner = owner
+        _, _, _, self.capacity = struct.unpack_from(HEADER_FORMAT, self.shm.buf, 0)
+        self.records_offset = HEADER_SIZE + self.capacity * ADDRESS_SIZE
+        self.sequence = 0
+        self.pool_addresses: List[str] = []
+        self.pool_id_by_address: Dict[str, int] = {}
+
+    @classmethod
+    def create(cls, name: str, capacity: int) -> "SharedReserveTable":
+        size = HEADER_SIZE + capacity * (ADDRESS_SIZE + RECORD_SIZE)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        struct.pack_into(HEADER_FORMAT, shm.buf, 0, 0, 0, 0, capacity)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedReserveTable":
+        shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the segment of the feeder when they exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, owner=False)
+
+    @property
+    def block_number(self) -> int:
+        buf = self.shm.buf
+        while True:
+            sequence, block_number, _, _ = struct.unpack_from(HEADER_FORMAT, buf, 0)
+            if sequence % 2 == 0 and struct.unpack_from("<Q", buf, 0)[0] == sequence:
+                return block_number
+            time.sleep(0.001)
+
+    def publish(
+        self, block_number: int, reserves_by_pool_address: Dict[str, Tuple[int, ...]]
+    ) -> None:
+        """Write a whole block at once, pools missing from `reserves_by_pool_address` are cleared"""
+        new_pool_ids: List[int] = []
+        for address in reserves_by_pool_address:
+            if address not in self.pool_id_by_address:
+                if len(self.pool_addresses) >= self.capacity:
+                    raise Exception(
+                        f"Shared reserve table is full ({self.capacity} pools)"
+                    )
+                self.pool_id_by_address[address] = len(self.pool_addresses)
+                new_pool_ids.append(len(self.pool_addresses))
+                self.pool_addresses.append(address)
+
+        buf = self.shm.buf
+        self.sequence += 1
+        struct.pack_into("<Q", buf, 0, self.sequence)
+        for pool_id in new_pool_ids:
+            offset = HEADER_SIZE + pool_id * ADDRESS_SIZE
+            buf[offset : offset + ADDRESS_SIZE] = bytes.fromhex(
+                self.pool_addresses[pool_id][2:]
+            )
+        for pool_id, address in enumerate(self.pool_addresses):
+            reserves = reserves_by_pool_address.get(address, ())
+            offset = self.records_offset + pool_id * RECORD_SIZE
+            buf[offset] = len(reserves)
+            offset += 1
+            for reserve in reserves:
+                buf[offset : offset + RESERVE_SIZE] = reserve.to_bytes(
+                    RESERVE_SIZE, "big"
+                )
+                offset += RESERVE_SIZE
+        struct.pack_into("<QQ", buf, 8, block_number, len(self.pool_addresses))
+        # Last, so that readers never see the new sequence with the previous header
+        self.sequence += 1
+        struct.pack_into("<Q", buf, 0, self.sequence)
+
+    def read(self) -> Tuple[int, Dict[str, Tuple[int, ...]]]:
+        """Return a consistent copy of the last published block and its reserves by pool address"""
+        buf = self.shm.buf
+        while True:
+            sequence, block_number, num_pools, _ = struct.unpack_from(
+                HEADER_FORMAT, buf, 0
+            )
+            if sequence % 2:
+                time.sleep(0.001)
+                continue
+            addresses = bytes(buf[HEADER_SIZE : HEADER_SIZE + num_pools * ADDRESS_SIZE])
+            records = bytes(
+                buf[self.records_offset : self.records_offset + num_pools * RECORD_SIZE]
+            )
+            if struct.unpack_from("<Q", buf, 0)[0] == sequence:
+                break
+
+        reserves_by_pool_address: Dict[str, Tuple[int, ...]] = {}
+        for pool_id in range(num_pools):
+            offset = pool_id * RECORD_SIZE
+            num_reserves = records[offset]
+            if not num_reserves:
+                continue
+            offset += 1
+            address = (
+                "0x"
+                + addresses[pool_id * ADDRESS_SIZE : (pool_id + 1) * ADDRESS_SIZE].hex()
+            )
+            reserves_by_pool_address[address] = tuple(
+                int.from_bytes(
+                    records[
+                        offset + i * RESERVE_SIZE : offset + (i + 1) * RESERVE_SIZE
+                    ],
+                    "big",
+                )
+                for i in range(num_reserves)
+            )
+        return block_number, reserves_by_pool_address
+
+    def close(self) -> None:
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,30 @@
+from typing import Callable, Dict, Hashable, Tuple
+
+from services.pools.pool import Pool
+
+
+class ReserveSnapshot:
+    """Reserves of the tracked pools at one block, each pool fetched at most once.
+
+    Reserves are stored in `pool.tokens` order so swaps can be simulated with the exchanges
+    `calc_amount_out_from_reserves` without talking to the node.
+    """
+
+    def __init__(
+        self,
+        block_key: Hashable,
+        reserves_by_pool_address: Dict[str, Tuple[int, ...]] = None,
+        fetch_reserves: Callable[[Pool], Tuple[int, ...]] = None,
+    ) -> None:
+        self.block_key = block_key
+        self.reserves_by_pool_address = reserves_by_pool_address or {}
+        self.fetch_reserves = fetch_reserves
+
+    def get(self, pool: Pool) -> Tuple[int, ...]:
+        reserves = self.reserves_by_pool_address.get(pool.address)
+        if reserves is None:
+            if self.fetch_reserves is None:
+                raise Exception(f"Reserves of pool {pool.address} are not in snapshot")
+            reserves = self.fetch_reserves(pool)
+            self.reserves_by_pool_address[pool.address] = reserves
+        return reserves
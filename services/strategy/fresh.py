@@ -1,91 +1,115 @@
 import time
-import sys
-from typing import List
+from typing import List, Tuple
 
-from colored import fg, stylize
 from web3 import Web3
 
 from config import Config
 from services.arbitrage.arbitrage import Arbitrage
+from services.arbitrage.gas_model import GasModel
+from services.arbitrage.path_stats import PathStatsStore
+from services.arbitrage.safety_cache import SafetyCheckCache
+from services.daemon.pipeline import SharedPipeline
+from services.engine.engine import Engine
 from services.ethereum.ethereum import Ethereum
+from services.logger.logger import Logger
 from services.path.path import PathFinder
 from services.pools.loader import PoolLoader
+from services.pools.pool import Pool
+from services.strategy.istrategy import StrategyInterface
 from services.ttypes.arbitrage import ArbitragePath
-from services.utils import wait_new_block, calculate_gas_price, heartbeat
+from services.ttypes.pools import PoolsUpdate
 
 
-class StrategyFresh:
+class StrategyFresh(StrategyInterface):
+    sample_cold_paths = True
+
     def __init__(
         self,
         consecutive: int,
         ethereum: Ethereum,
         config: Config,
+        shared: SharedPipeline = None,
     ) -> None:
         self.consecutive = consecutive
         self.ethereum = ethereum
         self.config = config
+        self.shared = shared
         self.pool_loader = PoolLoader(config=config)
+        self.logger = Logger.instance(config)
+        self.arbitrage: Arbitrage = None
+        if shared:
+            self.path_stats = shared.path_stats
+            self.safety_cache = shared.safety_cache
+            self.gas_model = shared.gas_model
+        else:
+            self.path_stats = PathStatsStore.load(config)
+            self.safety_cache = SafetyCheckCache(config)
+            self.gas_model = GasModel(config)
+        self.arbitrage_paths: List[ArbitragePath] = []
 
-    def _load_recent_arbitrage_path(self) -> List[ArbitragePath]:
-        try:
-            start_time = time.time()
-            sys.stdout.flush()
+    def prepare_reload(self) -> Tuple[Arbitrage, List[ArbitragePath]]:
+        start_time = time.time()
+        if self.shared:
+            pools = self.shared.load_pools(self.config)
+        else:
             pools = self.pool_loader.load_all_pools()
-            path_finder = PathFinder(pools, self.config)
-            arbitrage_paths = path_finder.find_all_paths()
-            self.arbitrage = Arbitrage(
-                pools, self.ethereum, self.config, consecutive=self.consecutive
-            )
-            print(
-                f"Finish fetching pools & detecting paths (%s s)"
-                % (time.time() - start_time)
-            )
-            sys.stdout.flush()
-        except Exception as e:
-            print(
-                stylize(
-                    f"Exception loading arbitrage path: {str(e)}",
-                    fg("red"),
-                )
-            )
-            sys.stdout.flush()
-            return self._load_recent_arbitrage_path()
-        return arbitrage_paths
+        return self._load_paths(pools, start_time)
+
+    def prepare_pools_update(
+        self, update: PoolsUpdate
+    ) -> Tuple[Arbitrage, List[ArbitragePath]]:
+        start_time = time.time()
+        pools = self.pool_loader.apply_update(self.arbitrage.pools, update)
+        if self.shared:
+            pools = self.shared.register_pools(pools)
+        return self._load_paths(pools, start_time)
+
+    def _load_paths(
+        self, pools: List[Pool], start_time: float
+    ) -> Tuple[Arbitrage, List[ArbitragePath]]:
+        if self.shared:
+            arbitrage_paths = self.shared.find_paths(self.config, pools)
+        else:
+            arbitrage_paths = PathFinder(pools, self.config).find_all_paths()
+        arbitrage = Arbitrage(
+            pools,
+            self.ethereum,
+            self.config,
+            consecutive=self.consecutive,
+            path_stats=self.path_stats,
+            safety_cache=self.safety_cache,
+            gas_model=self.gas_model,
+            exchange_by_pool_address=(
+                self.shared.exchange_by_pool_address if self.shared else None
+            ),
+        )
+        arbitrage.load_paths(arbitrage_paths)
+        self.logger.info(
+            f"Finish fetching pools & detecting paths (%s s)"
+            % (time.time() - start_time)
+        )
+        return arbitrage, arbitrage_paths
+
+    def apply_reload(self, reloaded: Tuple[Arbitrage, List[ArbitragePath]]) -> None:
+        self.arbitrage, self.arbitrage_paths = reloaded
 
     def arbitrage_fresh_pools(self):
-        current_block = self.ethereum.w3.eth.blockNumber
-        arbitrage_paths = self._load_recent_arbitrage_path()
-        counter = 1
-        while True:
-            # Load again new pools Roughly every 40 minutes
-            if counter % 200 == 0:
-                arbitrage_paths = self._load_recent_arbitrage_path()
-                heartbeat(self.config)
-            latest_block = wait_new_block(self.ethereum, current_block)
-            start_time = time.time()
-            current_block = latest_block
+        Engine([self], self.ethereum, self.config).run()
+
+    def load_arbitrage_paths(self) -> None:
+        self.apply_reload(self.prepare_reload())
+
+    def select_paths(self, latest_block: int) -> List[ArbitragePath]:
+        return self.arbitrage_paths
+
+    def adjust_gas_price(self, gas_price: int) -> int:
+        return max(
+            [int(gas_price * self.config.gas_multiplier), Web3.toWei(121, "gwei")]
+        )
 
-            try:
-                gas_price = calculate_gas_price(self.ethereum, self.config)
-            except Exception as e:
-                print(
-                    stylize(
-                        f"Could not calculate gas price {str(e)}",
-                        fg("red"),
-                    )
-                )
-                sys.stdout.flush()
-                gas_price = self.ethereum.w3.eth.gasPrice
-            gas_price = max(
-                [int(gas_price * self.config.gas_multiplier), Web3.toWei(121, "gwei")]
-            )
-            self.arbitrage.calc_arbitrage_and_print(
-                arbitrage_paths, latest_block, gas_price
-            )
+    def should_reload(self, counter: int, current_block: int) -> bool:
+        # Load again new pools Roughly every 40 minutes
+        return counter % 200 == 0
 
-            counter += 1
-            print(
-                f"--- Ended in %s seconds --- (Gas: {Web3.fromWei(gas_price, 'gwei')})"
-                % (time.time() - start_time)
-            )
-            sys.stdout.flush()
+    def should_heartbeat(self, counter: int, current_block: int) -> bool:
+        return counter % 200 == 0
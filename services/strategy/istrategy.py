@@ -0,0 +1,73 @@
+import abc
+from typing import Any, List
+
+from services.arbitrage.arbitrage import Arbitrage
+from services.arbitrage.path_stats import PathStatsStore
+from services.ttypes.arbitrage import ArbitragePath
+from services.ttypes.pools import PoolsUpdate
+
+
+class StrategyInterface(abc.ABC):
+    """Hooks called by `services.engine.engine.Engine` on every block.
+
+    Hooks are blocking and run in the engine thread pool, never on the event loop.
+    """
+
+    # Set when several strategies share an engine, see `services.daemon.daemon.Daemon`
+    name: str = None
+    arbitrage: Arbitrage = None
+    # Kept across reloads and saved by the engine
+    path_stats: PathStatsStore = None
+    # Evaluate cold paths every few blocks only, see `PathStatsStore.is_due`
+    sample_cold_paths = False
+
+    @abc.abstractmethod
+    def load_arbitrage_paths(self) -> None:
+        """Load pools, paths and `self.arbitrage`. Called at startup"""
+        pass
+
+    @abc.abstractmethod
+    def select_paths(self, latest_block: int) -> List[ArbitragePath]:
+        """Return the paths to evaluate for `latest_block`"""
+        pass
+
+    @abc.abstractmethod
+    def adjust_gas_price(self, gas_price: int) -> int:
+        """Apply the strategy multiplier/floor to the network gas price"""
+        pass
+
+    def should_reload(self, counter: int, current_block: int) -> bool:
+        return False
+
+    @abc.abstractmethod
+    def prepare_reload(self) -> Any:
+        """Build the next pools, paths and `Arbitrage` without touching the live ones.
+
+        Called from the engine reload thread when `should_reload`, while blocks keep being
+        evaluated with the current paths.
+        """
+        pass
+
+    @abc.abstractmethod
+    def prepare_pools_update(self, update: PoolsUpdate) -> Any:
+        """Like `prepare_reload`, from the current pools changed as the pool YAML files say
+        instead of downloading them again. Its result is swapped in by `apply_reload`"""
+        pass
+
+    @abc.abstractmethod
+    def apply_reload(self, reloaded: Any) -> None:
+        """Swap in what `prepare_reload` returned. Called between two blocks, so it has to be quick;
+        the previous `arbitrage` is closed by the engine"""
+        pass
+
+    def should_heartbeat(self, counter: int, current_block: int) -> bool:
+        return False
+
+    def on_arbitrage_printed(
+        self, latest_block: int, arbitrage_path: ArbitragePath
+    ) -> None:
+        """Called for every arbitrage that is/would have been successful on-chain"""
+        pass
+
+    def on_block_end(self, latest_block: int, printed: bool) -> None:
+        pass
@@ -1,53 +1,107 @@
-import time
-from typing import List
-import sys
-
-from web3 import Web3
+from typing import List, Tuple
 
 from config import Config
 from services.arbitrage.arbitrage import Arbitrage
+from services.arbitrage.gas_model import GasModel
+from services.arbitrage.path_stats import PathStatsStore
+from services.arbitrage.safety_cache import SafetyCheckCache
+from services.daemon.pipeline import SharedPipeline
+from services.engine.engine import Engine
 from services.ethereum.ethereum import Ethereum
 from services.path.path import PathFinder
+from services.pools.loader import PoolLoader
 from services.pools.pool import Pool
+from services.strategy.istrategy import StrategyInterface
 from services.ttypes.arbitrage import ArbitragePath
-from services.utils import wait_new_block, calculate_gas_price, heartbeat
+from services.ttypes.pools import PoolsUpdate
+
 
+class StrategyScan(StrategyInterface):
+    sample_cold_paths = True
 
-class StrategyScan:
     def __init__(
         self,
         pools: List[Pool],
         ethereum: Ethereum,
         config: Config,
+        shared: SharedPipeline = None,
     ) -> None:
-        self.pools = pools
         self.ethereum = ethereum
         self.config = config
-        self.arbitrage = Arbitrage(self.pools, self.ethereum, self.config)
-        self.path_finder = PathFinder(self.pools, self.config)
+        self.shared = shared
+        self.pool_loader = PoolLoader(config=config)
+        if shared:
+            self.path_stats = shared.path_stats
+            self.safety_cache = shared.safety_cache
+            self.gas_model = shared.gas_model
+        else:
+            self.path_stats = PathStatsStore.load(config)
+            self.safety_cache = SafetyCheckCache(config)
+            self.gas_model = GasModel(config)
+        self.pools = pools
+        self.arbitrage = self._create_arbitrage(self.pools)
+        self.arbitrage_paths: List[ArbitragePath] = []
+
+    def _create_arbitrage(self, pools: List[Pool]) -> Arbitrage:
+        return Arbitrage(
+            pools,
+            self.ethereum,
+            self.config,
+            path_stats=self.path_stats,
+            safety_cache=self.safety_cache,
+            gas_model=self.gas_model,
+            exchange_by_pool_address=(
+                self.shared.exchange_by_pool_address if self.shared else None
+            ),
+        )
 
     def scan_arbitrage(self):
-        arbitrage_paths: List[ArbitragePath] = self.path_finder.find_all_paths()
-        current_block = self.ethereum.w3.eth.blockNumber
-        while True:
-            if current_block % 200 == 0:
-                heartbeat(self.config)
-            latest_block = wait_new_block(self.ethereum, current_block)
-            current_block = latest_block
-            start_time = time.time()
-
-            try:
-                gas_price = calculate_gas_price(self.ethereum, self.config)
-            except Exception:
-                print("Could not calculate gas price")
-                sys.stdout.flush()
-                gas_price = self.ethereum.w3.eth.gasPrice
-            gas_price = int(gas_price * 1.5)
-            self.arbitrage.calc_arbitrage_and_print(
-                arbitrage_paths, latest_block, gas_price
-            )
-            print(
-                f"--- Ended in %s seconds --- (Gas: {Web3.fromWei(gas_price, 'gwei')})"
-                % (time.time() - start_time)
-            )
-            sys.stdout.flush()
+        Engine([self], self.ethereum, self.config).run()
+
+    def load_arbitrage_paths(self) -> None:
+        self.arbitrage_paths = self._find_paths(self.pools)
+        self.arbitrage.load_paths(self.arbitrage_paths)
+
+    def prepare_reload(
+        self,
+    ) -> Tuple[List[Pool], Arbitrage, List[ArbitragePath]]:
+        if self.shared:
+            pools = self.shared.load_pools(self.config)
+        else:
+            pools = self.pool_loader.load_all_pools()
+        return self._load_paths(pools)
+
+    def prepare_pools_update(
+        self, update: PoolsUpdate
+    ) -> Tuple[List[Pool], Arbitrage, List[ArbitragePath]]:
+        pools = self.pool_loader.apply_update(self.pools, update)
+        if self.shared:
+            pools = self.shared.register_pools(pools)
+        return self._load_paths(pools)
+
+    def _load_paths(
+        self, pools: List[Pool]
+    ) -> Tuple[List[Pool], Arbitrage, List[ArbitragePath]]:
+        arbitrage = self._create_arbitrage(pools)
+        arbitrage_paths = self._find_paths(pools)
+        arbitrage.load_paths(arbitrage_paths)
+        return pools, arbitrage, arbitrage_paths
+
+    def _find_paths(self, pools: List[Pool]) -> List[ArbitragePath]:
+        if self.shared:
+            return self.shared.find_paths(self.config, pools)
+        return PathFinder(pools, self.config).find_all_paths()
+
+    def apply_reload(
+        self, reloaded: Tuple[List[Pool], Arbitrage, List[ArbitragePath]]
+    ) -> None:
+        self.pools, self.arbitrage, self.arbitrage_paths = reloaded
+
+    def select_paths(self, latest_block: int) -> List[ArbitragePath]:
+        return self.arbitrage_paths
+
+    def adjust_gas_price(self, gas_price: int) -> int:
+        return int(gas_price * 1.5)
+
+    def should_heartbeat(self, counter: int, current_block: int) -> bool:
+        return current_block % 200 == 0
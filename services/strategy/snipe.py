@@ -1,11 +1,21 @@
 import re
-from typing import List, Set
+import threading
+import time
+from typing import Any, Dict, List, Set
+
+import yaml
+from web3 import Web3
 
 from config import Config
 from services.arbitrage.arbitrage import Arbitrage
 from services.ethereum.ethereum import Ethereum
+from services.ethereum.mempool import PendingTransactionStream
+from services.logger.logger import ERROR, Logger
 from services.path.path import PathFinder
+from services.pools.files import PoolFilesWatcher
+from services.pools.loader import PoolLoader
 from services.pools.pool import Pool
+from services.profiler.profiler import Profiler
 from services.ttypes.arbitrage import ArbitragePath
 from services.ttypes.sniper import SnipingArbitrage, SnipingNoob
 from services.utils import heartbeat
@@ -13,30 +23,70 @@ from services.utils import heartbeat
 ARGUMENT_LENGTH = 64
 
 
+def load_noobs_yaml(config: Config) -> List[SnipingNoob]:
+    noobs: List[SnipingNoob] = []
+    with open(config.get("SNIPING_NOOBS_YAML_PATH"), "r") as stream:
+        noobs_dict = yaml.safe_load(stream)
+        if noobs_dict["noobs"]:
+            for noob_yaml in noobs_dict["noobs"]:
+                noob = SnipingNoob(address=Web3.toChecksumAddress(noob_yaml["address"]))
+                noobs.append(noob)
+    return noobs
+
+
 class StrategySnipe:
     def __init__(
-        self, ethereum: Ethereum, config: Config, pools: List[Pool], noobs: SnipingNoob
+        self,
+        ethereum: Ethereum,
+        config: Config,
+        pools: List[Pool],
+        noobs: List[SnipingNoob],
+        watch_noobs: bool = False,
     ) -> None:
         self.ethereum = ethereum
         self.config = config
         self.pools_by_address = {pool.address: pool for pool in pools}
         self.noobs = noobs
         self.arbitrage = Arbitrage(pools, self.ethereum, self.config)
-        self.last_txs: List[str] = []
+        self.pool_loader = PoolLoader(config=config)
+        # Noobs given on the command line are not reloaded from snipers.yaml
+        self.noobs_path = config.get("SNIPING_NOOBS_YAML_PATH") if watch_noobs else None
+        self.pool_files = PoolFilesWatcher(
+            config, extra_paths=[self.noobs_path] if watch_noobs else []
+        )
+        self.pending_transactions = PendingTransactionStream(
+            self.ethereum.w3, config, [noob.address for noob in noobs]
+        )
+        self.logger = Logger.instance(self.config)
+        self.profiler = Profiler.instance(self.config)
 
     def snipe_arbitrageur(self) -> None:
+        current_block = None
+        idle_seconds = self.config.get_float("MEMPOOL_IDLE_SECONDS")
+        tx_manager = self.ethereum.tx_manager
+        tx_manager.notify_block(self.ethereum.w3.eth.blockNumber)
+        threading.Thread(target=self._watch_blocks, daemon=True).start()
+        self.pending_transactions.start()
         while True:
-            latest_block = self.ethereum.w3.eth.blockNumber
-            if latest_block % 200:
-                heartbeat(self.config)
-            # start_time = time.time()
-            sniping_arbitrages: List[SnipingArbitrage] = self._scan_mempool_and_snipe()
+            # Returns as soon as a watched address sends a transaction
+            pending_transactions = self.pending_transactions.get(timeout=idle_seconds)
+            # Not asked to the node here, it would delay the reaction to the transactions
+            latest_block = tx_manager.latest_block
+            if latest_block != current_block:
+                if current_block is not None:
+                    self.profiler.on_block()
+                if latest_block % 200 == 0:
+                    heartbeat(self.config)
+                current_block = latest_block
+            self._apply_file_changes()
+            sniping_arbitrages = self._get_sniping_arbitrages(pending_transactions)
             for sniping_arbitrage in sniping_arbitrages:
                 path_finder = PathFinder(sniping_arbitrage.pools, self.config)
                 arbitrage_paths: List[ArbitragePath] = path_finder.find_all_paths()
                 if arbitrage_paths:
-                    print(
-                        f"[Pending Tx: {sniping_arbitrage.tx_hash}] Found {len(arbitrage_paths)} paths"
+                    self.logger.info(
+                        f"[Pending Tx: {sniping_arbitrage.tx_hash}] Found {len(arbitrage_paths)} paths",
+                        tx_hash=sniping_arbitrage.tx_hash,
                     )
                 self.arbitrage.calc_arbitrage_and_print(
                     arbitrage_paths,
@@ -45,31 +95,70 @@ class StrategySnipe:
                     sniping_arbitrage.tx_hash,
                 )
 
-    def _scan_mempool_and_snipe(self) -> List[SnipingArbitrage]:
+    def _watch_blocks(self) -> None:
+        """Notify the transaction manager of the new blocks, its latest block is the current one"""
+        while True:
+            try:
+                self.ethereum.tx_manager.notify_block(self.ethereum.w3.eth.blockNumber)
+            except Exception as e:
+                self.logger.log(
+                    ERROR,
+                    f"Could not fetch block number {str(e)}",
+                    color="red",
+                    sample_key="block_number",
+                )
+            time.sleep(0.5)
+
+    def _get_sniping_arbitrages(
+        self, pending_transactions: List[Dict[str, Any]]
+    ) -> List[SnipingArbitrage]:
         """
-        Watch the mempool for an arbitrageur targetting `arbitrage_path`
-        Once detected, we snipe them by submitting a transaction with a higher gas price.
+        Pools of the pending transactions of an arbitrageur.
+        We snipe them by submitting a transaction with a higher gas price.
         """
-        all_pending_txs = self.ethereum.w3_http.geth.txpool.content()["pending"]
-
-        arbitrage: List[SnipingArbitrage] = []
-        pending_tx_hashes = []
-        for noob in self.noobs:
-            if noob.address in all_pending_txs:
-                for pending_tx in all_pending_txs[noob.address].values():
-                    if pending_tx["hash"] not in self.last_txs:
-                        arbitrage.append(
-                            SnipingArbitrage(
-                                pools=self._get_pools(pending_tx["input"]),
-                                gas_price=int(pending_tx["gasPrice"], 16),
-                                tx_hash=pending_tx["hash"],
-                            )
-                        )
-                        pending_tx_hashes.append(pending_tx["hash"])
+        return [
+            SnipingArbitrage(
+                pools=self._get_pools(pending_tx["input"]),
+                gas_price=int(pending_tx["gasPrice"], 16),
+                tx_hash=pending_tx["hash"],
+            )
+            for pending_tx in pending_transactions
+        ]
 
-        if pending_tx_hashes:
-            self.last_txs = pending_tx_hashes
-        return arbitrage
+    def _apply_file_changes(self) -> None:
+        """Apply the changes of the pool YAML files and snipers.yaml, if any"""
+        changed_paths = self.pool_files.changed_paths()
+        if not changed_paths:
+            return
+        try:
+            update = self.pool_files.load()
+            noobs = (
+                load_noobs_yaml(self.config)
+                if self.noobs_path in changed_paths
+                else self.noobs
+            )
+            pools = self.pool_loader.apply_update(
+                list(self.pools_by_address.values()), update
+            )
+            arbitrage = Arbitrage(
+                pools,
+                self.ethereum,
+                self.config,
+                safety_cache=self.arbitrage.safety_cache,
+                gas_model=self.arbitrage.gas_model,
+            )
+        except Exception as e:
+            self.logger.log(
+                ERROR,
+                f"Invalid pool or sniper files, keeping the current ones: {str(e)}",
+                color="red",
+            )
+            return
+        self.pools_by_address = {pool.address: pool for pool in pools}
+        self.noobs = noobs
+        self.pending_transactions.set_addresses(noob.address for noob in noobs)
+        self.arbitrage = arbitrage
+        self.logger.info(f"Sniping {len(self.noobs)} addresses on {len(pools)} pools")
 
     def _get_pools(self, contract_input: str) -> List[Pool]:
         """
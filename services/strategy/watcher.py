@@ -1,132 +1,186 @@
 import time
 from collections import defaultdict
-import sys
-from typing import Dict
+from typing import Dict, List, Tuple
 
-from colored import fg, stylize
 
 from config import Config
 from services.arbitrage.arbitrage import Arbitrage
+from services.arbitrage.gas_model import GasModel
+from services.arbitrage.path_stats import PathStatsStore
+from services.arbitrage.safety_cache import SafetyCheckCache
+from services.daemon.pipeline import SharedPipeline
+from services.engine.engine import Engine
 from services.ethereum.ethereum import Ethereum
+from services.logger.logger import Logger
 from services.path.path import PathFinder
 from services.pools.loader import PoolLoader
+from services.pools.pool import Pool
+from services.strategy.istrategy import StrategyInterface
 from services.ttypes.arbitrage import ArbitragePath
-from services.utils import wait_new_block, calculate_gas_price
+from services.ttypes.pools import PoolsUpdate
 
 
-class StrategyWatcher:
+class StrategyWatcher(StrategyInterface):
     def __init__(
         self,
         consecutive: int,
         ethereum: Ethereum,
         config: Config,
+        shared: SharedPipeline = None,
     ) -> None:
         self.consecutive = consecutive
         self.ethereum = ethereum
         self.config = config
+        self.shared = shared
         self.pool_loader = PoolLoader(config=config)
+        self.logger = Logger.instance(config)
+        self.arbitrage: Arbitrage = None
+        if shared:
+            self.path_stats = shared.path_stats
+            self.safety_cache = shared.safety_cache
+            self.gas_model = shared.gas_model
+        else:
+            self.path_stats = PathStatsStore.load(config)
+            self.safety_cache = SafetyCheckCache(config)
+            self.gas_model = GasModel(config)
+        self.paths_by_token: Dict[str, Dict[str, ArbitragePath]] = {}
+        self.transfer_filters = None
+        self.focus_path: ArbitragePath = None
+        self.focus_block: int = None
+        self.focus_remaining = 0
 
-    def _load_recent_arbitrage_path(self) -> Dict[str, Dict[str, ArbitragePath]]:
-        try:
-            start_time = time.time()
-            sys.stdout.flush()
+    def prepare_reload(
+        self,
+    ) -> Tuple[Arbitrage, Dict[str, Dict[str, ArbitragePath]]]:
+        start_time = time.time()
+        if self.shared:
+            pools = self.shared.load_pools(self.config)
+        else:
             pools = self.pool_loader.load_all_pools()
-            path_finder = PathFinder(pools, self.config)
-            paths_by_token = path_finder.find_all_paths_by_token()
-            self.arbitrage = Arbitrage(
-                pools, self.ethereum, self.config, consecutive=self.consecutive
-            )
-            print(
-                f"Finish fetching pools & detecting paths (%s s)"
-                % (time.time() - start_time)
+        return self._load_paths(pools, start_time)
+
+    def prepare_pools_update(
+        self, update: PoolsUpdate
+    ) -> Tuple[Arbitrage, Dict[str, Dict[str, ArbitragePath]]]:
+        start_time = time.time()
+        pools = self.pool_loader.apply_update(self.arbitrage.pools, update)
+        if self.shared:
+            pools = self.shared.register_pools(pools)
+        return self._load_paths(pools, start_time)
+
+    def _load_paths(
+        self, pools: List[Pool], start_time: float
+    ) -> Tuple[Arbitrage, Dict[str, Dict[str, ArbitragePath]]]:
+        if self.shared:
+            paths_by_token = PathFinder.group_paths_by_token(
+                self.shared.find_paths(self.config, pools)
             )
-            sys.stdout.flush()
-        except Exception as e:
-            print(
-                stylize(
-                    f"Exception loading arbitrage path: {str(e)}",
-                    fg("red"),
-                )
+        else:
+            paths_by_token = PathFinder(pools, self.config).find_all_paths_by_token()
+        arbitrage = Arbitrage(
+            pools,
+            self.ethereum,
+            self.config,
+            consecutive=self.consecutive,
+            path_stats=self.path_stats,
+            safety_cache=self.safety_cache,
+            gas_model=self.gas_model,
+            exchange_by_pool_address=(
+                self.shared.exchange_by_pool_address if self.shared else None
+            ),
+        )
+        arbitrage.load_paths(
+            list(
+                {
+                    path.path_id: path
+                    for paths in paths_by_token.values()
+                    for path in paths.values()
+                }.values()
             )
-            sys.stdout.flush()
-            return self._load_recent_arbitrage_path()
-        return paths_by_token
+        )
+        self.logger.info(
+            f"Finish fetching pools & detecting paths (%s s)"
+            % (time.time() - start_time)
+        )
+        return arbitrage, paths_by_token
+
+    def apply_reload(
+        self, reloaded: Tuple[Arbitrage, Dict[str, Dict[str, ArbitragePath]]]
+    ) -> None:
+        self.arbitrage, self.paths_by_token = reloaded
 
     def watch(self):
-        paths_by_token = self._load_recent_arbitrage_path()
-        current_block = self.ethereum.w3.eth.blockNumber
-        transfer_hash = self.ethereum.w3.keccak(
-            text="Transfer(address,address,uint256)"
-        ).hex()
-        balancer_swap_hash = self.ethereum.w3.keccak(
-            text="LOG_SWAP(address,address,address,uint256,uint256)"
-        ).hex()
-        transfer_filters = self.ethereum.w3.eth.filter(
-            {"topics": [[balancer_swap_hash, transfer_hash]]}
-        )
-        while True:
-            if current_block % 200 == 0:
-                # heartbeat(self.config)
-                paths_by_token = self._load_recent_arbitrage_path()
-            latest_block = wait_new_block(self.ethereum, current_block)
-            current_block = latest_block
-            start_time = time.time()
-            addresses_by_tx_hash = defaultdict(set)  # TransactionHash => List[str]
-            watcher_list = set()
-            for event in transfer_filters.get_new_entries():
-                if (
-                    event["topics"][0].hex()
-                    == "0x908fb5ee8f16c6bc9bc3690973819f32a4d4b10188134543c88706e0e1d43378"
-                ):
-                    # Balancer Event
-                    for topic in event["topics"][1:]:
-                        watcher_list.add(topic[12:].hex())
-                else:
-                    # Likely Uniswap
-                    if event["address"] != self.config.get("WETH_ADDRESS"):
-                        addresses_by_tx_hash[event["transactionHash"]].add(
-                            event["address"].lower()
-                        )
-            if len(addresses_by_tx_hash) == 0 and len(watcher_list):
-                continue
-            for addresses in addresses_by_tx_hash.values():
-                if len(addresses) > 1:
-                    for addr in addresses:
-                        watcher_list.add(addr)
-            try:
-                gas_price = calculate_gas_price(self.ethereum, self.config)
-            except Exception:
-                print("Could not calculate gas price")
-                sys.stdout.flush()
-                gas_price = self.ethereum.w3.eth.gasPrice
-
-            gas_price = int(gas_price * self.config.gas_multiplier)
-            for watcher in watcher_list:
-                if watcher in paths_by_token:
-                    paths = list(paths_by_token[watcher].values())
-                    positive_arb = self.arbitrage.calc_arbitrage_and_print(
-                        paths, latest_block, gas_price
-                    )
-                    if positive_arb and self.consecutive > 1:
-                        self._focus_positive_arb(current_block, positive_arb, gas_price)
-                        break
+        Engine([self], self.ethereum, self.config).run()
 
-            print(
-                f"--- {current_block} Ended in %s seconds --- (Gas: {self.ethereum.w3.fromWei(gas_price, 'gwei')})"
-                % (time.time() - start_time)
+    def load_arbitrage_paths(self) -> None:
+        self.apply_reload(self.prepare_reload())
+        if self.transfer_filters is None and not self.shared:
+            transfer_hash = self.ethereum.w3.keccak(
+                text="Transfer(address,address,uint256)"
+            ).hex()
+            balancer_swap_hash = self.ethereum.w3.keccak(
+                text="LOG_SWAP(address,address,address,uint256,uint256)"
+            ).hex()
+            self.transfer_filters = self.ethereum.w3.eth.filter(
+                {"topics": [[balancer_swap_hash, transfer_hash]]}
             )
-            sys.stdout.flush()
 
-    def _focus_positive_arb(
-        self, current_block: int, path: ArbitragePath, gas_price: int
-    ) -> None:
-        print(f"Focus on one Path until we find {self.consecutive} arbs")
-        for _ in range(self.consecutive - 1):
-            latest_block = wait_new_block(self.ethereum, current_block)
-            current_block = latest_block
-            if not self.arbitrage.calc_arbitrage_and_print(
-                [path], latest_block, gas_price
+    def select_paths(self, latest_block: int) -> List[ArbitragePath]:
+        if self.focus_path:
+            return [self.focus_path]
+        addresses_by_tx_hash = defaultdict(set)  # TransactionHash => List[str]
+        watcher_list = set()
+        if self.shared:
+            events = self.shared.get_swap_events(latest_block)
+        else:
+            events = self.transfer_filters.get_new_entries()
+        for event in events:
+            if (
+                event["topics"][0].hex()
+                == "0x908fb5ee8f16c6bc9bc3690973819f32a4d4b10188134543c88706e0e1d43378"
             ):
-                print("Could not find subsequent arbitrage")
-                return
-        return
+                # Balancer Event
+                for topic in event["topics"][1:]:
+                    watcher_list.add(topic[12:].hex())
+            else:
+                # Likely Uniswap
+                if event["address"] != self.config.get("WETH_ADDRESS"):
+                    addresses_by_tx_hash[event["transactionHash"]].add(
+                        event["address"].lower()
+                    )
+        if len(addresses_by_tx_hash) == 0 and len(watcher_list):
+            return []
+        for addresses in addresses_by_tx_hash.values():
+            if len(addresses) > 1:
+                for addr in addresses:
+                    watcher_list.add(addr)
+
+        paths_by_id: Dict[str, ArbitragePath] = {}
+        for watcher in watcher_list:
+            if watcher in self.paths_by_token:
+                paths_by_id.update(self.paths_by_token[watcher])
+        return list(paths_by_id.values())
+
+    def adjust_gas_price(self, gas_price: int) -> int:
+        return int(gas_price * self.config.gas_multiplier)
+
+    def should_reload(self, counter: int, current_block: int) -> bool:
+        return current_block % 200 == 0
+
+    def on_arbitrage_printed(
+        self, latest_block: int, arbitrage_path: ArbitragePath
+    ) -> None:
+        if self.focus_path is None and self.consecutive > 1:
+            self.logger.info(f"Focus on one Path until we find {self.consecutive} arbs")
+            self.focus_path = arbitrage_path
+            self.focus_block = latest_block
+            self.focus_remaining = self.consecutive - 1
+
+    def on_block_end(self, latest_block: int, printed: bool) -> None:
+        if self.focus_path is None or latest_block == self.focus_block:
+            return
+        self.focus_remaining -= 1
+        if not printed:
+            self.logger.info("Could not find subsequent arbitrage")
+        if not printed or self.focus_remaining == 0:
+            self.focus_path = None
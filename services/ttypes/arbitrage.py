@@ -1,19 +1,18 @@
 from dataclasses import dataclass, field
-from typing import List
-import sys
+from typing import List, Set, Tuple
 
 from web3 import Web3
 
-from config import Config, FIXED_TOKEN_PATH_SIZE, FIXED_ADDRESSES_PER_TOKEN_PATH
+from config import (
+    ESTIMATE_GAS_EXECUTION,
+    FIXED_ADDRESSES_PER_TOKEN_PATH,
+    FIXED_TOKEN_PATH_SIZE,
+)
 from services.pools.pool import Pool
 from services.pools.token import Token
 from services.ttypes.contract import ContractTypeEnum
 from services.utils import mask_address, fill_zero_addresses
 
-config = Config(strategy=None)
-MAX_STEP_SUPPORTED = config.get_int("MAX_STEP_SUPPORTED")
-ESTIMATE_GAS_EXECUTION = config.get_int("ESTIMATE_GAS_EXECUTION")
-
 
 @dataclass
 class ConnectingPath:
@@ -32,12 +31,18 @@ class ArbitragePath:
     max_arbitrage_amount_wei: int = None
     max_block_height: int = None
     consecutive_arbs: int = 0
+    # Set from the GasModel before the path is evaluated
+    estimated_gas: int = ESTIMATE_GAS_EXECUTION
 
     @property
     def path_id(self) -> str:
         path_concat = "".join([path.pool.address for path in self.connecting_paths])
         return path_concat
 
+    @property
+    def pool_addresses(self) -> Set[str]:
+        return {path.pool.address for path in self.connecting_paths}
+
     def contain_token(self, token_address: str) -> bool:
         for path in self.connecting_paths:
             if path.pool.contain_token(token_address):
@@ -104,7 +109,12 @@ class ArbitragePath:
 
     @property
     def gas_price_execution(self) -> int:
-        return self.gas_price * ESTIMATE_GAS_EXECUTION
+        return self.gas_price * self.estimated_gas
+
+    @property
+    def shape(self) -> Tuple[int, Tuple[int, ...]]:
+        """Number of hops and router segments, paths of the same shape cost about the same gas"""
+        return len(self.connecting_paths), tuple(self.pool_types)
 
     @property
     def token_paths(self) -> List[List[str]]:
@@ -173,13 +183,13 @@ class ArbitragePath:
             "'", '"'
         )
 
-    def print_path(self) -> str:
+    @property
+    def path_str(self) -> str:
         paths = f"{self.connecting_paths[0].token_in.name}"
         for idx, path in enumerate(self.connecting_paths):
             path_token_out = path.token_out
             paths += f" -> {path_token_out.name} ({path.pool.type.name})"
-        print(paths)
-        sys.stdout.flush()
+        return paths
 
     def print(self, latest_block: int, tx_hash: str = "") -> str:
         paths = f"{self.connecting_paths[0].token_in.from_wei(self.optimal_amount_in_wei)} {self.connecting_paths[0].token_in.name}"
@@ -200,6 +210,12 @@ class ArbitragePath:
         arbitrage_result = arbitrage_result + self.tx_remix_str
         return arbitrage_result
 
+    def apply_candidate(self, candidate: "PathCandidate") -> None:
+        self.optimal_amount_in_wei = candidate.optimal_amount_in_wei
+        self.all_optimal_amount_out_wei = candidate.all_optimal_amount_out_wei
+        self.all_min_amount_out_wei = candidate.all_min_amount_out_wei
+        self.max_arbitrage_amount_wei = candidate.max_arbitrage_amount_wei
+
     def display_emoji_by_amount(self, emoji: str) -> str:
         max_arbitrage_amount = self.token_out.from_wei(self.max_arbitrage_amount_wei)
         times = 1
@@ -212,3 +228,72 @@ class ArbitragePath:
         if max_arbitrage_amount >= 2.0:
             times = 20
         return "".join([emoji for _ in range(times)])
+
+
+@dataclass
+class PathCandidate:
+    """Positive arbitrage found by a worker process, applied back onto the main process path"""
+
+    path_id: str
+    optimal_amount_in_wei: int
+    all_optimal_amount_out_wei: List[int]
+    all_min_amount_out_wei: List[int]
+    max_arbitrage_amount_wei: int
+
+    @classmethod
+    def from_path(cls, arbitrage_path: ArbitragePath) -> "PathCandidate":
+        return cls(
+            path_id=arbitrage_path.path_id,
+            optimal_amount_in_wei=arbitrage_path.optimal_amount_in_wei,
+            all_optimal_amount_out_wei=arbitrage_path.all_optimal_amount_out_wei,
+            all_min_amount_out_wei=arbitrage_path.all_min_amount_out_wei,
+            max_arbitrage_amount_wei=arbitrage_path.max_arbitrage_amount_wei,
+        )
+
+
+@dataclass
+class EvaluationReport:
+    """How much of the path set was evaluated for a block before the scheduler stopped"""
+
+    block_number: int
+    total: int
+    evaluated: int = 0
+    positive: int = 0
+    cold: int = 0
+    backing_off: int = 0
+    stopped_by: str = None
+
+    @property
+    def skipped(self) -> int:
+        return self.total - self.evaluated
+
+    def __str__(self) -> str:
+        report = (
+            f"Paths: {self.evaluated}/{self.total} evaluated, {self.skipped} skipped"
+        )
+        if self.cold:
+            report += f" ({self.cold} cold)"
+        if self.backing_off:
+            report += f" ({self.backing_off} backing off)"
+        if self.stopped_by:
+            report += f" ({self.stopped_by})"
+        return report
+
+
+@dataclass
+class PathStats:
+    """Profitability history of a path, see `PathStatsStore`"""
+
+    best_margin: float = 0.0
+    hits: int = 0
+    last_profitable_block: int = 0
+    updated_block: int = 0
+
+
+@dataclass
+class SafetyFailure:
+    """Consecutive safety check failures of a path, see `SafetyCheckCache`"""
+
+    state_hash: int
+    failures: int
+    retry_block: int
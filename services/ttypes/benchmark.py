@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class BenchmarkReport:
+    tokens: int
+    pools: int
+    blocks: int
+    paths: int = 0
+    path_finding_seconds: float = 0.0
+    ranking_seconds: float = 0.0
+    evaluation_seconds: float = 0.0
+    evaluations: int = 0
+    # Swaps along a whole path, for the amount in of the evaluation or of the optimizer
+    simulations: int = 0
+    optimizer_iterations: int = 0
+    positive: int = 0
+    errors: int = 0
+    peak_rss_mb: float = 0.0
+    # Only measured with --trace-memory
+    peak_python_heap_mb: float = None
+
+    @property
+    def paths_per_second(self) -> float:
+        return (
+            self.paths / self.path_finding_seconds if self.path_finding_seconds else 0.0
+        )
+
+    @property
+    def evaluations_per_second(self) -> float:
+        return (
+            self.evaluations / self.evaluation_seconds
+            if self.evaluation_seconds
+            else 0.0
+        )
+
+    @property
+    def simulations_per_second(self) -> float:
+        return (
+            self.simulations / self.evaluation_seconds
+            if self.evaluation_seconds
+            else 0.0
+        )
+
+    def __str__(self) -> str:
+        peak_memory = f"{self.peak_rss_mb:.1f} MB RSS"
+        if self.peak_python_heap_mb is not None:
+            peak_memory += f", {self.peak_python_heap_mb:.1f} MB Python heap"
+        return (
+            f"Tokens: {self.tokens}, Pools: {self.pools}, Paths: {self.paths}\n"
+            f"Path finding: {self.path_finding_seconds:.3f} s ({self.paths_per_second:.0f} paths/s)\n"
+            f"Ranking: {self.ranking_seconds / max(self.blocks, 1) * 1000:.1f} ms per block\n"
+            f"Evaluation: {self.evaluations} paths over {self.blocks} blocks in {self.evaluation_seconds:.3f} s "
+            f"({self.evaluations_per_second:.0f} paths/s, {self.simulations_per_second:.0f} simulations/s)\n"
+            f"Optimizer: {self.optimizer_iterations} iterations\n"
+            f"Positive: {self.positive}, Errors: {self.errors}\n"
+            f"Peak memory: {peak_memory}"
+        )
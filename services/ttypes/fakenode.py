@@ -0,0 +1,54 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+
+@dataclass
+class FakeBlock:
+    number: int
+    hash: str
+    header: Dict[str, Any]
+    # JSON-RPC transaction objects, the swaps that moved the reserves and the ones received
+    transactions: List[Dict[str, Any]]
+    logs: List[Dict[str, Any]]
+    # Reserves ordered as `pool.tokens`, like the exchanges `fetch_reserves`
+    reserves_by_pool_address: Dict[str, Tuple[int, ...]]
+    gas_price: int
+    # Wall clock time the block was served as `latest`
+    published_at: float
+
+
+@dataclass
+class FakeNodeReport:
+    blocks: int = 0
+    requests_by_method: Dict[str, int] = field(default_factory=dict)
+    transactions: int = 0
+    reverted: int = 0
+    # Time between a block being published and a transaction received while it was the latest
+    detect_to_broadcast_seconds: List[float] = field(default_factory=list)
+
+    @property
+    def requests(self) -> int:
+        return sum(self.requests_by_method.values())
+
+    def latency_percentile(self, percentile: float) -> float:
+        if not self.detect_to_broadcast_seconds:
+            return 0.0
+        latencies = sorted(self.detect_to_broadcast_seconds)
+        index = min(int(len(latencies) * percentile / 100), len(latencies) - 1)
+        return latencies[index]
+
+    def __str__(self) -> str:
+        requests = ", ".join(
+            f"{method}: {count}"
+            for method, count in sorted(
+                self.requests_by_method.items(), key=lambda item: -item[1]
+            )
+        )
+        return (
+            f"Blocks: {self.blocks}\n"
+            f"Requests: {self.requests} ({requests})\n"
+            f"Transactions: {self.transactions} received, {self.reverted} reverted\n"
+            f"Detect to broadcast: p50 {self.latency_percentile(50) * 1000:.1f} ms, "
+            f"p95 {self.latency_percentile(95) * 1000:.1f} ms, "
+            f"max {self.latency_percentile(100) * 1000:.1f} ms"
+        )
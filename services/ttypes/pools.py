@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+from typing import List, Set
+
+from services.pools.pool import Pool
+
+
+@dataclass
+class PoolsUpdate:
+    """Content of the pool YAML files after a change, see `PoolFilesWatcher`"""
+
+    # Pools of pools.yaml
+    pools: List[Pool] = field(default_factory=list)
+    # Pools that were in pools.yaml and are not anymore
+    removed_pool_addresses: Set[str] = field(default_factory=set)
+    # Lower case addresses of the tokens of blacklist.yaml and of the auto-blacklist
+    blacklist_addresses: Set[str] = field(default_factory=set)
@@ -0,0 +1,39 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from services.pools.pool import Pool
+
+
+@dataclass
+class RecordedBlock:
+    block_number: int
+    header: Dict[str, Any]
+    gas_price: int
+    # State of every tracked pool as of this block, not only the ones that changed
+    reserves_by_pool_address: Dict[str, Tuple[int, ...]]
+    # Pools tracked for the first time in this block
+    new_pools: List[Pool] = field(default_factory=list)
+
+
+@dataclass
+class ReplayReport:
+    blocks: int = 0
+    seconds: float = 0.0
+    evaluated: int = 0
+    positive: int = 0
+    printed: int = 0
+    net_profit_wei: int = 0
+    slowest_block: int = None
+    slowest_block_seconds: float = 0.0
+
+    @property
+    def blocks_per_minute(self) -> float:
+        return self.blocks / self.seconds * 60 if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"Blocks: {self.blocks} in {self.seconds:.3f} s ({self.blocks_per_minute:.0f} blocks/min)\n"
+            f"Paths: {self.evaluated} evaluated, {self.positive} positive, {self.printed} printed\n"
+            f"Net Profit: {self.net_profit_wei / 10 ** 18} ETH\n"
+            f"Slowest Block: {self.slowest_block} ({self.slowest_block_seconds:.3f} s)"
+        )
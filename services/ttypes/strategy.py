@@ -6,3 +6,9 @@ class StrategyEnum(Enum):
     FRESH = 1
     SNIPE = 2
     WATCHER = 3
+    FEEDER = 4
+    BENCHMARK = 5
+    REPLAY = 6
+    FAKENODE = 7
+    DAEMON = 8
+    WORKER = 9
@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+from typing import Set
+
+
+@dataclass
+class PendingTransaction:
+    tx_hash: str
+    path_id: str
+    pool_addresses: Set[str]
+    sent_block: int
+    sent_time: float
@@ -1,12 +1,13 @@
-import sys
 import time
 from typing import List
 
-import requests
 from web3 import Web3
 
 from config import MASK_ADDRESS, Config
 from services.ethereum.ethereum import Ethereum
+from services.logger.logger import Logger
+from services.metrics.metrics import BLOCK_ARRIVAL, Metrics
+from services.notifications.dispatcher import NotificationDispatcher
 
 
 def timer(method):
@@ -27,20 +28,42 @@ def timer(method):
 def wait_new_block(ethereum: Ethereum, current_block: int) -> int:
     start_time = time.time()
     while True:
-        latest_block = ethereum.w3.eth.getBlock("latest")
-        if latest_block["number"] > current_block:
-            print(
-                f"Block Number: {latest_block['number']} (%s seconds)"
-                % (time.time() - start_time)
+        latest_block = None
+        if ethereum.reserve_table and (
+            time.time() - start_time
+            < ethereum.config.get_int("SHARED_RESERVES_TIMEOUT")
+        ):
+            # The feeder commits a block once all its reserves are published
+            latest_block_number = ethereum.reserve_table.block_number
+            poll_interval = 0.005
+        else:
+            latest_block = ethereum.w3.eth.getBlock("latest")
+            latest_block_number = latest_block["number"]
+            poll_interval = 0.5
+        if latest_block_number > current_block:
+            ethereum.tx_manager.notify_block(latest_block_number)
+            if latest_block:
+                Metrics.instance(ethereum.config).observe(
+                    BLOCK_ARRIVAL, time.time() - latest_block["timestamp"]
+                )
+            Logger.instance(ethereum.config).info(
+                f"Block Number: {latest_block_number} (%s seconds)"
+                % (time.time() - start_time),
+                block=latest_block_number,
             )
-            return latest_block["number"]
-        time.sleep(0.5)
+            return latest_block_number
+        time.sleep(poll_interval)
 
 
 def mask_address(address: str) -> str:
     return Web3.toChecksumAddress(hex(int(address, 16) ^ int(MASK_ADDRESS, 16)))
 
 
+def unmask_address(masked_address: str) -> str:
+    """Reverse `mask_address`, lowercase"""
+    return "0x%040x" % (int(masked_address, 16) ^ int(MASK_ADDRESS, 16))
+
+
 def fill_zero_addresses(token_paths: List[str], times: int) -> List[str]:
     ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
     return token_paths + [ZERO_ADDRESS for _ in range(times)]
@@ -48,19 +71,19 @@ def fill_zero_addresses(token_paths: List[str], times: int) -> List[str]:
 
 def calculate_gas_price(ethereum: Ethereum, config: Config) -> int:
     """Calculate the current gas price based on fast with high probability strategy"""
-    gas_price = ethereum.w3.eth.generateGasPrice()
-    if config.debug:
-        print(f"Gas Price = {ethereum.w3.fromWei(gas_price, 'gwei')} Gwei")
-        sys.stdout.flush()
+    gas_price = ethereum.gas_oracle.gas_price()
+    if gas_price is None:
+        gas_price = ethereum.w3.eth.generateGasPrice()
+    Logger.instance(config).debug(
+        f"Gas Price = {ethereum.w3.fromWei(gas_price, 'gwei')} Gwei",
+        gas_price=gas_price,
+    )
     return gas_price
 
 
 def heartbeat(config: Config) -> None:
     """Send heartbeat signal"""
-    slack_webhook = config.get("SLACK_HEARTBEAT_WEBHOOK")
-    requests.post(
-        slack_webhook,
-        json={
-            "text": f"[{config.strategy.name}][Liquidity: {config.min_liquidity} -> {config.max_liquidity}][Tokens: {config.only_tokens}] Heartbeat"
-        },
+    NotificationDispatcher.instance(config).post_slack(
+        config.get("SLACK_HEARTBEAT_WEBHOOK"),
+        f"[{config.strategy.name}][Liquidity: {config.min_liquidity} -> {config.max_liquidity}][Tokens: {config.only_tokens}] Heartbeat",
     )
@@ -1,14 +1,12 @@
-from typing import List
-
 import click
 import sys
-import yaml
 from web3 import Web3
 
 from config import Config
 from services.ethereum.ethereum import Ethereum
 from services.pools.loader import PoolLoader
-from services.strategy.snipe import StrategySnipe
+from services.profiler.profiler import Profiler
+from services.strategy.snipe import StrategySnipe, load_noobs_yaml
 from services.ttypes.sniper import SnipingNoob
 from services.ttypes.strategy import StrategyEnum
 
@@ -58,6 +56,12 @@ from services.ttypes.strategy import StrategyEnum
     help="Only filter tokens by name (i.e: --only XIOT,XAMP,UNI) (Default: all)",
 )
 @click.option("--address", help="Specify a specific arbitrageur address to snipe")
+@click.option(
+    "--profile",
+    default=None,
+    type=int,
+    help="Profile the first N blocks, 0 to profile between two SIGUSR1 (Default: disabled)",
+)
 def snipe(
     kovan: bool,
     debug: bool,
@@ -71,6 +75,7 @@ def snipe(
     since: str,
     only_tokens: str,
     address: str,
+    profile: int,
 ) -> None:
     print(
         f"-----------------------------------------------------------\n"
@@ -80,6 +85,7 @@ def snipe(
         f"Gas Multiplier: {gas_multiplier}\n"
         f"Max Block Allowed: {max_block}\n"
         f"Sending Transactions on-chain: {send_tx}\n"
+        f"Profile: {f'{profile} blocks' if profile else 'SIGUSR1' if profile == 0 else 'disabled'}\n"
         f"Since Block: {since}\n"
         f"Only Tokens: {only_tokens}\n"
         f"-----------------------------------------------------------"
@@ -98,27 +104,20 @@ def snipe(
         max_block=max_block,
         since=since,
         only_tokens=only_tokens,
+        profile_blocks=profile,
     )
+    Profiler.instance(config)
     pool_loader = PoolLoader(config=config)
     pools = pool_loader.load_all_pools()
     ethereum = Ethereum(config)
     if address:
         sniping_noobs = [SnipingNoob(address=Web3.toChecksumAddress(address))]
     else:
-        sniping_noobs = _load_noobs_yaml(config)
-    strategy = StrategySnipe(ethereum, config, pools, sniping_noobs)
+        sniping_noobs = load_noobs_yaml(config)
+    strategy = StrategySnipe(
+        ethereum, config, pools, sniping_noobs, watch_noobs=not address
+    )
     strategy.snipe_arbitrageur()
 
 
-def _load_noobs_yaml(config: Config) -> List[SnipingNoob]:
-    noobs: List[SnipingNoob] = []
-    with open(config.get("SNIPING_NOOBS_YAML_PATH"), "r") as stream:
-        noobs_dict = yaml.safe_load(stream)
-        if noobs_dict["noobs"]:
-            for noob_yaml in noobs_dict["noobs"]:
-                noob = SnipingNoob(address=Web3.toChecksumAddress(noob_yaml["address"]))
-                noobs.append(noob)
-    return noobs
-
-
 snipe()
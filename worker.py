@@ -0,0 +1,38 @@
+import click
+import sys
+
+from config import Config
+from services.arbitrage.parallel import WorkerServer
+from services.profiler.profiler import Profiler
+from services.ttypes.strategy import StrategyEnum
+
+
+@click.command()
+@click.option("--debug", is_flag=True, help="Display logs")
+@click.option(
+    "--listen",
+    default="127.0.0.1:7000",
+    help="Set host:port or unix socket path to listen on (Default: 127.0.0.1:7000)",
+)
+@click.option(
+    "--profile",
+    default=None,
+    type=int,
+    help="Profile the first N blocks of each coordinator, 0 to profile between two SIGUSR1 (Default: disabled)",
+)
+def worker(debug: bool, listen: str, profile: int) -> None:
+    print(
+        f"-----------------------------------------------------------\n"
+        f"------------------ EVALUATING PATHS -----------------------\n"
+        f"-----------------------------------------------------------\n"
+        f"Listening on: {listen}\n"
+        f"Profile: {f'{profile} blocks' if profile else 'SIGUSR1' if profile == 0 else 'disabled'}\n"
+        f"-----------------------------------------------------------"
+    )
+    sys.stdout.flush()
+    config = Config(strategy=StrategyEnum.WORKER, debug=debug, profile_blocks=profile)
+    Profiler.instance(config)
+    WorkerServer(listen, config).run()
+
+
+worker()